@@ -1,6 +1,13 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
 
 
 class AnalyticsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'analytics'
+
+    def ready(self):
+        from .db import configure_sqlite
+        from .instrumentation import install_query_recorder
+        connection_created.connect(configure_sqlite, dispatch_uid="analytics_configure_sqlite")
+        connection_created.connect(install_query_recorder, dispatch_uid="analytics_query_recorder")
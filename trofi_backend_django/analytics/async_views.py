@@ -0,0 +1,264 @@
+"""
+Versiones async (ASGI) de las vistas de estadísticas y de sync.
+
+DRF no soporta handlers async, así que son Views de Django. Las lecturas
+independientes de una estadística se lanzan juntas con asyncio.gather:
+
+- por defecto (ANALYTICS_ASYNC_PARALLEL_QUERIES = True) cada lectura
+  corre en su propio hilo con su propia conexión, así la request tarda lo
+  que la consulta más lenta;
+- con ANALYTICS_ASYNC_PARALLEL_QUERIES = False usan el ORM async
+  (iteración async), que Django todavía ejecuta de a una en el hilo de la
+  request: no hay paralelismo real, solo no se bloquea el event loop.
+
+El resto es igual a las vistas de DRF: caché de respuestas, snapshots y
+el mismo payload (con generated_at).
+
+Las escrituras de sync usan transacciones, que el ORM async no soporta:
+corren enteras en un hilo con sync_to_async y el event loop queda libre
+mientras tanto.
+"""
+import asyncio
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.http import HttpResponse, JsonResponse
+from django.utils import timezone
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework.exceptions import ValidationError
+from rest_framework.utils.encoders import JSONEncoder
+
+from .cache import JOBS, USERS, REVIEWS, SNAPSHOTS, stats_cache_entry
+from .ingest import enqueue_records, ingest_enabled
+from .params import bool_param, int_param, list_param
+from .snapshots import snapshot_sections
+from .stats import SECTIONS, StatsFilters, stats_source
+from .sync import JOB_BATCH, USER_BATCH, REVIEW_BATCH, run_batch, sync_one
+
+
+def _json(data, status=200):
+    # Mismo encoder que DRF, para que las respuestas sean idénticas
+    return JsonResponse(data, status=status, encoder=JSONEncoder, safe=False)
+
+
+def _fetch_in_thread(queryset):
+    close_old_connections()
+    try:
+        return list(queryset)
+    finally:
+        close_old_connections()
+
+
+async def _fetch(queryset):
+    if getattr(settings, "ANALYTICS_ASYNC_PARALLEL_QUERIES", True):
+        return await sync_to_async(_fetch_in_thread, thread_sensitive=False)(queryset)
+    return [row async for row in queryset]
+
+
+async def load_sections(source, sections):
+    """
+    Lanza en paralelo todas las lecturas que necesitan esas secciones.
+    """
+    queries = source.queries(sections)
+    results = await asyncio.gather(*(_fetch(queryset) for queryset in queries.values()))
+    source.prime(dict(zip(queries, results)))
+
+
+# ===========================
+# ANALYTICS (async)
+# ===========================
+
+class AsyncStatsView(View):
+    """
+    Mismos parámetros, payload, caché de respuestas y snapshots que la
+    vista de DRF equivalente; solo cambia cómo se leen los datos en vivo.
+    """
+    sections = None
+    scopes = (USERS, REVIEWS, JOBS, SNAPSHOTS)
+    # Acepta ?limit= y ?min_reviews= (ranking de trabajadores)
+    ranked = True
+
+    def get_sections(self, request):
+        return self.sections
+
+    def parse(self, request):
+        # Puede consultar la base (job por firebase_key): corre en un hilo.
+        # Mismo orden que las vistas de DRF, para que el primer error sea el mismo
+        sections = self.get_sections(request)
+        limit, min_reviews = 10, 1
+        if self.ranked:
+            limit = int_param(request, "limit", 10, minimum=1, maximum=100)
+            min_reviews = int_param(request, "min_reviews", 1, minimum=1)
+        filters = StatsFilters.from_request(request)
+        live = bool_param(request, "live")
+        return sections, filters, limit, min_reviews, live
+
+    async def get(self, request):
+        entry = await sync_to_async(stats_cache_entry)(request, self.scopes)
+        if entry is not None:
+            if entry.not_modified(request):
+                return entry.decorate(HttpResponse(status=304))
+            payload = await sync_to_async(entry.get)()
+            if payload is not None:
+                return entry.decorate(_json(payload))
+
+        response, payload = await self.compute(request)
+        if entry is None:
+            return response
+        if payload is not None:
+            await sync_to_async(entry.set)(payload)
+        return entry.decorate(response)
+
+    async def compute(self, request):
+        """
+        (respuesta, payload a cachear o None).
+        """
+        try:
+            sections, filters, limit, min_reviews, live = await sync_to_async(self.parse)(request)
+        except ValidationError as exc:
+            return _json(exc.detail, status=400), None
+
+        try:
+            found = await sync_to_async(snapshot_sections)(filters, sections, limit, min_reviews, live)
+            if found is None:
+                generated_at = timezone.now()
+                source = stats_source(filters, limit=limit, min_reviews=min_reviews)
+                await load_sections(source, sections)
+                found = source.dashboard(sections), generated_at
+            data, generated_at = found
+            payload = {
+                "success": True,
+                "data": self.render(data, sections),
+                "generated_at": generated_at,
+            }
+            return _json(payload), payload
+        except Exception as e:
+            return _json({"error": str(e)}, status=500), None
+
+    def render(self, data, sections):
+        return data[sections[0]]
+
+
+class AsyncUsersStatsView(AsyncStatsView):
+    sections = ["users"]
+    scopes = (USERS, SNAPSHOTS)
+    ranked = False
+
+
+class AsyncWorkersStatsView(AsyncStatsView):
+    sections = ["workers"]
+
+
+class AsyncReviewsStatsView(AsyncStatsView):
+    sections = ["reviews"]
+    ranked = False
+
+
+class AsyncDashboardView(AsyncStatsView):
+
+    def get_sections(self, request):
+        return list_param(request, "fields", SECTIONS)
+
+    def render(self, data, sections):
+        return data
+
+
+# ===========================
+# SYNC (async)
+# ===========================
+
+def _parse_body(request):
+    """
+    Array/objeto JSON o NDJSON según el Content-Type.
+    """
+    body = request.body.decode(request.encoding or "utf-8")
+    if request.content_type == "application/x-ndjson":
+        return [json.loads(line) for line in body.splitlines() if line.strip()]
+    return json.loads(body)
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+class AsyncSyncView(View):
+    """
+    Upsert de un registro (POST), igual que las vistas de sync de DRF.
+    """
+    spec = None
+    message = None
+
+    async def post(self, request):
+        try:
+            record = _parse_body(request)
+        except ValueError:
+            return _json({"detail": "JSON inválido"}, status=400)
+
+        if ingest_enabled():
+            result = (await sync_to_async(enqueue_records)(self.spec, [record]))[0]
+            if result["ok"]:
+                return _json({"ok": True, "queued": True}, status=202)
+            return _json(result["errors"], status=400)
+
+        errors, created = await sync_to_async(sync_one)(self.spec, record)
+        if errors is None:
+            return _json({"ok": True, "message": self.message}, status=201 if created else 200)
+        return _json(errors, status=400)
+
+
+class AsyncSyncJobView(AsyncSyncView):
+    spec = JOB_BATCH
+    message = "Job sincronizado"
+
+
+class AsyncSyncUserView(AsyncSyncView):
+    spec = USER_BATCH
+    message = "Usuario sincronizado"
+
+
+class AsyncSyncReviewView(AsyncSyncView):
+    spec = REVIEW_BATCH
+    message = "Review sincronizada"
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+class AsyncSyncBatchView(View):
+    """
+    Sync en lote, igual que SyncBatchView.
+    """
+    spec = None
+
+    async def post(self, request):
+        try:
+            records = _parse_body(request)
+        except ValueError:
+            return _json({"detail": "JSON inválido"}, status=400)
+        if not isinstance(records, list):
+            return _json({"error": "Se esperaba una lista de registros"}, status=400)
+
+        queued = ingest_enabled()
+        write = enqueue_records if queued else run_batch
+        results = await sync_to_async(write)(self.spec, records)
+        failed = sum(1 for item in results if not item["ok"])
+
+        return _json({
+            "ok": failed == 0,
+            "queued": queued,
+            "total": len(results),
+            "synced": len(results) - failed,
+            "failed": failed,
+            "results": results,
+        }, status=202 if queued else 200)
+
+
+class AsyncSyncJobBatchView(AsyncSyncBatchView):
+    spec = JOB_BATCH
+
+
+class AsyncSyncUserBatchView(AsyncSyncBatchView):
+    spec = USER_BATCH
+
+
+class AsyncSyncReviewBatchView(AsyncSyncBatchView):
+    spec = REVIEW_BATCH
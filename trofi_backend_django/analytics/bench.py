@@ -0,0 +1,379 @@
+"""
+Benchmarks de los endpoints de sync y de estadísticas.
+
+generate() siembra oficios, usuarios y reseñas con distribuciones
+parecidas a las reales (pocos oficios concentran a la mayoría de los
+trabajadores, las altas crecen con el tiempo, unos pocos trabajadores
+reciben muchas reseñas y los scores tiran a altos). run_benchmarks() pega a
+cada endpoint con el test client de Django (o con HTTP contra un servidor
+levantado) y mide throughput, latencias p50/p95/p99 y consultas por
+request. El resultado es un dict serializable a JSON, para comparar
+commits con compare(). validation_benchmark() compara la validación de
+sync con el serializer de DRF contra FastValidator.
+"""
+import json
+import math
+import random
+import subprocess
+import time
+import urllib.error
+import urllib.request
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+
+import django
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+
+from .cache import clear_job_cache
+from .models import Job, UserAnalytics, ReviewAnalytics
+from .rollups import rebuild_rollups
+from .sync import JOB_BATCH, USER_BATCH, REVIEW_BATCH
+
+
+SEED_START = datetime(2023, 1, 1, tzinfo=timezone.utc)
+SEED_DAYS = 730
+
+# Scores de 1 a 5 en pasos de 0.5, con más peso en los altos
+SCORES = [1 + step / 2 for step in range(9)]
+SCORE_WEIGHTS = [1, 1, 2, 2, 4, 6, 10, 14, 12]
+
+
+# ===========================
+# GENERADOR DE DATOS
+# ===========================
+
+def _created_at(rnd):
+    # Altas crecientes: más densidad hacia el final del período
+    return SEED_START + timedelta(days=SEED_DAYS * rnd.random() ** 0.6, seconds=rnd.randrange(86400))
+
+
+def generate(jobs=20, users=2000, reviews=20000, worker_ratio=0.4, seed=0, batch_size=1000):
+    """
+    Siembra la base y reconstruye los rollups. Devuelve los conteos creados.
+    """
+    rnd = random.Random(seed)
+
+    job_list = Job.objects.bulk_create(
+        [Job(name=f"Oficio {i}", firebase_key=f"bench-job-{i}") for i in range(jobs)],
+        batch_size=batch_size,
+    )
+    # Popularidad de los oficios tipo Zipf
+    job_weights = [1 / (rank + 1) for rank in range(jobs)]
+
+    user_list = []
+    for i in range(users):
+        is_worker = rnd.random() < worker_ratio
+        user_list.append(UserAnalytics(
+            uid=f"bench-user-{i}",
+            name=f"Usuario {i}",
+            email=f"user{i}@bench.trofi.test",
+            is_worker=is_worker,
+            created_at=_created_at(rnd),
+            job=rnd.choices(job_list, job_weights)[0] if is_worker and job_list and rnd.random() < 0.9 else None,
+        ))
+    UserAnalytics.objects.bulk_create(user_list, batch_size=batch_size)
+
+    workers = [user for user in user_list if user.is_worker]
+    clients = [user for user in user_list if not user.is_worker] or user_list
+    review_list = []
+    if workers and len(user_list) > 1:
+        # Pocos trabajadores concentran la mayoría de las reseñas (Pareto)
+        worker_weights = [rnd.paretovariate(1.2) for _ in workers]
+        for i in range(reviews):
+            reviewed = rnd.choices(workers, worker_weights)[0]
+            reviewer = rnd.choice(clients)
+            if reviewer is reviewed:
+                continue
+            review_list.append(ReviewAnalytics(
+                id=f"bench-review-{i}",
+                reviewer=reviewer,
+                reviewed=reviewed,
+                score=rnd.choices(SCORES, SCORE_WEIGHTS)[0],
+                description="",
+                created_at=max(reviewer.created_at, reviewed.created_at) + timedelta(days=rnd.randint(1, 60)),
+            ))
+    ReviewAnalytics.objects.bulk_create(review_list, batch_size=batch_size)
+
+    rebuild_rollups()
+    clear_job_cache()
+    return {"jobs": len(job_list), "users": len(user_list), "reviews": len(review_list)}
+
+
+@contextmanager
+def temporary_database():
+    """
+    Base de test descartable (como la de manage.py test): no toca los datos reales.
+    """
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+# ===========================
+# ENDPOINTS
+# ===========================
+
+class Endpoint:
+    """
+    Un request a medir. payload(n) arma el cuerpo de la iteración n (los
+    de sync usan claves nuevas en cada una para no medir solo updates).
+    """
+
+    def __init__(self, name, path, method="get", payload=None):
+        self.name = name
+        self.path = path
+        self.method = method
+        self.payload = payload
+
+
+def _review(n, size):
+    reviewer = n % size
+    # Desplazamiento entre 1 y size - 1: nunca se reseña a sí mismo
+    reviewed = (reviewer + 1 + (n * 7) % (size - 1)) % size
+    return {
+        "id": f"bench-sync-review-{n}",
+        "reviewer": f"bench-user-{reviewer}",
+        "reviewed": f"bench-user-{reviewed}",
+        "score": 4.5,
+        "description": "benchmark",
+        "created_at": "2024-06-01T00:00:00Z",
+    }
+
+
+def endpoints(size):
+    """
+    Endpoints medidos; size es la cantidad de usuarios sembrados.
+    """
+    def user(n):
+        return {
+            "uid": f"bench-sync-user-{n}",
+            "name": "Sync",
+            "email": f"sync{n}@bench.trofi.test",
+            "is_worker": n % 2 == 0,
+            "created_at": "2024-06-01T00:00:00Z",
+            "job": "bench-job-0",
+        }
+
+    return [
+        Endpoint("stats.users", "/api/analytics/users/"),
+        Endpoint("stats.users.week", "/api/analytics/users/?granularity=week&from=2024-01-01"),
+        Endpoint("stats.workers", "/api/analytics/workers/"),
+        Endpoint("stats.workers.job", "/api/analytics/workers/?job=bench-job-0"),
+        Endpoint("stats.reviews", "/api/analytics/reviews/"),
+        Endpoint("stats.reviews.range", "/api/analytics/reviews/?from=2024-01-01&to=2024-06-30"),
+        Endpoint("stats.dashboard", "/api/analytics/dashboard/"),
+        Endpoint("list.reviews", "/api/list/reviews/?limit=50"),
+        Endpoint("sync.job", "/api/sync/jobs/", "post",
+                 lambda n: {"firebase_key": f"bench-sync-job-{n}", "name": "Sync"}),
+        Endpoint("sync.user", "/api/sync/users/", "post", user),
+        Endpoint("sync.review", "/api/sync/reviews/", "post", lambda n: _review(n, size)),
+        Endpoint("sync.review.batch", "/api/sync/reviews/batch/", "post",
+                 lambda n: [_review(size * 1000 + n * 100 + i, size) for i in range(100)]),
+    ]
+
+
+# ===========================
+# CLIENTES
+# ===========================
+
+class TestClientTransport:
+    counts_queries = True
+
+    def __init__(self):
+        self.client = Client(raise_request_exception=False)
+
+    def request(self, endpoint, n):
+        if endpoint.method == "get":
+            return self.client.get(endpoint.path).status_code
+        body = json.dumps(endpoint.payload(n))
+        return self.client.post(endpoint.path, body, content_type="application/json").status_code
+
+
+class HTTPTransport:
+    """
+    Contra un servidor levantado (runserver, gunicorn, uvicorn).
+    Las consultas corren en otro proceso, así que no se cuentan.
+    """
+    counts_queries = False
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip("/")
+
+    def request(self, endpoint, n):
+        data = None
+        headers = {}
+        if endpoint.method != "get":
+            data = json.dumps(endpoint.payload(n)).encode()
+            headers["Content-Type"] = "application/json"
+        request = urllib.request.Request(self.base_url + endpoint.path, data=data, headers=headers,
+                                         method=endpoint.method.upper())
+        try:
+            with urllib.request.urlopen(request) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as exc:
+            return exc.code
+
+
+# ===========================
+# MEDICIÓN
+# ===========================
+
+def percentile(values, fraction):
+    """
+    Percentil por el método del rango más cercano.
+    """
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    index = max(0, math.ceil(fraction * len(ordered)) - 1)
+    return ordered[index]
+
+
+def measure(transport, endpoint, iterations=50, warmup=5, offset=0):
+    for n in range(warmup):
+        transport.request(endpoint, offset + n)
+
+    latencies = []
+    errors = 0
+    started = time.perf_counter()
+    for n in range(warmup, warmup + iterations):
+        begin = time.perf_counter()
+        status = transport.request(endpoint, offset + n)
+        latencies.append((time.perf_counter() - begin) * 1000)
+        if status >= 400:
+            errors += 1
+    elapsed = time.perf_counter() - started
+
+    # Las consultas se cuentan en un request aparte para no sumar el costo
+    # de capturarlas a las latencias
+    queries = None
+    if transport.counts_queries:
+        with CaptureQueriesContext(connection) as captured:
+            transport.request(endpoint, offset + warmup + iterations)
+        queries = len(captured)
+
+    return {
+        "requests": iterations,
+        "errors": errors,
+        "seconds": round(elapsed, 4),
+        "throughput": round(iterations / elapsed, 2) if elapsed else None,
+        "p50_ms": round(percentile(latencies, 0.50), 3),
+        "p95_ms": round(percentile(latencies, 0.95), 3),
+        "p99_ms": round(percentile(latencies, 0.99), 3),
+        "queries": queries,
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(transport, size, iterations=50, warmup=5, only=None, dataset=None):
+    """
+    Mide cada endpoint. only: nombres (o prefijos, como "stats") a incluir.
+    """
+    results = {}
+    for index, endpoint in enumerate(endpoints(size)):
+        if only and not any(endpoint.name == name or endpoint.name.startswith(name + ".") for name in only):
+            continue
+        # Cada endpoint usa claves propias en las escrituras
+        results[endpoint.name] = measure(transport, endpoint, iterations, warmup, offset=index * 100000)
+
+    return {
+        "meta": {
+            "commit": _git_commit(),
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "database": connection.vendor,
+            "django": django.get_version(),
+            "dataset": dataset,
+            "iterations": iterations,
+            "warmup": warmup,
+        },
+        "endpoints": results,
+    }
+
+
+def compare(previous, current, threshold=0.2):
+    """
+    Regresiones de current contra previous: p95 que empeora más que
+    threshold (fracción) o consultas por request que aumentan.
+    """
+    regressions = []
+    for name, now in current["endpoints"].items():
+        before = previous.get("endpoints", {}).get(name)
+        if before is None:
+            continue
+        if before["p95_ms"] and now["p95_ms"] > before["p95_ms"] * (1 + threshold):
+            regressions.append(f"{name}: p95 {before['p95_ms']} ms → {now['p95_ms']} ms")
+        if before["queries"] is not None and now["queries"] is not None and now["queries"] > before["queries"]:
+            regressions.append(f"{name}: consultas {before['queries']} → {now['queries']}")
+    return regressions
+
+
+# ===========================
+# VALIDACIÓN (microbenchmark)
+# ===========================
+
+def sync_records(size, count):
+    """
+    Registros válidos de cada tipo, que referencian los datos de generate().
+    """
+    return {
+        JOB_BATCH: [
+            {"firebase_key": f"bench-validate-job-{n}", "name": f"Oficio {n}"}
+            for n in range(count)
+        ],
+        USER_BATCH: [
+            {
+                "uid": f"bench-validate-user-{n}",
+                "name": f"Usuario {n}",
+                "email": f"validate{n}@bench.trofi.test",
+                "is_worker": n % 2 == 0,
+                "created_at": "2024-06-01T12:00:00Z",
+                "job": f"bench-job-{n % 5}" if n % 2 == 0 else None,
+            }
+            for n in range(count)
+        ],
+        REVIEW_BATCH: [_review(n, size) for n in range(count)],
+    }
+
+
+def _best_time(function, records, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for record in records:
+            function(record)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def validation_benchmark(size, count=2000, repeat=5):
+    """
+    Microsegundos por registro validando con el serializer y con
+    FastValidator (mejor de repeat pasadas), por tipo de registro.
+    """
+    results = {}
+    for spec, records in sync_records(size, count).items():
+        serializer_time = _best_time(lambda record: spec.serializer_class(data=record).is_valid(), records, repeat)
+        fast_time = _best_time(spec.validator.validate, records, repeat)
+        results[spec.name] = {
+            "records": count,
+            "serializer_us": round(serializer_time / count * 1e6, 2),
+            "fast_us": round(fast_time / count * 1e6, 2),
+            "speedup": round(serializer_time / fast_time, 2),
+        }
+    return results
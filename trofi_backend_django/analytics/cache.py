@@ -0,0 +1,270 @@
+"""
+Cachés de analytics.
+
+1) firebase_key → Job.pk: los mismos pocos jobs se resuelven en cada sync
+   de usuario, así que la traducción se guarda en un dict del proceso y, si
+   está configurado ANALYTICS_JOB_CACHE_ALIAS, también en un caché
+   compartido de Django para que otros workers la aprovechen. Solo se
+   cachean claves que existen. Renombrar o borrar un job incrementa una
+   versión en el caché compartido y cada proceso la compara antes de usar
+   su dict; sin caché compartido el dict dura ANALYTICS_JOB_CACHE_TTL.
+
+2) Respuestas de estadísticas: el payload de cada vista se guarda en el
+   caché ANALYTICS_STATS_CACHE_ALIAS bajo una clave que incluye un contador
+   de versión por modelo. Las vistas de sync incrementan el contador al
+   escribir, así que una escritura invalida todo lo que depende de ella
+   sin recorrer claves; el TTL queda como red de seguridad. El caché
+   tiene que ser compartido (Redis, Memcached, base o archivos) para que
+   las invalidaciones de un proceso lleguen a los demás; por eso settings
+   lo deja apagado si no hay uno configurado.
+"""
+import functools
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import Job
+
+
+JOB_KEY_PREFIX = "analytics:job_pk:"
+JOB_VERSION_KEY = "analytics:job_pk_version"
+
+_job_pks = {}
+# Versión del caché compartido con la que se llenó _job_pks, o cuándo se
+# llenó si no hay caché compartido
+_job_state = {"version": None, "loaded_at": time.monotonic()}
+
+
+def _shared_cache():
+    alias = getattr(settings, "ANALYTICS_JOB_CACHE_ALIAS", None)
+    return caches[alias] if alias else None
+
+
+def _job_version():
+    """
+    Versión vigente de la traducción. Vacía el dict del proceso si otro
+    proceso renombró o borró jobs desde que se llenó (con caché
+    compartido) o si pasó ANALYTICS_JOB_CACHE_TTL (sin él).
+    """
+    shared = _shared_cache()
+    if shared is not None:
+        version = shared.get(JOB_VERSION_KEY, 0)
+        if version != _job_state["version"]:
+            _job_pks.clear()
+            _job_state["version"] = version
+        return version
+
+    now = time.monotonic()
+    if now - _job_state["loaded_at"] > getattr(settings, "ANALYTICS_JOB_CACHE_TTL", 30):
+        _job_pks.clear()
+        _job_state["loaded_at"] = now
+    return None
+
+
+def _shared_key(version, key):
+    # Con la versión en la clave, las entradas de antes de un cambio quedan inalcanzables
+    return f"{JOB_KEY_PREFIX}{version}:{key}"
+
+
+def resolve_job_pks(keys):
+    """
+    Devuelve {firebase_key: pk} para las claves que existen.
+    Las que faltan en caché se buscan todas juntas con un solo IN.
+    """
+    version = _job_version()
+    keys = {key for key in keys if key}
+    found = {key: _job_pks[key] for key in keys if key in _job_pks}
+    missing = keys - found.keys()
+
+    shared = _shared_cache()
+    if missing and shared is not None:
+        cached = shared.get_many([_shared_key(version, key) for key in missing])
+        prefix = _shared_key(version, "")
+        for cache_key, pk in cached.items():
+            key = cache_key[len(prefix):]
+            found[key] = _job_pks[key] = pk
+        missing -= found.keys()
+
+    if missing:
+        loaded = dict(
+            Job.objects.filter(firebase_key__in=missing).values_list("firebase_key", "pk")
+        )
+        _job_pks.update(loaded)
+        found.update(loaded)
+        if shared is not None and loaded:
+            shared.set_many({_shared_key(version, key): pk for key, pk in loaded.items()})
+
+    return found
+
+
+def get_job_pk(key):
+    """
+    pk del job con ese firebase_key, o None si no existe.
+    """
+    _job_version()
+    if key in _job_pks:
+        return _job_pks[key]
+    return resolve_job_pks([key]).get(key)
+
+
+def invalidate_job_keys(keys):
+    """
+    Olvida las claves indicadas en todos los procesos: las borra del dict
+    propio e incrementa la versión compartida, que los demás comparan antes
+    de usar el suyo. Lo llaman las escrituras de jobs (altas, renombres y
+    bajas) después de confirmarse.
+    """
+    keys = [key for key in keys if key]
+    for key in keys:
+        _job_pks.pop(key, None)
+
+    shared = _shared_cache()
+    if shared is not None and keys:
+        _incr(shared, JOB_VERSION_KEY)
+
+
+def clear_job_cache():
+    """
+    Vacía el dict del proceso (el caché compartido expira por su cuenta).
+    """
+    _job_pks.clear()
+    _job_state["version"] = None
+    _job_state["loaded_at"] = time.monotonic()
+
+
+def _incr(cache, key):
+    # add() no pisa un contador existente; los contadores no expiran
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, timeout=None)
+
+
+# ===========================
+# CACHÉ DE RESPUESTAS DE ESTADÍSTICAS
+# ===========================
+
+STATS_VERSION_PREFIX = "analytics:version:"
+STATS_RESPONSE_PREFIX = "analytics:stats:"
+
+# Qué datos invalidan cada scope
+USERS = "users"
+REVIEWS = "reviews"
+JOBS = "jobs"
+# Cambia cuando se reemplaza el snapshot precalculado (analytics.snapshots)
+SNAPSHOTS = "snapshots"
+
+
+def _stats_cache():
+    alias = getattr(settings, "ANALYTICS_STATS_CACHE_ALIAS", None)
+    return caches[alias] if alias else None
+
+
+def stats_versions(scopes):
+    """
+    Versión actual de cada scope. Un scope sin contador arranca en 0.
+    """
+    cache = _stats_cache()
+    if cache is None:
+        return {}
+    keys = [STATS_VERSION_PREFIX + scope for scope in scopes]
+    found = cache.get_many(keys)
+    return {scope: found.get(STATS_VERSION_PREFIX + scope, 0) for scope in scopes}
+
+
+def _bump(scopes):
+    cache = _stats_cache()
+    if cache is None:
+        return
+    for scope in scopes:
+        _incr(cache, STATS_VERSION_PREFIX + scope)
+
+
+def invalidate_stats(*scopes):
+    """
+    Invalida las respuestas cacheadas que dependen de esos scopes.
+    Se aplica al confirmar la transacción para que nadie cachee datos
+    anteriores a la escritura con la versión nueva.
+    """
+    transaction.on_commit(lambda: _bump(scopes))
+
+
+class StatsCacheEntry:
+    """
+    Entrada del caché de respuestas para una request: ETag y clave según
+    la ruta, los parámetros y las versiones de los scopes de los que
+    depende. La usan cached_stats y las vistas async.
+    """
+
+    def __init__(self, cache, request, scopes):
+        self.cache = cache
+        versions = stats_versions(scopes)
+        # request.query_params en DRF, request.GET en las vistas de Django
+        params = sorted(getattr(request, "query_params", request.GET).lists())
+        fingerprint = f"{request.path}|{params}|{sorted(versions.items())}"
+        digest = hashlib.md5(fingerprint.encode()).hexdigest()
+        self.etag = f'"{digest}"'
+        self.key = STATS_RESPONSE_PREFIX + digest
+
+    def not_modified(self, request):
+        return self.etag in _if_none_match(request)
+
+    def get(self):
+        return self.cache.get(self.key)
+
+    def set(self, payload):
+        self.cache.set(self.key, payload, getattr(settings, "ANALYTICS_STATS_CACHE_TTL", 300))
+
+    def decorate(self, response):
+        if response.status_code in (200, 304):
+            response["ETag"] = self.etag
+            response["Cache-Control"] = "no-cache"
+        return response
+
+
+def stats_cache_entry(request, scopes):
+    """
+    StatsCacheEntry de la request, o None si el caché está apagado.
+    """
+    cache = _stats_cache()
+    return StatsCacheEntry(cache, request, scopes) if cache is not None else None
+
+
+def cached_stats(*scopes):
+    """
+    Decorador para el get() de las vistas de estadísticas: sirve el payload
+    desde el caché y responde 304 si el ETag del cliente coincide, sin tocar
+    la base. scopes lista de qué datos depende la vista.
+    """
+    def decorator(get):
+        @functools.wraps(get)
+        def wrapper(self, request, *args, **kwargs):
+            entry = stats_cache_entry(request, scopes)
+            if entry is None:
+                return get(self, request, *args, **kwargs)
+
+            if entry.not_modified(request):
+                return entry.decorate(Response(status=status.HTTP_304_NOT_MODIFIED))
+
+            payload = entry.get()
+            if payload is not None:
+                return entry.decorate(Response(payload))
+
+            response = get(self, request, *args, **kwargs)
+            if response.status_code == 200:
+                entry.set(response.data)
+            return entry.decorate(response)
+
+        return wrapper
+    return decorator
+
+
+def _if_none_match(request):
+    header = request.headers.get("If-None-Match", "")
+    return {tag.strip() for tag in header.split(",") if tag.strip()}
@@ -0,0 +1,27 @@
+"""
+Ajustes de conexión a la base.
+
+Con DB_SQLITE_TUNED=1 cada conexión SQLite nueva ejecuta los PRAGMA de
+settings.SQLITE_PRAGMAS (se conecta a connection_created en
+AnalyticsConfig.ready):
+
+- journal_mode=WAL: los lectores no bloquean al escritor ni al revés;
+- synchronous=NORMAL: con WAL no pierde integridad y evita un fsync por commit;
+- busy_timeout: un escritor espera el lock en lugar de fallar con
+  "database is locked";
+- mmap_size y cache_size: más páginas en memoria para las lecturas.
+"""
+from django.conf import settings
+
+
+def configure_sqlite(sender, connection, **kwargs):
+    if connection.vendor != "sqlite":
+        return
+
+    pragmas = getattr(settings, "SQLITE_PRAGMAS", {})
+    if not pragmas:
+        return
+
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name} = {value}")
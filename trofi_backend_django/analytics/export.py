@@ -0,0 +1,137 @@
+"""
+Exportación de las tablas base en streaming (CSV o NDJSON).
+
+Las filas salen de values_list().iterator(chunk_size=...), ordenadas por pk,
+así que la memoria no depende del tamaño de la tabla. Para retomar una
+exportación cortada se pasa ?after=<pk de la última fila recibida>: la
+consulta sigue desde ahí por el índice de la pk (keyset), sin OFFSET.
+
+CSV y NDJSON escriben cada valor igual (export_value): fechas ISO 8601
+en UTC con Z, scores como string decimal exacto y booleanos true/false.
+La línea NDJSON (export_line) es también la que hashea la reconciliación.
+"""
+import csv
+from datetime import datetime
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+
+from .models import Job, UserAnalytics, ReviewAnalytics
+
+
+EXPORT_CHUNK_SIZE = getattr(settings, "ANALYTICS_EXPORT_CHUNK_SIZE", 2000)
+
+CONTENT_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+}
+
+
+class ExportSpec:
+
+    def __init__(self, name, model, columns, fields, filter_q):
+        self.name = name
+        self.model = model
+        # Nombres en la salida y campos del ORM, en el mismo orden
+        self.columns = columns
+        self.fields = fields
+        # StatsFilters → Q para esta tabla
+        self.filter_q = filter_q
+
+
+# Sin vista de exportación: lo usa la reconciliación (analytics.reconcile)
+JOBS_EXPORT = ExportSpec(
+    "jobs",
+    Job,
+    ["firebase_key", "name"],
+    ["firebase_key", "name"],
+    lambda filters: Q(),
+)
+
+USERS_EXPORT = ExportSpec(
+    "users",
+    UserAnalytics,
+    ["uid", "name", "email", "is_worker", "created_at", "job"],
+    ["uid", "name", "email", "is_worker", "created_at", "job__firebase_key"],
+    lambda filters: filters.users_q(),
+)
+
+REVIEWS_EXPORT = ExportSpec(
+    "reviews",
+    ReviewAnalytics,
+    ["id", "reviewer", "reviewed", "score", "description", "created_at"],
+    ["id", "reviewer_id", "reviewed_id", "score", "description", "created_at"],
+    lambda filters: filters.reviews_q(),
+)
+
+
+_encoder = DjangoJSONEncoder(ensure_ascii=False)
+
+
+def export_value(value):
+    # Mismo texto que DjangoJSONEncoder para fechas y Decimal
+    if isinstance(value, (datetime, Decimal)):
+        return _encoder.default(value)
+    return value
+
+
+def export_line(columns, row):
+    return _encoder.encode(dict(zip(columns, row)))
+
+
+def _csv_value(value):
+    value = export_value(value)
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return value
+
+
+def export_rows(spec, filters, after=None, limit=None, chunk_size=None):
+    queryset = spec.model.objects.filter(spec.filter_q(filters))
+    if after:
+        queryset = queryset.filter(pk__gt=after)
+    queryset = queryset.order_by("pk").values_list(*spec.fields)
+    if limit:
+        queryset = queryset[:limit]
+    return queryset.iterator(chunk_size=chunk_size or EXPORT_CHUNK_SIZE)
+
+
+class _Echo:
+    """
+    csv.writer escribe acá y recibimos la línea ya formateada.
+    """
+    def write(self, value):
+        return value
+
+
+def _batched(lines, size):
+    buffer = []
+    for line in lines:
+        buffer.append(line)
+        if len(buffer) >= size:
+            yield "".join(buffer)
+            buffer = []
+    if buffer:
+        yield "".join(buffer)
+
+
+def stream_csv(spec, rows, header=True):
+    writer = csv.writer(_Echo())
+
+    def lines():
+        if header:
+            yield writer.writerow(spec.columns)
+        for row in rows:
+            yield writer.writerow([_csv_value(value) for value in row])
+
+    return _batched(lines(), EXPORT_CHUNK_SIZE)
+
+
+def stream_ndjson(spec, rows):
+    def lines():
+        for row in rows:
+            yield export_line(spec.columns, row) + "\n"
+
+    return _batched(lines(), EXPORT_CHUNK_SIZE)
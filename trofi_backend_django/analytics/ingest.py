@@ -0,0 +1,420 @@
+"""
+Ingesta diferida (write-behind) para el tráfico de sync.
+
+Con ANALYTICS_INGEST_MODE activo las vistas de sync validan el pedido, lo
+agregan a una cola durable en un SQLite local (ANALYTICS_INGEST_QUEUE_PATH)
+y responden 202 sin esperar a la base principal. El comando
+`manage.py drain_ingest_queue` vacía la cola por lotes: junta las
+actualizaciones repetidas de una misma clave en una sola escritura y las
+aplica con el mismo upsert en lote de los endpoints batch.
+
+Las bajas de reseñas y los cambios de job por id (PUT) también pasan por
+la cola, como operaciones ordenadas junto con los upserts de la misma
+clave: escribirlos directo perdería el orden frente a lo que todavía no
+se drenó (un DELETE de una reseña encolada que después reaparece).
+
+Un lote se borra de la cola solo después de escribirse; si el proceso se
+corta en el medio el lote se vuelve a aplicar, lo que es inocuo porque
+todas las escrituras son upserts. Los registros que fallan al aplicarse
+quedan en la tabla ingest_failed con sus errores.
+
+Como la base va atrasada respecto de la cola, un registro que referencia
+un job o usuario que todavía no se escribió se acepta si esa referencia
+está encolada (un job también por la clave nueva de un PUT encolado): el
+drenador aplica jobs, usuarios y reseñas en ese orden. Los PUT y las
+bajas de claves que no están ni en la base ni en la cola responden 404,
+igual que sin cola.
+"""
+import json
+import sqlite3
+import threading
+import time
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .cache import JOBS, invalidate_job_keys, invalidate_stats
+from .models import Job, UserAnalytics
+from .serializers import JobSyncSerializer, UserBatchSyncSerializer
+from .sync import JOB_BATCH, USER_BATCH, REVIEW_BATCH, run_batch, run_delete_batch, validate_batch
+
+
+UPSERT = "upsert"
+PATCH = "patch"
+DELETE = "delete"
+
+# Orden de aplicación: los usuarios referencian jobs y las reseñas, usuarios
+SPECS = {spec.name: spec for spec in (JOB_BATCH, USER_BATCH, REVIEW_BATCH)}
+
+NOT_FOUND = {"job": "Job no encontrado", "user": "Usuario no encontrado"}
+
+# Campos que referencian otro tipo de registro: {tipo: {campo: tipo referenciado}}
+REFERENCES = {
+    "user": {"job": "job"},
+    "review": {"reviewer": "user", "reviewed": "user"},
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS ingest_queue (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    op TEXT NOT NULL,
+    key TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    enqueued_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS ingest_failed (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    key TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    errors TEXT NOT NULL,
+    failed_at REAL NOT NULL
+);
+"""
+
+
+def ingest_enabled():
+    return getattr(settings, "ANALYTICS_INGEST_MODE", False)
+
+
+class IngestQueue:
+    """
+    Cola FIFO sobre sqlite3. Una conexión por hilo; WAL para que las
+    vistas puedan encolar mientras el drenador lee.
+    """
+
+    def __init__(self, path):
+        self.path = str(path)
+        self._local = threading.local()
+
+    @property
+    def connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(SCHEMA)
+            self._local.connection = connection
+        return connection
+
+    def push(self, kind, op, entries):
+        """
+        entries: lista de (clave, payload). Un solo commit para todas.
+        """
+        now = time.time()
+        rows = [
+            (kind, op, str(key), json.dumps(payload, cls=DjangoJSONEncoder), now)
+            for key, payload in entries
+        ]
+        with self.connection:
+            self.connection.executemany(
+                "INSERT INTO ingest_queue (kind, op, key, payload, enqueued_at) VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+
+    def peek(self, limit):
+        cursor = self.connection.execute(
+            "SELECT seq, kind, op, key, payload FROM ingest_queue ORDER BY seq LIMIT ?",
+            (limit,),
+        )
+        return [(seq, kind, op, key, json.loads(payload)) for seq, kind, op, key, payload in cursor]
+
+    def ack(self, last_seq):
+        with self.connection:
+            self.connection.execute("DELETE FROM ingest_queue WHERE seq <= ?", (last_seq,))
+
+    def fail(self, kind, failures):
+        now = time.time()
+        with self.connection:
+            self.connection.executemany(
+                "INSERT INTO ingest_failed (kind, key, payload, errors, failed_at) VALUES (?, ?, ?, ?, ?)",
+                [
+                    (kind, str(key), json.dumps(payload, cls=DjangoJSONEncoder),
+                     json.dumps(errors, cls=DjangoJSONEncoder), now)
+                    for key, payload, errors in failures
+                ],
+            )
+
+    def queued_keys(self, kind, keys):
+        keys = [str(key) for key in keys]
+        if not keys:
+            return set()
+        placeholders = ", ".join("?" * len(keys))
+        cursor = self.connection.execute(
+            f"SELECT DISTINCT key FROM ingest_queue WHERE kind = ? AND key IN ({placeholders})",
+            (kind, *keys),
+        )
+        return {key for key, in cursor}
+
+    def renamed_keys(self, kind, field, keys):
+        """
+        De keys, las que un patch encolado pone como nuevo valor de field.
+        """
+        keys = [str(key) for key in keys]
+        if not keys:
+            return set()
+        placeholders = ", ".join("?" * len(keys))
+        cursor = self.connection.execute(
+            f"SELECT DISTINCT json_extract(payload, '$.' || ?) AS renamed FROM ingest_queue "
+            f"WHERE kind = ? AND op = ? AND renamed IN ({placeholders})",
+            (field, kind, PATCH, *keys),
+        )
+        return {key for key, in cursor}
+
+    def size(self):
+        return self.connection.execute("SELECT COUNT(*) FROM ingest_queue").fetchone()[0]
+
+
+_queue = None
+
+
+def get_queue():
+    global _queue
+    path = settings.ANALYTICS_INGEST_QUEUE_PATH
+    if _queue is None or _queue.path != str(path):
+        _queue = IngestQueue(path)
+    return _queue
+
+
+# ===========================
+# ENCOLAR (desde las vistas)
+# ===========================
+
+def known_keys(spec, keys):
+    """
+    De keys, las que existen en la base o están en la cola.
+    """
+    keys = list(dict.fromkeys(str(key) for key in keys))
+    lookup = {f"{spec.key_field}__in": keys}
+    known = set(spec.model.objects.filter(**lookup).values_list(spec.key_field, flat=True))
+    known |= get_queue().queued_keys(spec.name, [key for key in keys if key not in known])
+    return known
+
+
+def _queued_reference(kind, key):
+    queue = get_queue()
+    if queue.queued_keys(kind, [key]):
+        return True
+    # Un PUT encolado que cambia el firebase_key: el job va a existir con la clave nueva
+    return kind == JOB_BATCH.name and bool(queue.renamed_keys(kind, JOB_BATCH.key_field, [key]))
+
+
+def _without_queued(kind, record, errors, serializer_class, partial=False):
+    """
+    Los errores del registro sin las referencias que ya están en la cola,
+    o None si no queda ninguno. El registro se vuelve a validar con esas
+    referencias en None, porque el primer error de referencia puede tapar
+    los demás (el job se resuelve antes de validar los campos).
+    """
+    references = REFERENCES.get(kind, {})
+    if not isinstance(record, dict):
+        return errors
+    satisfied = [
+        field for field in errors
+        if field in references and isinstance(record.get(field), str) and record[field]
+        and _queued_reference(references[field], record[field])
+    ]
+    if not satisfied:
+        return errors
+
+    retry = serializer_class(data={**record, **dict.fromkeys(satisfied)}, partial=partial)
+    remaining = {} if retry.is_valid() else {
+        field: field_errors for field, field_errors in retry.errors.items() if field not in satisfied
+    }
+    # La existencia de los usuarios de una reseña no la valida el
+    # serializer: las que no están en la cola conservan su error
+    for field in errors:
+        if field in references and field not in satisfied:
+            remaining.setdefault(field, errors[field])
+    return remaining or None
+
+
+def enqueue_records(spec, records):
+    """
+    Valida los registros y encola los válidos como upserts.
+    Devuelve la lista de resultados por ítem, como run_batch.
+    """
+    results, _ = validate_batch(spec, records)
+
+    for result in results:
+        if result["ok"]:
+            continue
+        index = result["index"]
+        errors = _without_queued(spec.name, records[index], result["errors"], spec.serializer_class)
+        if errors is None:
+            results[index] = {"index": index, "ok": True, "key": records[index][spec.key_field]}
+        else:
+            result["errors"] = errors
+
+    # Se encolan en orden de llegada; las claves repetidas se juntan al drenar
+    get_queue().push(
+        spec.name, UPSERT,
+        [(result["key"], records[result["index"]]) for result in results if result["ok"]],
+    )
+    return results
+
+
+def enqueue_user_patch(uid, data):
+    """
+    Valida una actualización parcial de usuario y la encola. El usuario
+    tiene que existir o estar en la cola (ver known_keys).
+    Devuelve los errores de validación, o None si se encoló.
+    """
+    # Sin el validador de unicidad de uid: el usuario puede existir (o
+    # estar en la cola) y al drenar la clave sale de la URL, como en el sync en lote
+    serializer = UserBatchSyncSerializer(data=data, partial=True)
+    if not serializer.is_valid():
+        errors = _without_queued(USER_BATCH.name, data, serializer.errors, UserBatchSyncSerializer, partial=True)
+        if errors:
+            return errors
+    get_queue().push(USER_BATCH.name, PATCH, [(uid, data)])
+    return None
+
+
+def enqueue_job_patch(job, data):
+    """
+    Valida el cambio de un job existente (PUT por id) y lo encola bajo su
+    firebase_key actual; si cambia la clave, el drenador lo renombra.
+    Devuelve los errores de validación, o None si se encoló.
+    """
+    serializer = JobSyncSerializer(job, data=data, partial=True)
+    if not serializer.is_valid():
+        return serializer.errors
+    payload = {field: serializer.validated_data[field] for field in ("firebase_key", "name")}
+    get_queue().push(JOB_BATCH.name, PATCH, [(job.firebase_key, payload)])
+    return None
+
+
+def enqueue_review_deletes(ids):
+    """
+    Encola la baja de reseñas. Devuelve (encoladas, inexistentes): no
+    existen las que no están ni en la base ni en la cola.
+    """
+    ids = list(dict.fromkeys(str(pk) for pk in ids))
+    known = known_keys(REVIEW_BATCH, ids)
+
+    queued = [pk for pk in ids if pk in known]
+    get_queue().push(REVIEW_BATCH.name, DELETE, [(pk, {}) for pk in queued])
+    return queued, [pk for pk in ids if pk not in known]
+
+
+# ===========================
+# DRENAR (comando de management)
+# ===========================
+
+def coalesce(rows):
+    """
+    Agrupa por tipo y clave respetando el orden de llegada: un upsert o
+    una baja reemplazan todo lo anterior y un patch se mezcla sobre lo que
+    haya. Devuelve {kind: {key: (op, payload)}}.
+    """
+    grouped = {kind: {} for kind in SPECS}
+    for _, kind, op, key, payload in rows:
+        pending = grouped[kind]
+        if op == PATCH and key in pending and pending[key][0] != DELETE:
+            pending[key][1].update(payload)
+        else:
+            pending[key] = (op, dict(payload))
+    return grouped
+
+
+def _current_user_records(uids):
+    """
+    Usuarios existentes en el formato del endpoint de sync (job como firebase_key).
+    """
+    rows = (
+        UserAnalytics.objects
+        .filter(pk__in=uids)
+        .values("uid", "name", "email", "is_worker", "created_at", "job__firebase_key")
+    )
+    records = {}
+    for row in rows:
+        row["job"] = row.pop("job__firebase_key")
+        records[row["uid"]] = row
+    return records
+
+
+def _current_job_records(keys):
+    return {
+        row["firebase_key"]: row
+        for row in Job.objects.filter(firebase_key__in=keys).values("firebase_key", "name")
+    }
+
+
+def _rename_jobs(renames):
+    """
+    Aplica los cambios de firebase_key encolados por PUT, con la misma
+    validación. Devuelve las fallas como (clave, registro, errores).
+    """
+    failures = []
+    for key, record in renames:
+        job = Job.objects.filter(firebase_key=key).first()
+        serializer = JobSyncSerializer(job, data=record, partial=True) if job else None
+        if serializer is None or not serializer.is_valid():
+            failures.append((key, record, serializer.errors if serializer else {"error": "Job no encontrado"}))
+            continue
+        serializer.save()
+        invalidate_job_keys([key, record["firebase_key"]])
+        invalidate_stats(JOBS)
+    return failures
+
+
+def drain_once(batch_size=1000):
+    """
+    Aplica hasta batch_size entradas de la cola.
+    Devuelve (entradas leídas, registros escritos, registros fallidos).
+    """
+    queue = get_queue()
+    rows = queue.peek(batch_size)
+    if not rows:
+        return 0, 0, 0
+
+    written = failed = 0
+    for kind, pending in coalesce(rows).items():
+        if not pending:
+            continue
+        spec = SPECS[kind]
+
+        failures = []
+        patched = [key for key, (op, _) in pending.items() if op == PATCH]
+        current_records = _current_job_records if kind == JOB_BATCH.name else _current_user_records
+        current = current_records(patched) if patched else {}
+
+        keys = []
+        records = []
+        deletes = []
+        renames = []
+        for key, (op, payload) in pending.items():
+            if op == DELETE:
+                deletes.append(key)
+                continue
+            if op == PATCH:
+                if key not in current:
+                    failures.append((key, payload, {"error": NOT_FOUND[kind]}))
+                    continue
+                payload = {**current[key], **payload}
+            if kind == JOB_BATCH.name and payload[spec.key_field] != key:
+                # Job renombrado por PUT: primero se escribe con la clave vieja
+                renames.append((key, payload))
+            keys.append(key)
+            records.append({**payload, spec.key_field: key})
+
+        for key, record, result in zip(keys, records, run_batch(spec, records)):
+            if result["ok"]:
+                written += 1
+            else:
+                failures.append((key, record, result["errors"]))
+                renames = [(old, payload) for old, payload in renames if old != key]
+
+        failures += _rename_jobs(renames)
+        if deletes:
+            deleted, _ = run_delete_batch(deletes)
+            written += len(deleted)
+
+        if failures:
+            queue.fail(kind, failures)
+            failed += len(failures)
+
+    queue.ack(rows[-1][0])
+    return len(rows), written, failed
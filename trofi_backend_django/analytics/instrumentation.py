@@ -0,0 +1,215 @@
+"""
+Instrumentación por request: consultas, tiempo de base y SQL más lento.
+
+record_query se instala en cada conexión nueva (connection_created, en
+AnalyticsConfig.ready) con el mismo mecanismo que connection.execute_wrapper
+y anota en las estadísticas del request actual, que viven en un
+ContextVar. Así también se cuentan las consultas que las vistas async
+corren en otros hilos. Fuera de un request solo cuesta leer el ContextVar.
+
+InstrumentationMiddleware publica cada request:
+
+- header Server-Timing (db, db-slowest y total), visible en el navegador;
+- una línea de log JSON en el logger "analytics.requests" (WARNING si
+  supera ANALYTICS_SLOW_REQUEST_MS);
+- histogramas acumulados por endpoint en /api/metrics/, en formato de
+  texto de Prometheus. Son por proceso: con varios workers cada uno expone
+  los suyos.
+
+En respuestas en streaming solo se cuenta lo ejecutado antes de empezar a
+enviar el cuerpo.
+"""
+import json
+import logging
+import threading
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+
+logger = logging.getLogger("analytics.requests")
+
+_current = ContextVar("analytics_request_stats", default=None)
+
+
+class RequestStats:
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.slowest_time = 0.0
+        self.slowest_sql = None
+        # Las vistas async pueden consultar desde varios hilos a la vez
+        self._lock = threading.Lock()
+
+    def add(self, sql, duration):
+        with self._lock:
+            self.queries += 1
+            self.db_time += duration
+            if duration > self.slowest_time:
+                self.slowest_time = duration
+                self.slowest_sql = sql
+
+
+def record_query(execute, sql, params, many, context):
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.add(sql, time.perf_counter() - started)
+
+
+def install_query_recorder(sender, connection, **kwargs):
+    # La lista persiste entre reconexiones del mismo DatabaseWrapper
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+# ===========================
+# MÉTRICAS (formato Prometheus)
+# ===========================
+
+class Histogram:
+
+    def __init__(self, name, help_text, buckets, labels):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self.labels = labels
+        # {valores de labels: [conteo por bucket..., suma, total]}
+        self.series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, label_values, value):
+        with self._lock:
+            row = self.series.get(label_values)
+            if row is None:
+                row = self.series[label_values] = [0] * len(self.buckets) + [0.0, 0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    row[index] += 1
+            row[-2] += value
+            row[-1] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {key: list(row) for key, row in self.series.items()}
+        for label_values, row in sorted(series.items()):
+            labels = ",".join(
+                f'{label}="{_escape(value)}"' for label, value in zip(self.labels, label_values)
+            )
+            for bound, count in zip(self.buckets, row):
+                lines.append(f'{self.name}_bucket{{{labels},le="{bound}"}} {count}')
+            lines.append(f'{self.name}_bucket{{{labels},le="+Inf"}} {row[-1]}')
+            lines.append(f"{self.name}_sum{{{labels}}} {row[-2]}")
+            lines.append(f"{self.name}_count{{{labels}}} {row[-1]}")
+        return "\n".join(lines)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+REQUEST_SECONDS = Histogram(
+    "trofi_request_duration_seconds", "Duración total del request.",
+    SECONDS_BUCKETS, ("endpoint", "method", "status"),
+)
+REQUEST_DB_SECONDS = Histogram(
+    "trofi_request_db_seconds", "Tiempo de base de datos por request.",
+    SECONDS_BUCKETS, ("endpoint", "method"),
+)
+REQUEST_QUERIES = Histogram(
+    "trofi_request_queries", "Consultas SQL por request.",
+    QUERY_BUCKETS, ("endpoint", "method"),
+)
+
+METRICS = (REQUEST_SECONDS, REQUEST_DB_SECONDS, REQUEST_QUERIES)
+
+
+def render_metrics():
+    return "\n".join(metric.render() for metric in METRICS) + "\n"
+
+
+# ===========================
+# MIDDLEWARE
+# ===========================
+
+def _endpoint(request):
+    match = getattr(request, "resolver_match", None)
+    return match.route if match is not None else "unmatched"
+
+
+class InstrumentationMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+
+        stats = RequestStats()
+        token = _current.set(stats)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.publish(request, response, stats)
+        return response
+
+    async def __acall__(self, request):
+        stats = RequestStats()
+        token = _current.set(stats)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.publish(request, response, stats)
+        return response
+
+    def publish(self, request, response, stats):
+        total = time.perf_counter() - stats.started
+        endpoint = _endpoint(request)
+        method = request.method
+
+        response["Server-Timing"] = ", ".join([
+            f'db;dur={stats.db_time * 1000:.2f};desc="{stats.queries} queries"',
+            f"db-slowest;dur={stats.slowest_time * 1000:.2f}",
+            f"total;dur={total * 1000:.2f}",
+        ])
+
+        REQUEST_SECONDS.observe((endpoint, method, str(response.status_code)), total)
+        REQUEST_DB_SECONDS.observe((endpoint, method), stats.db_time)
+        REQUEST_QUERIES.observe((endpoint, method), stats.queries)
+
+        slow = total * 1000 >= getattr(settings, "ANALYTICS_SLOW_REQUEST_MS", 500)
+        level = logging.WARNING if slow else logging.INFO
+        if logger.isEnabledFor(level):
+            logger.log(level, json.dumps({
+                "method": method,
+                "path": request.path,
+                "endpoint": endpoint,
+                "status": response.status_code,
+                "duration_ms": round(total * 1000, 2),
+                "db_ms": round(stats.db_time * 1000, 2),
+                "queries": stats.queries,
+                "slowest_ms": round(stats.slowest_time * 1000, 2),
+                # Sin parámetros: el SQL con %s no expone datos
+                "slowest_sql": stats.slowest_sql[:500] if stats.slowest_sql else None,
+            }))
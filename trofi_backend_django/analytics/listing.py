@@ -0,0 +1,127 @@
+"""
+Listados paginados de usuarios y reseñas para Express.
+
+La paginación es por cursor (keyset) sobre (created_at, pk), del más nuevo
+al más viejo: el cursor guarda la última fila devuelta y la página
+siguiente arranca con un WHERE sobre esos valores, sin OFFSET. Con los
+índices compuestos de los modelos (filtro + created_at + pk) cualquier
+página cuesta lo mismo que la primera.
+"""
+import base64
+import json
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import ValidationError
+
+from .export import USERS_EXPORT, REVIEWS_EXPORT
+from .params import bool_param, decimal_param, job_param, query_params
+
+
+LIST_DEFAULT_LIMIT = 50
+LIST_MAX_LIMIT = 500
+
+
+def encode_cursor(created_at, pk):
+    raw = json.dumps([created_at.isoformat(), pk]).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def decode_cursor(cursor):
+    """
+    (created_at, pk) de la última fila de la página anterior.
+    """
+    try:
+        created_at, pk = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        created_at = parse_datetime(created_at)
+    except (ValueError, TypeError):
+        created_at = None
+    if created_at is None:
+        raise ValidationError({"cursor": "Cursor inválido"})
+    return created_at, pk
+
+
+def after_cursor_q(created_at, pk):
+    """
+    Filas posteriores al cursor en orden (-created_at, -pk).
+
+    Equivale a created_at < c OR (created_at = c AND pk < p), escrito con
+    un rango sobre created_at para que la base lo resuelva con el índice.
+    """
+    return Q(created_at__lte=created_at) & ~Q(created_at=created_at, pk__gte=pk)
+
+
+def users_filter_q(request):
+    """
+    ?is_worker=true|false y ?job= (id de Django o firebase_key).
+    """
+    q = Q()
+    is_worker = bool_param(request, "is_worker")
+    if is_worker is not None:
+        # IN en lugar de =: Django escribe is_worker = true como la columna
+        # sola y SQLite no la usa como prefijo de (is_worker, created_at, uid)
+        q &= Q(is_worker__in=[is_worker])
+    job_id = job_param(request)
+    if job_id is not None:
+        q &= Q(job_id=job_id)
+    return q
+
+
+def reviews_filter_q(request):
+    """
+    ?reviewed=, ?reviewer= (uid), ?job= (oficio del reseñado) y
+    ?min_score= / ?max_score= (inclusive).
+    """
+    params = query_params(request)
+    q = Q()
+    for field in ("reviewed", "reviewer"):
+        if params.get(field):
+            q &= Q(**{f"{field}_id": params[field]})
+    job_id = job_param(request)
+    if job_id is not None:
+        # Copia del oficio en la reseña: sin JOIN a usuarios
+        q &= Q(job_id=job_id)
+    min_score = decimal_param(request, "min_score")
+    if min_score is not None:
+        q &= Q(score__gte=min_score)
+    max_score = decimal_param(request, "max_score")
+    if max_score is not None:
+        q &= Q(score__lte=max_score)
+    return q
+
+
+class ListSpec:
+
+    def __init__(self, export, filter_q):
+        # Mismas columnas que la exportación
+        self.export = export
+        self.filter_q = filter_q
+
+
+USERS_LIST = ListSpec(USERS_EXPORT, users_filter_q)
+REVIEWS_LIST = ListSpec(REVIEWS_EXPORT, reviews_filter_q)
+
+
+def list_page(spec, request, limit, cursor=None):
+    """
+    Una página de resultados y el cursor de la siguiente (None si es la última).
+    """
+    export = spec.export
+    queryset = export.model.objects.filter(spec.filter_q(request))
+    if cursor:
+        queryset = queryset.filter(after_cursor_q(*decode_cursor(cursor)))
+
+    # Una fila de más para saber si hay otra página
+    rows = list(
+        queryset
+        .order_by("-created_at", "-pk")
+        .values_list(*export.fields)[:limit + 1]
+    )
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = dict(zip(export.columns, rows[-1]))
+        next_cursor = encode_cursor(last["created_at"], rows[-1][0])
+
+    return [dict(zip(export.columns, row)) for row in rows], next_cursor
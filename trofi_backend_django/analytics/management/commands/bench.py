@@ -0,0 +1,99 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from analytics.bench import (
+    HTTPTransport,
+    TestClientTransport,
+    compare,
+    generate,
+    run_benchmarks,
+    temporary_database,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Siembra datos de prueba en una base temporal y mide throughput, "
+        "latencias p50/p95/p99 y consultas por request de los endpoints de "
+        "sync y de estadísticas. Con --output guarda el resultado en JSON y "
+        "con --compare lo contrasta con uno anterior."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--jobs", type=int, default=20)
+        parser.add_argument("--users", type=int, default=2000)
+        parser.add_argument("--reviews", type=int, default=20000)
+        parser.add_argument("--seed", type=int, default=0,
+                            help="Semilla del generador (default 0).")
+        parser.add_argument("--iterations", type=int, default=50,
+                            help="Requests medidos por endpoint (default 50).")
+        parser.add_argument("--warmup", type=int, default=5,
+                            help="Requests previos sin medir (default 5).")
+        parser.add_argument("--only", default="",
+                            help="Endpoints o grupos a medir, separados por comas (ej: stats,sync.review).")
+        parser.add_argument("--with-cache", action="store_true",
+                            help="Medir con el caché de respuestas de estadísticas activo.")
+        parser.add_argument("--base-url",
+                            help="Medir contra un servidor levantado en lugar del test client. "
+                                 "Usa la base de ese servidor (sembrala antes con --seed-only).")
+        parser.add_argument("--seed-only", action="store_true",
+                            help="Sembrar la base configurada (no una temporal) y terminar.")
+        parser.add_argument("--output", help="Archivo JSON donde guardar el resultado.")
+        parser.add_argument("--compare", help="JSON de una corrida anterior para detectar regresiones.")
+        parser.add_argument("--threshold", type=float, default=0.2,
+                            help="Empeoramiento de p95 tolerado con --compare (default 0.2 = 20%%).")
+
+    def handle(self, *args, **options):
+        sizes = {key: options[key] for key in ("jobs", "users", "reviews")}
+        only = [name.strip() for name in options["only"].split(",") if name.strip()]
+
+        if options["seed_only"]:
+            dataset = generate(seed=options["seed"], **sizes)
+            self.stdout.write(self.style.SUCCESS(f"Datos sembrados: {dataset}"))
+            return
+
+        if options["base_url"]:
+            result = run_benchmarks(
+                HTTPTransport(options["base_url"]), options["users"],
+                options["iterations"], options["warmup"], only,
+            )
+        else:
+            result = self.run_local(sizes, only, options)
+
+        self.report(result)
+
+        if options["output"]:
+            with open(options["output"], "w") as file:
+                json.dump(result, file, indent=2)
+            self.stdout.write(f"Resultado guardado en {options['output']}")
+
+        if options["compare"]:
+            with open(options["compare"]) as file:
+                previous = json.load(file)
+            regressions = compare(previous, result, options["threshold"])
+            for line in regressions:
+                self.stderr.write(f"REGRESIÓN {line}")
+            if regressions:
+                raise CommandError(f"{len(regressions)} regresiones contra {options['compare']}")
+            self.stdout.write(self.style.SUCCESS("Sin regresiones"))
+
+    def run_local(self, sizes, only, options):
+        with temporary_database():
+            dataset = generate(seed=options["seed"], **sizes)
+            cache_alias = None if not options["with_cache"] else "analytics"
+            with override_settings(ANALYTICS_STATS_CACHE_ALIAS=cache_alias):
+                return run_benchmarks(
+                    TestClientTransport(), sizes["users"],
+                    options["iterations"], options["warmup"], only, dataset,
+                )
+
+    def report(self, result):
+        self.stdout.write(f"{'endpoint':<22}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'queries':>9}{'errores':>9}")
+        for name, row in result["endpoints"].items():
+            queries = "-" if row["queries"] is None else row["queries"]
+            self.stdout.write(
+                f"{name:<22}{row['throughput']:>9}{row['p50_ms']:>9}{row['p95_ms']:>9}"
+                f"{row['p99_ms']:>9}{queries:>9}{row['errors']:>9}"
+            )
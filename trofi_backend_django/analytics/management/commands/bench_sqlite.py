@@ -0,0 +1,133 @@
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client, override_settings
+
+from analytics.bench import generate
+
+
+PROFILES = {
+    "default": {"DB_SQLITE_TUNED": "0"},
+    "tuned": {"DB_SQLITE_TUNED": "1"},
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide lecturas y escrituras concurrentes sobre SQLite con el perfil por "
+        "defecto y con DB_SQLITE_TUNED=1. Cada perfil corre en un proceso aparte "
+        "sobre una base temporal."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--duration", type=float, default=10.0,
+                            help="Segundos de carga por perfil (default 10).")
+        parser.add_argument("--writers", type=int, default=4,
+                            help="Hilos que sincronizan reseñas (default 4).")
+        parser.add_argument("--readers", type=int, default=4,
+                            help="Hilos que piden el dashboard (default 4).")
+        parser.add_argument("--users", type=int, default=200,
+                            help="Usuarios sembrados antes de medir (default 200).")
+        parser.add_argument("--profiles", default=",".join(PROFILES),
+                            help="Perfiles a medir, separados por comas.")
+        # Uso interno: corre la carga en este proceso e imprime JSON
+        parser.add_argument("--run", action="store_true", help="(interno)")
+
+    def handle(self, *args, **options):
+        if options["run"]:
+            self.stdout.write(json.dumps(run_load(options)))
+            return
+
+        for profile in options["profiles"].split(","):
+            result = self.run_profile(profile.strip(), options)
+            self.stdout.write(
+                f"{profile:<8} escrituras/s {result['writes_per_sec']:>8.1f}   "
+                f"lecturas/s {result['reads_per_sec']:>8.1f}   errores {result['errors']}"
+            )
+
+    def run_profile(self, profile, options):
+        with tempfile.TemporaryDirectory() as tmp:
+            env = {
+                **os.environ,
+                **PROFILES[profile],
+                "DB_ENGINE": "sqlite",
+                "DB_NAME": os.path.join(tmp, "bench.sqlite3"),
+            }
+            command = [
+                sys.executable, sys.argv[0], "bench_sqlite", "--run",
+                "--duration", str(options["duration"]),
+                "--writers", str(options["writers"]),
+                "--readers", str(options["readers"]),
+                "--users", str(options["users"]),
+            ]
+            output = subprocess.run(command, env=env, check=True, capture_output=True, text=True).stdout
+        return json.loads(output.strip().splitlines()[-1])
+
+
+def run_load(options):
+    call_command("migrate", verbosity=0)
+    generate(jobs=10, users=options["users"], reviews=options["users"] * 5)
+
+    deadline = time.monotonic() + options["duration"]
+    counts = {"writes": 0, "reads": 0, "errors": 0}
+    lock = threading.Lock()
+
+    def record(kind, ok):
+        with lock:
+            counts[kind if ok else "errors"] += 1
+
+    def writer(number):
+        client = Client(HTTP_HOST="localhost", raise_request_exception=False)
+        rnd = random.Random(number)
+        sequence = 0
+        while time.monotonic() < deadline:
+            reviewer, reviewed = rnd.sample(range(options["users"]), 2)
+            response = client.post("/api/sync/reviews/", {
+                "id": f"bench-{number}-{sequence}",
+                "reviewer": f"bench-user-{reviewer}",
+                "reviewed": f"bench-user-{reviewed}",
+                "score": rnd.randint(2, 10) / 2,
+                "description": "benchmark",
+                "created_at": "2024-06-01T00:00:00Z",
+            }, content_type="application/json")
+            record("writes", response.status_code in (200, 201))
+            sequence += 1
+
+    def reader():
+        client = Client(HTTP_HOST="localhost", raise_request_exception=False)
+        while time.monotonic() < deadline:
+            response = client.get("/api/analytics/dashboard/")
+            record("reads", response.status_code == 200)
+
+    def run(target, *args):
+        try:
+            target(*args)
+        finally:
+            connection.close()
+
+    # Sin caché de respuestas: cada lectura va a la base
+    with override_settings(ANALYTICS_STATS_CACHE_ALIAS=None):
+        threads = [threading.Thread(target=run, args=(writer, n)) for n in range(options["writers"])]
+        threads += [threading.Thread(target=run, args=(reader,)) for _ in range(options["readers"])]
+        started = time.monotonic()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.monotonic() - started
+
+    return {
+        **counts,
+        "seconds": round(elapsed, 2),
+        "writes_per_sec": counts["writes"] / elapsed,
+        "reads_per_sec": counts["reads"] / elapsed,
+    }
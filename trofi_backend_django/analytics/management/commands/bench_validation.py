@@ -0,0 +1,32 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from analytics.bench import generate, temporary_database, validation_benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        "Microbenchmark de la validación de sync: serializer de DRF por "
+        "registro contra FastValidator, sobre una base temporal."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--records", type=int, default=2000,
+                            help="Registros por tipo (default 2000).")
+        parser.add_argument("--repeat", type=int, default=5,
+                            help="Pasadas por camino; se toma la mejor (default 5).")
+        parser.add_argument("--output", help="Archivo JSON donde guardar el resultado.")
+
+    def handle(self, *args, **options):
+        with temporary_database():
+            dataset = generate(jobs=5, users=500, reviews=0)
+            results = validation_benchmark(dataset["users"], options["records"], options["repeat"])
+
+        self.stdout.write(f"{'tipo':<8}{'serializer µs':>15}{'rápido µs':>12}{'speedup':>10}")
+        for name, row in results.items():
+            self.stdout.write(f"{name:<8}{row['serializer_us']:>15}{row['fast_us']:>12}{row['speedup']:>9}x")
+
+        if options["output"]:
+            with open(options["output"], "w") as file:
+                json.dump(results, file, indent=2)
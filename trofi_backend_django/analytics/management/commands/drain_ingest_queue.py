@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from analytics.ingest import drain_once, get_queue
+
+
+class Command(BaseCommand):
+    help = (
+        "Aplica en la base los registros encolados por las vistas de sync "
+        "(ANALYTICS_INGEST_MODE), juntando las actualizaciones repetidas."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000,
+                            help="Entradas de la cola por lote (default 1000).")
+        parser.add_argument("--loop", action="store_true",
+                            help="No terminar al vaciar la cola: seguir esperando entradas nuevas.")
+        parser.add_argument("--interval", type=float, default=1.0,
+                            help="Segundos de espera con la cola vacía en modo --loop (default 1).")
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+
+        while True:
+            read, written, failed = drain_once(batch_size)
+            if read:
+                self.stdout.write(
+                    f"{read} entradas → {written} escrituras, {failed} fallidas "
+                    f"({get_queue().size()} pendientes)"
+                )
+                continue
+
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
+
+        self.stdout.write(self.style.SUCCESS("Cola de ingesta vacía"))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from analytics.rollups import rebuild_rollups, rebuild_user_series
+
+
+class Command(BaseCommand):
+    help = "Recalcula desde cero los rollups de analytics (usuarios por día y por mes, oficios, reseñas por usuario y scores) y la muestra de reseñas."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--series", action="store_true",
+                            help="Reconstruir solo las series de altas de usuarios (por día y por mes).")
+
+    def handle(self, *args, **options):
+        if options["series"]:
+            rebuild_user_series()
+            self.stdout.write(self.style.SUCCESS("Series de usuarios reconstruidas"))
+            return
+
+        rebuild_rollups()
+        self.stdout.write(self.style.SUCCESS("Rollups reconstruidos"))
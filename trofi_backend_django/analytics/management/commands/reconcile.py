@@ -0,0 +1,64 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.exceptions import ValidationError
+
+from analytics.reconcile import MAX_DEPTH, PREFIX, RECONCILE_SPECS, apply_ranges, checksums, diff_ranges
+
+
+class Command(BaseCommand):
+    help = (
+        "Checksums por rango de jobs, usuarios o reseñas para reconciliar con "
+        "Express/Firebase. Con --compare lista los rangos distintos y con "
+        "--apply escribe el contenido completo de los rangos de un archivo."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("kind", choices=list(RECONCILE_SPECS))
+        parser.add_argument("--by", default=PREFIX,
+                            help="prefix (default), day o month.")
+        parser.add_argument("--depth", type=int, default=2,
+                            help=f"Caracteres del prefijo con --by prefix (1 a {MAX_DEPTH}, default 2).")
+        parser.add_argument("--within", help="Solo las filas de este rango (para bajar de nivel).")
+        parser.add_argument("--compare", metavar="ARCHIVO",
+                            help="JSON con los checksums del otro lado (la respuesta del endpoint o su lista ranges).")
+        parser.add_argument("--apply", metavar="ARCHIVO",
+                            help='JSON {"ranges": {rango: [registros]}} a aplicar.')
+
+    def handle(self, *args, **options):
+        spec = RECONCILE_SPECS[options["kind"]]
+        by, depth = options["by"], options["depth"]
+
+        try:
+            if options["apply"]:
+                ranges = load(options["apply"])
+                ranges = ranges.get("ranges", ranges) if isinstance(ranges, dict) else ranges
+                for result in apply_ranges(spec, by, ranges, depth):
+                    self.stdout.write(
+                        f"{result['range']}: {result['synced']} escritos, {result['failed']} fallidos, "
+                        f"{result['deleted']} borrados → {result['count']} filas, {result['checksum']}"
+                    )
+                return
+
+            local = checksums(spec, by, depth, options["within"])
+        except ValidationError as exc:
+            raise CommandError(json.dumps(exc.detail, ensure_ascii=False))
+
+        if not options["compare"]:
+            self.stdout.write(json.dumps(local, indent=2))
+            return
+
+        source = load(options["compare"])
+        source = source.get("ranges", []) if isinstance(source, dict) else source
+        differing = diff_ranges(source, local)
+        for label in differing:
+            self.stdout.write(label)
+        self.stdout.write(self.style.SUCCESS(f"{len(differing)} rangos distintos de {len(local)} locales"))
+
+
+def load(path):
+    try:
+        with open(path) as file:
+            return json.load(file)
+    except (OSError, ValueError) as exc:
+        raise CommandError(f"No se pudo leer {path}: {exc}")
@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from analytics.snapshots import build_snapshot
+
+
+class Command(BaseCommand):
+    help = (
+        "Precalcula las estadísticas sin filtros (usuarios, trabajadores y "
+        "reseñas) y reemplaza el snapshot que sirven las vistas de analytics."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--loop", action="store_true",
+                            help="No terminar: generar un snapshot nuevo cada --interval segundos.")
+        parser.add_argument("--interval", type=float, default=60.0,
+                            help="Segundos entre snapshots en modo --loop (default 60).")
+
+    def handle(self, *args, **options):
+        while True:
+            started = time.monotonic()
+            snapshot = build_snapshot()
+            self.stdout.write(self.style.SUCCESS(
+                f"Snapshot generado {snapshot.generated_at:%Y-%m-%d %H:%M:%S} "
+                f"({snapshot.duration_ms:.1f} ms)"
+            ))
+
+            if not options["loop"]:
+                break
+            time.sleep(max(0.0, options["interval"] - (time.monotonic() - started)))
@@ -0,0 +1,123 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:56
+
+from collections import Counter, defaultdict
+from datetime import date
+from decimal import Decimal
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+
+def fill_rollups(apps, schema_editor):
+    # Lo mismo que analytics.rollups.rebuild_rollups, con los modelos de esta migración
+    UserAnalytics = apps.get_model('analytics', 'UserAnalytics')
+    ReviewAnalytics = apps.get_model('analytics', 'ReviewAnalytics')
+    UserMonthRollup = apps.get_model('analytics', 'UserMonthRollup')
+    JobRollup = apps.get_model('analytics', 'JobRollup')
+    UserReviewRollup = apps.get_model('analytics', 'UserReviewRollup')
+    ScoreRollup = apps.get_model('analytics', 'ScoreRollup')
+
+    months = Counter()
+    for created_at, is_worker in UserAnalytics.objects.values_list('created_at', 'is_worker').iterator():
+        local = timezone.localtime(created_at) if timezone.is_aware(created_at) else created_at
+        months[date(local.year, local.month, 1), is_worker] += 1
+    UserMonthRollup.objects.bulk_create([
+        UserMonthRollup(month=month, workers=months[month, True], clients=months[month, False])
+        for month in {month for month, _ in months}
+    ])
+
+    jobs = defaultdict(lambda: {'workers': 0, 'review_count': 0, 'score_sum': Decimal(0)})
+    workers_by_job = (
+        UserAnalytics.objects
+        .filter(is_worker=True, job__isnull=False)
+        .values('job_id')
+        .annotate(total=Count('uid'))
+        .order_by()
+    )
+    for row in workers_by_job:
+        jobs[row['job_id']]['workers'] = row['total']
+    reviews_by_job = (
+        ReviewAnalytics.objects
+        .filter(reviewed__job__isnull=False)
+        .values('reviewed__job_id')
+        .annotate(total=Count('id'), score_sum=Sum('score'))
+        .order_by()
+    )
+    for row in reviews_by_job:
+        jobs[row['reviewed__job_id']]['review_count'] = row['total']
+        jobs[row['reviewed__job_id']]['score_sum'] = row['score_sum']
+    JobRollup.objects.bulk_create([JobRollup(job_id=job_id, **values) for job_id, values in jobs.items()])
+
+    reviews_by_user = (
+        ReviewAnalytics.objects
+        .values('reviewed_id')
+        .annotate(total=Count('id'), score_sum=Sum('score'))
+        .order_by()
+    )
+    UserReviewRollup.objects.bulk_create(
+        [
+            UserReviewRollup(user_id=row['reviewed_id'], review_count=row['total'], score_sum=row['score_sum'])
+            for row in reviews_by_user.iterator()
+        ],
+        batch_size=1000,
+    )
+
+    by_score = ReviewAnalytics.objects.values('score').annotate(total=Count('id')).order_by()
+    ScoreRollup.objects.bulk_create([ScoreRollup(score=row['score'], count=row['total']) for row in by_score])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0003_alter_job_options_alter_reviewanalytics_options_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JobRollup',
+            fields=[
+                ('job', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='rollup', serialize=False, to='analytics.job')),
+                ('workers', models.IntegerField(default=0)),
+                ('review_count', models.IntegerField(default=0)),
+                ('score_sum', models.DecimalField(decimal_places=1, default=0, max_digits=14)),
+            ],
+            options={
+                'db_table': 'analytics_rollup_job',
+            },
+        ),
+        migrations.CreateModel(
+            name='ScoreRollup',
+            fields=[
+                ('score', models.DecimalField(decimal_places=1, max_digits=2, primary_key=True, serialize=False)),
+                ('count', models.IntegerField(default=0)),
+            ],
+            options={
+                'db_table': 'analytics_rollup_score',
+            },
+        ),
+        migrations.CreateModel(
+            name='UserMonthRollup',
+            fields=[
+                ('month', models.DateField(primary_key=True, serialize=False)),
+                ('workers', models.IntegerField(default=0)),
+                ('clients', models.IntegerField(default=0)),
+            ],
+            options={
+                'db_table': 'analytics_rollup_user_month',
+            },
+        ),
+        migrations.CreateModel(
+            name='UserReviewRollup',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='review_rollup', serialize=False, to='analytics.useranalytics')),
+                ('review_count', models.IntegerField(default=0)),
+                ('score_sum', models.DecimalField(decimal_places=1, default=0, max_digits=12)),
+            ],
+            options={
+                'db_table': 'analytics_rollup_user_review',
+            },
+        ),
+        migrations.RunPython(fill_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:57
+
+from decimal import Decimal
+
+from django.db import migrations, models
+
+
+def fill_avg_score(apps, schema_editor):
+    UserReviewRollup = apps.get_model('analytics', 'UserReviewRollup')
+    rollups = list(UserReviewRollup.objects.filter(review_count__gt=0))
+    for rollup in rollups:
+        rollup.avg_score = (rollup.score_sum / rollup.review_count).quantize(Decimal('0.0001'))
+    UserReviewRollup.objects.bulk_update(rollups, ['avg_score'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0004_rollups'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userreviewrollup',
+            name='avg_score',
+            field=models.DecimalField(blank=True, decimal_places=4, max_digits=6, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='userreviewrollup',
+            index=models.Index(fields=['avg_score', 'review_count'], name='analytics_r_avg_sco_1dfb37_idx'),
+        ),
+        migrations.RunPython(fill_avg_score, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0005_user_review_avg_score'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='reviewanalytics',
+            index=models.Index(fields=['reviewed', 'created_at', 'id'], name='analytics_r_reviewe_55311f_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reviewanalytics',
+            index=models.Index(fields=['reviewer', 'created_at', 'id'], name='analytics_r_reviewe_345b04_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='useranalytics',
+            index=models.Index(fields=['is_worker', 'job', 'created_at', 'uid'], name='analytics_u_is_work_452d0c_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='useranalytics',
+            index=models.Index(fields=['job', 'created_at', 'uid'], name='analytics_u_job_id_23d32e_idx'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:09
+
+from collections import Counter
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def fill_user_days(apps, schema_editor):
+    UserAnalytics = apps.get_model('analytics', 'UserAnalytics')
+    UserDayRollup = apps.get_model('analytics', 'UserDayRollup')
+
+    counts = Counter()
+    for created_at, is_worker in UserAnalytics.objects.values_list('created_at', 'is_worker').iterator():
+        day = timezone.localtime(created_at).date() if timezone.is_aware(created_at) else created_at.date()
+        counts[day, is_worker] += 1
+
+    days = {day for day, _ in counts}
+    UserDayRollup.objects.bulk_create(
+        [UserDayRollup(day=day, workers=counts[day, True], clients=counts[day, False]) for day in days],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0006_list_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserDayRollup',
+            fields=[
+                ('day', models.DateField(primary_key=True, serialize=False)),
+                ('workers', models.IntegerField(default=0)),
+                ('clients', models.IntegerField(default=0)),
+            ],
+            options={
+                'db_table': 'analytics_rollup_user_day',
+            },
+        ),
+        migrations.RunPython(fill_user_days, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:11
+
+from django.db import migrations, models
+
+
+# Índices con columnas incluidas (INCLUDE) para que las estadísticas
+# filtradas se resuelvan solo con el índice. Son exclusivos de PostgreSQL:
+# en SQLite la migración no hace nada.
+COVERING_INDEXES = {
+    # Histograma de scores y top de trabajadores por rango de fechas
+    'analytics_review_created_cov': 'analytics_review (created_at) INCLUDE (score, reviewed_id)',
+    # Promedio por usuario reseñado
+    'analytics_review_reviewed_cov': 'analytics_review (reviewed_id, created_at) INCLUDE (score)',
+    # Serie de usuarios por rango de fechas
+    'analytics_user_created_cov': 'analytics_user (created_at) INCLUDE (is_worker, job_id)',
+}
+
+
+def create_covering_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, definition in COVERING_INDEXES.items():
+        schema_editor.execute(f'CREATE INDEX IF NOT EXISTS {name} ON {definition}')
+
+
+def drop_covering_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name in COVERING_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0007_user_day_rollup'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='useranalytics',
+            index=models.Index(condition=models.Q(('is_worker', True)), fields=['job', 'created_at'], name='analytics_user_worker_job_idx'),
+        ),
+        migrations.RunPython(create_covering_indexes, drop_covering_indexes),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:28
+
+import hashlib
+import heapq
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def fill_review_sample(apps, schema_editor):
+    ReviewAnalytics = apps.get_model('analytics', 'ReviewAnalytics')
+    ReviewSample = apps.get_model('analytics', 'ReviewSample')
+    ReviewSampleState = apps.get_model('analytics', 'ReviewSampleState')
+
+    # Misma prioridad que analytics.sampling.priority
+    def priority(review_id):
+        return int.from_bytes(hashlib.sha256(str(review_id).encode()).digest()[:8], 'big') / 2**64
+
+    size = getattr(settings, 'ANALYTICS_REVIEW_SAMPLE_SIZE', 10000)
+    rows = ReviewAnalytics.objects.values_list('id', 'reviewed_id', 'score', 'created_at').iterator(chunk_size=2000)
+    smallest = heapq.nsmallest(size + 1, ((priority(row[0]), row) for row in rows), key=lambda item: item[0])
+
+    threshold = 1.0
+    if len(smallest) > size:
+        threshold = smallest.pop()[0]
+
+    ReviewSample.objects.bulk_create(
+        [
+            ReviewSample(id=review_id, priority=value, reviewed_id=reviewed_id, score=score, created_at=created_at)
+            for value, (review_id, reviewed_id, score, created_at) in smallest
+        ],
+        batch_size=1000,
+    )
+    ReviewSampleState.objects.create(pk=1, threshold=threshold)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0008_stats_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReviewSampleState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('threshold', models.FloatField(default=1.0)),
+            ],
+            options={
+                'db_table': 'analytics_review_sample_state',
+            },
+        ),
+        migrations.CreateModel(
+            name='ReviewSample',
+            fields=[
+                ('id', models.CharField(max_length=100, primary_key=True, serialize=False)),
+                ('priority', models.FloatField(db_index=True)),
+                ('score', models.DecimalField(decimal_places=1, max_digits=2)),
+                ('created_at', models.DateTimeField()),
+                ('reviewed', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='analytics.useranalytics')),
+            ],
+            options={
+                'db_table': 'analytics_review_sample',
+            },
+        ),
+        migrations.RunPython(fill_review_sample, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:33
+
+import rest_framework.utils.encoders
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0009_review_sample'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StatsSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('payload', models.JSONField(encoder=rest_framework.utils.encoders.JSONEncoder)),
+                ('generated_at', models.DateTimeField(db_index=True)),
+                ('duration_ms', models.FloatField()),
+            ],
+            options={
+                'db_table': 'analytics_stats_snapshot',
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def fill_review_jobs(apps, schema_editor):
+    ReviewAnalytics = apps.get_model('analytics', 'ReviewAnalytics')
+    UserAnalytics = apps.get_model('analytics', 'UserAnalytics')
+    ReviewAnalytics.objects.update(
+        job_id=Subquery(UserAnalytics.objects.filter(pk=OuterRef('reviewed_id')).values('job_id'))
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0010_stats_snapshot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reviewanalytics',
+            name='job',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='reviews', to='analytics.job'),
+        ),
+        migrations.AddIndex(
+            model_name='reviewanalytics',
+            index=models.Index(fields=['job', 'created_at', 'score'], name='analytics_r_job_id_dee81d_idx'),
+        ),
+        migrations.RunPython(fill_review_jobs, migrations.RunPython.noop),
+    ]
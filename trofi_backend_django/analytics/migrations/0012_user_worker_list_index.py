@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0011_review_job'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='useranalytics',
+            index=models.Index(fields=['is_worker', 'created_at', 'uid'], name='analytics_u_is_work_38762b_idx'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:01
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def fill_sample_jobs(apps, schema_editor):
+    ReviewAnalytics = apps.get_model('analytics', 'ReviewAnalytics')
+    ReviewSample = apps.get_model('analytics', 'ReviewSample')
+    ReviewSample.objects.update(
+        job_id=Subquery(ReviewAnalytics.objects.filter(pk=OuterRef('pk')).values('job_id'))
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0012_user_worker_list_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reviewsample',
+            name='job',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='analytics.job'),
+        ),
+        migrations.RunPython(fill_sample_jobs, migrations.RunPython.noop),
+    ]
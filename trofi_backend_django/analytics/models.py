@@ -1,4 +1,7 @@
+from decimal import Decimal
+
 from django.db import models
+from rest_framework.utils.encoders import JSONEncoder
 
 
 class Job(models.Model):
@@ -42,6 +45,16 @@ class UserAnalytics(models.Model):
         indexes = [
             models.Index(fields=['is_worker']),
             models.Index(fields=['created_at']),
+            # Listados por cursor: filtro + (created_at, pk)
+            models.Index(fields=['is_worker', 'job', 'created_at', 'uid']),
+            models.Index(fields=['is_worker', 'created_at', 'uid']),
+            models.Index(fields=['job', 'created_at', 'uid']),
+            # Trabajadores por oficio (estadísticas filtradas): solo workers
+            models.Index(
+                fields=['job', 'created_at'],
+                condition=models.Q(is_worker=True),
+                name='analytics_user_worker_job_idx',
+            ),
         ]
 
     def __str__(self):
@@ -67,12 +80,200 @@ class ReviewAnalytics(models.Model):
     description = models.TextField()
     created_at = models.DateTimeField()
 
+    # Copia del oficio actual del usuario reseñado, mantenida por
+    # analytics.rollups: el detalle por oficio lee solo sus reseñas
+    job = models.ForeignKey(
+        Job,
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name="reviews",
+        # Lo cubre el índice (job, created_at, score)
+        db_index=False,
+    )
+
     class Meta:
         db_table = 'analytics_review'
         indexes = [
             models.Index(fields=['score']),
             models.Index(fields=['created_at']),
+            # Listados por cursor: filtro + (created_at, pk)
+            models.Index(fields=['reviewed', 'created_at', 'id']),
+            models.Index(fields=['reviewer', 'created_at', 'id']),
+            # Detalle por oficio: volumen por mes e histograma sin leer la tabla
+            models.Index(fields=['job', 'created_at', 'score']),
         ]
 
     def __str__(self):
         return f"Review {self.id} ({self.score}★)"
+
+
+# ===============================
+# ROLLUPS (mantenidos en cada sync)
+# ===============================
+
+class UserMonthRollup(models.Model):
+    """
+    Altas de usuarios por mes, separadas en trabajadores y clientes.
+    """
+    month = models.DateField(primary_key=True)
+    workers = models.IntegerField(default=0)
+    clients = models.IntegerField(default=0)
+
+    class Meta:
+        db_table = 'analytics_rollup_user_month'
+
+    def __str__(self):
+        return f"{self.month:%Y-%m}: {self.workers + self.clients}"
+
+
+class UserDayRollup(models.Model):
+    """
+    Altas de usuarios por día. Sirve las series por día y semana y los
+    rangos de fechas sin recorrer la tabla de usuarios.
+    """
+    day = models.DateField(primary_key=True)
+    workers = models.IntegerField(default=0)
+    clients = models.IntegerField(default=0)
+
+    class Meta:
+        db_table = 'analytics_rollup_user_day'
+
+    def __str__(self):
+        return f"{self.day:%Y-%m-%d}: {self.workers + self.clients}"
+
+
+class JobRollup(models.Model):
+    """
+    Por oficio: trabajadores y suma/cantidad de scores recibidos por
+    usuarios de ese oficio.
+    """
+    job = models.OneToOneField(
+        Job,
+        primary_key=True,
+        on_delete=models.CASCADE,
+        related_name="rollup",
+    )
+    workers = models.IntegerField(default=0)
+    review_count = models.IntegerField(default=0)
+    score_sum = models.DecimalField(max_digits=14, decimal_places=1, default=0)
+
+    class Meta:
+        db_table = 'analytics_rollup_job'
+
+    def __str__(self):
+        return f"Job {self.job_id}: {self.workers} workers, {self.review_count} reviews"
+
+
+class UserReviewRollup(models.Model):
+    """
+    Reseñas recibidas por usuario (cantidad y suma de scores).
+    """
+    user = models.OneToOneField(
+        UserAnalytics,
+        primary_key=True,
+        on_delete=models.CASCADE,
+        related_name="review_rollup",
+    )
+    review_count = models.IntegerField(default=0)
+    score_sum = models.DecimalField(max_digits=12, decimal_places=1, default=0)
+    # score_sum / review_count, indexado para el ranking de trabajadores
+    avg_score = models.DecimalField(max_digits=6, decimal_places=4, null=True, blank=True)
+
+    class Meta:
+        db_table = 'analytics_rollup_user_review'
+        indexes = [
+            models.Index(fields=['avg_score', 'review_count']),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id}: {self.review_count} reviews"
+
+    def update_average(self):
+        self.avg_score = (
+            (self.score_sum / self.review_count).quantize(Decimal("0.0001"))
+            if self.review_count else None
+        )
+
+
+class ScoreRollup(models.Model):
+    """
+    Histograma de scores (una fila por valor posible).
+    """
+    score = models.DecimalField(max_digits=2, decimal_places=1, primary_key=True)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        db_table = 'analytics_rollup_score'
+
+    def __str__(self):
+        return f"{self.score}★: {self.count}"
+
+
+# ===============================
+# MUESTRA DE RESEÑAS (?mode=approx)
+# ===============================
+
+class ReviewSample(models.Model):
+    """
+    Reseñas de la muestra: las de prioridad menor que el umbral de
+    ReviewSampleState (ver analytics.sampling). Copia los campos por los
+    que se filtra para que la consulta recorra solo la muestra.
+    """
+    id = models.CharField(max_length=100, primary_key=True)
+    priority = models.FloatField(db_index=True)
+    reviewed = models.ForeignKey(
+        UserAnalytics,
+        # La muestra la mantiene track_reviews: sin CASCADE borrar usuarios no la recorre
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name="+",
+    )
+    score = models.DecimalField(max_digits=2, decimal_places=1)
+    created_at = models.DateTimeField()
+    # Copia de ReviewAnalytics.job: el filtro por oficio no pasa por usuarios
+    job = models.ForeignKey(
+        Job,
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name="+",
+    )
+
+    class Meta:
+        db_table = 'analytics_review_sample'
+
+    def __str__(self):
+        return f"{self.id} ({self.priority:.6f})"
+
+
+class ReviewSampleState(models.Model):
+    """
+    Una sola fila con el umbral actual, que es también la probabilidad de
+    que una reseña esté en la muestra.
+    """
+    threshold = models.FloatField(default=1.0)
+
+    class Meta:
+        db_table = 'analytics_review_sample_state'
+
+    def __str__(self):
+        return f"Umbral {self.threshold:.6f}"
+
+
+class StatsSnapshot(models.Model):
+    """
+    Payloads de estadísticas precalculados por `manage.py snapshot_stats`
+    (ver analytics.snapshots). Las vistas sirven el más reciente.
+    """
+    # Secciones del dashboard sin filtros, codificadas igual que las respuestas de DRF
+    payload = models.JSONField(encoder=JSONEncoder)
+    generated_at = models.DateTimeField(db_index=True)
+    # Cuánto tardó el cálculo, en milisegundos
+    duration_ms = models.FloatField()
+
+    class Meta:
+        db_table = 'analytics_stats_snapshot'
+
+    def __str__(self):
+        return f"Snapshot {self.generated_at:%Y-%m-%d %H:%M:%S}"
@@ -0,0 +1,149 @@
+"""
+Lectura de parámetros de query string para las vistas de analytics.
+Los errores se levantan como ValidationError para que DRF responda 400.
+Sirven tanto para requests de DRF como para HttpRequest de Django (vistas async).
+"""
+from datetime import datetime, time, timedelta
+from decimal import Decimal, InvalidOperation
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework.exceptions import ValidationError
+
+from .cache import get_job_pk
+from .models import Job
+
+
+# ?job=id:<pk> fuerza la búsqueda por id de Django
+JOB_ID_PREFIX = "id:"
+
+
+def query_params(request):
+    return getattr(request, "query_params", request.GET)
+
+
+def int_param(request, name, default, minimum=None, maximum=None):
+    raw = query_params(request).get(name)
+    if raw in (None, ""):
+        return default
+
+    try:
+        value = int(raw)
+    except ValueError:
+        raise ValidationError({name: "Debe ser un número entero"})
+
+    if minimum is not None and value < minimum:
+        raise ValidationError({name: f"Debe ser mayor o igual a {minimum}"})
+    if maximum is not None and value > maximum:
+        raise ValidationError({name: f"Debe ser menor o igual a {maximum}"})
+    return value
+
+
+def list_param(request, name, choices):
+    """
+    Lista separada por comas; sin el parámetro devuelve todas las opciones.
+    """
+    raw = query_params(request).get(name)
+    if raw in (None, ""):
+        return list(choices)
+
+    values = [value.strip() for value in raw.split(",") if value.strip()]
+    invalid = [value for value in values if value not in choices]
+    if invalid:
+        raise ValidationError({name: f"Valores inválidos: {', '.join(invalid)}. Opciones: {', '.join(choices)}"})
+    return list(dict.fromkeys(values))
+
+
+def datetime_param(request, name, end_of_day=False):
+    """
+    Fecha (YYYY-MM-DD) o fecha y hora ISO 8601, como datetime aware.
+    Con end_of_day una fecha sola se toma como el inicio del día siguiente,
+    para usarla como límite exclusivo e incluir el día completo.
+    """
+    raw = query_params(request).get(name)
+    if raw in (None, ""):
+        return None
+
+    try:
+        value = parse_datetime(raw)
+        if value is None:
+            day = parse_date(raw)
+            if day is None:
+                raise ValueError
+            if end_of_day:
+                day += timedelta(days=1)
+            value = datetime.combine(day, time.min)
+    except ValueError:
+        raise ValidationError({name: "Fecha inválida, se espera YYYY-MM-DD o ISO 8601"})
+
+    if timezone.is_naive(value):
+        value = timezone.make_aware(value)
+    return value
+
+
+def choice_param(request, name, choices, default):
+    raw = query_params(request).get(name)
+    if raw in (None, ""):
+        return default
+    if raw not in choices:
+        raise ValidationError({name: f"Opciones: {', '.join(choices)}"})
+    return raw
+
+
+def bool_param(request, name):
+    """
+    true/false (o 1/0); sin el parámetro devuelve None.
+    """
+    raw = query_params(request).get(name)
+    if raw in (None, ""):
+        return None
+    value = raw.lower()
+    if value in ("true", "1"):
+        return True
+    if value in ("false", "0"):
+        return False
+    raise ValidationError({name: "Debe ser true o false"})
+
+
+def decimal_param(request, name):
+    raw = query_params(request).get(name)
+    if raw in (None, ""):
+        return None
+    try:
+        return Decimal(raw)
+    except InvalidOperation:
+        raise ValidationError({name: "Debe ser un número"})
+
+
+def _existing_job_pk(raw):
+    if not raw.isdigit():
+        return None
+    return Job.objects.filter(pk=int(raw)).values_list("pk", flat=True).first()
+
+
+def find_job_pk(value):
+    """
+    pk del job por firebase_key o, con el prefijo id:, por id de Django.
+    Un valor de solo dígitos que no es un firebase_key se toma como id,
+    como antes. None si no existe.
+    """
+    if value.startswith(JOB_ID_PREFIX):
+        return _existing_job_pk(value[len(JOB_ID_PREFIX):])
+    job_id = get_job_pk(value)
+    if job_id is None and value.isdigit():
+        job_id = _existing_job_pk(value)
+    return job_id
+
+
+def job_param(request, name="job"):
+    """
+    Job por firebase_key o por id de Django (ver find_job_pk); devuelve el
+    pk o None si no se pasó.
+    """
+    raw = query_params(request).get(name)
+    if raw in (None, ""):
+        return None
+    job_id = find_job_pk(raw)
+    if job_id is None:
+        raise ValidationError({name: "El job no existe en Django"})
+    return job_id
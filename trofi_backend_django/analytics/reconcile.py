@@ -0,0 +1,287 @@
+"""
+Reconciliación por rangos contra Express/Firebase.
+
+Cada tabla se parte en rangos por prefijo de la clave (by=prefix, con
+depth caracteres) o por ventana de created_at en UTC (by=day o by=month;
+los jobs no tienen fecha). Por rango se informa la cantidad de filas y un
+checksum que no depende del orden: la suma módulo 2^64 de los primeros 8
+bytes (big endian) del SHA-256 de cada fila. La fila es la misma línea que
+produce la exportación NDJSON, sin el salto de línea, así Express calcula
+lo mismo de su lado sin pedir los datos.
+
+Express compara, baja de nivel con within= en los rangos distintos si
+hace falta y manda el contenido completo de los que siguen distintos.
+apply_ranges escribe esos registros con el sync en lote y borra las filas
+del rango que no vinieron, manteniendo los rollups. Solo viajan los
+rangos que cambiaron, no la tabla entera.
+"""
+import hashlib
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.functions import Substr
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import ValidationError
+
+from .cache import JOBS, USERS, invalidate_job_keys, invalidate_stats
+from .export import EXPORT_CHUNK_SIZE, JOBS_EXPORT, USERS_EXPORT, REVIEWS_EXPORT, export_line
+from .models import Job, UserAnalytics, ReviewAnalytics
+from .rollups import track_users
+from .sync import BATCH_CHUNK_SIZE, JOB_BATCH, USER_BATCH, REVIEW_BATCH, chunked, delete_reviews, run_batch
+
+
+PREFIX = "prefix"
+DAY = "day"
+MONTH = "month"
+
+WINDOW_FORMATS = {DAY: "%Y-%m-%d", MONTH: "%Y-%m"}
+
+# Las claves de Firebase tienen 20 (push ids) o 28 caracteres (uids)
+MAX_DEPTH = 32
+
+
+class ReconcileSpec:
+
+    def __init__(self, name, export, batch, delete, dated=True):
+        self.name = name
+        # Columnas de la fila (las de la exportación) y sync en lote para aplicar
+        self.export = export
+        self.batch = batch
+        # Borra las filas que sobran de un rango, manteniendo los rollups
+        self.delete = delete
+        self.dated = dated
+
+    @property
+    def key_field(self):
+        return self.batch.key_field
+
+    def methods(self):
+        return [PREFIX, DAY, MONTH] if self.dated else [PREFIX]
+
+
+def delete_jobs(keys):
+    # Los usuarios quedan sin oficio (SET_NULL) antes de borrar el job
+    jobs = list(Job.objects.filter(firebase_key__in=keys).values_list("pk", flat=True))
+    uids = UserAnalytics.objects.filter(job__in=jobs).values_list("uid", flat=True)
+    with transaction.atomic():
+        with track_users(uids):
+            UserAnalytics.objects.filter(job__in=jobs).update(job=None)
+        Job.objects.filter(pk__in=jobs).delete()
+        invalidate_stats(JOBS, USERS)
+    invalidate_job_keys(keys)
+
+
+def delete_users(uids):
+    # Primero las reseñas dadas y recibidas (CASCADE), para descontarlas de los rollups
+    review_ids = list(
+        ReviewAnalytics.objects
+        .filter(Q(reviewer__in=uids) | Q(reviewed__in=uids))
+        .values_list("id", flat=True)
+    )
+    with transaction.atomic():
+        delete_reviews(review_ids)
+        with track_users(uids):
+            UserAnalytics.objects.filter(uid__in=uids).delete()
+            invalidate_stats(USERS)
+
+
+RECONCILE_JOBS = ReconcileSpec("jobs", JOBS_EXPORT, JOB_BATCH, delete_jobs, dated=False)
+RECONCILE_USERS = ReconcileSpec("users", USERS_EXPORT, USER_BATCH, delete_users)
+RECONCILE_REVIEWS = ReconcileSpec("reviews", REVIEWS_EXPORT, REVIEW_BATCH, delete_reviews)
+
+RECONCILE_SPECS = {spec.name: spec for spec in (RECONCILE_JOBS, RECONCILE_USERS, RECONCILE_REVIEWS)}
+
+
+# ===========================
+# RANGOS
+# ===========================
+
+def check_method(spec, by, depth=None):
+    if by not in spec.methods():
+        raise ValidationError({"by": f"Opciones: {', '.join(spec.methods())}"})
+    if by == PREFIX and (not isinstance(depth, int) or not 1 <= depth <= MAX_DEPTH):
+        raise ValidationError({"depth": f"Debe ser un entero entre 1 y {MAX_DEPTH}"})
+
+
+def _parse_window(label, fmt):
+    try:
+        start = datetime.strptime(label, fmt).replace(tzinfo=dt_timezone.utc)
+    except (TypeError, ValueError):
+        return None
+    # strptime acepta "2024-6": solo vale el formato exacto
+    return start if start.strftime(fmt) == label else None
+
+
+def window_bounds(label):
+    """
+    [inicio, fin) en UTC de "YYYY-MM-DD", "YYYY-MM" o "YYYY".
+    """
+    start = _parse_window(label, "%Y-%m-%d")
+    if start is not None:
+        return start, start + timedelta(days=1)
+    start = _parse_window(label, "%Y-%m")
+    if start is not None:
+        return start, start.replace(year=start.year + start.month // 12, month=start.month % 12 + 1)
+    start = _parse_window(label, "%Y")
+    if start is not None:
+        return start, start.replace(year=start.year + 1)
+    raise ValidationError({"within": f"Ventana inválida: {label!r}"})
+
+
+def check_label(by, label):
+    if by == PREFIX:
+        valid = isinstance(label, str) and label != ""
+    else:
+        valid = _parse_window(label, WINDOW_FORMATS[by]) is not None
+    if not valid:
+        raise ValidationError({"ranges": f"Rango inválido para by={by}: {label!r}"})
+
+
+def range_label(value, by, depth):
+    """
+    Rango al que pertenece una fila: su clave o su created_at.
+    """
+    if by == PREFIX:
+        return str(value)[:depth]
+    return value.astimezone(dt_timezone.utc).strftime(WINDOW_FORMATS[by])
+
+
+def filter_range(queryset, spec, by, label, depth=None):
+    """
+    Filas de un rango. Para prefijos también sirve un label más corto que
+    depth (within=): las claves que empiezan con él.
+    """
+    if by == PREFIX:
+        if depth is not None and len(label) < depth:
+            # Solo las claves más cortas que depth caen en este rango
+            return queryset.filter(**{spec.key_field: label})
+        # Substr compara exacto (LIKE es case-insensitive en SQLite)
+        return queryset.alias(range_prefix=Substr(spec.key_field, 1, len(label))).filter(range_prefix=label)
+
+    start, end = window_bounds(label)
+    return queryset.filter(created_at__gte=start, created_at__lt=end)
+
+
+# ===========================
+# CHECKSUMS
+# ===========================
+
+def row_digest(columns, row):
+    line = export_line(columns, row)
+    return int.from_bytes(hashlib.sha256(line.encode()).digest()[:8], "big")
+
+
+def _summarize(spec, queryset, by, depth):
+    export = spec.export
+    position = export.fields.index(spec.key_field if by == PREFIX else "created_at")
+    rows = queryset.values_list(*export.fields).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+    ranges = {}
+    for row in rows:
+        label = range_label(row[position], by, depth)
+        count, total = ranges.get(label, (0, 0))
+        ranges[label] = (count + 1, (total + row_digest(export.columns, row)) % 2**64)
+
+    return [
+        {"range": label, "count": count, "checksum": f"{total:016x}"}
+        for label, (count, total) in sorted(ranges.items())
+    ]
+
+
+def checksums(spec, by, depth=None, within=None):
+    """
+    [{"range", "count", "checksum"}] ordenados por rango. Recorre la tabla
+    (o solo within) una vez, en streaming.
+    """
+    check_method(spec, by, depth)
+    queryset = spec.export.model.objects.all()
+    if within:
+        queryset = filter_range(queryset, spec, by, within)
+    return _summarize(spec, queryset, by, depth)
+
+
+def diff_ranges(source, target):
+    """
+    Rangos con distinto checksum o que están de un solo lado.
+    """
+    source = {item["range"]: item["checksum"] for item in source}
+    target = {item["range"]: item["checksum"] for item in target}
+    return sorted(label for label in source.keys() | target.keys() if source.get(label) != target.get(label))
+
+
+# ===========================
+# APLICAR RANGOS
+# ===========================
+
+def _record_label(spec, record, by, depth):
+    if not isinstance(record, dict):
+        return None
+    if by == PREFIX:
+        key = record.get(spec.key_field)
+        return range_label(key, by, depth) if key not in (None, "") else None
+    created_at = record.get("created_at")
+    value = parse_datetime(created_at) if isinstance(created_at, str) else None
+    if value is None or value.tzinfo is None:
+        return None
+    return range_label(value, by, depth)
+
+
+def apply_range(spec, by, label, records, depth=None):
+    """
+    Deja el rango igual a records: upsert en lote y baja de las filas del
+    rango que no vinieron. Si algún registro falla no se borra nada.
+    """
+    results = [None] * len(records)
+    accepted = []
+    for index, record in enumerate(records):
+        if _record_label(spec, record, by, depth) != label:
+            results[index] = {"index": index, "ok": False, "errors": {
+                "non_field_errors": [f"El registro no pertenece al rango {label!r}"],
+            }}
+        else:
+            accepted.append(index)
+
+    for index, result in zip(accepted, run_batch(spec.batch, [records[index] for index in accepted])):
+        results[index] = {**result, "index": index}
+
+    failed = [result for result in results if not result["ok"]]
+    deleted = 0
+    if not failed:
+        received = {str(result["key"]) for result in results}
+        current = filter_range(spec.export.model.objects.all(), spec, by, label, depth)
+        extra = [key for key in current.values_list(spec.key_field, flat=True) if str(key) not in received]
+        for keys in chunked(extra, BATCH_CHUNK_SIZE):
+            spec.delete(keys)
+        deleted = len(extra)
+
+    return {
+        "range": label,
+        "received": len(records),
+        "synced": len(records) - len(failed),
+        "failed": len(failed),
+        "deleted": deleted,
+        "errors": failed,
+    }
+
+
+def apply_ranges(spec, by, ranges, depth=None):
+    """
+    ranges: {rango: [registros]} con el contenido completo de cada rango.
+    Devuelve un resultado por rango, con el checksum después de aplicar.
+    """
+    check_method(spec, by, depth)
+    if not isinstance(ranges, dict) or not all(isinstance(records, list) for records in ranges.values()):
+        raise ValidationError({"ranges": "Se esperaba un objeto {rango: [registros]}"})
+    for label in ranges:
+        check_label(by, label)
+
+    results = []
+    for label, records in ranges.items():
+        result = apply_range(spec, by, label, records, depth)
+        current = filter_range(spec.export.model.objects.all(), spec, by, label, depth)
+        summary = _summarize(spec, current, by, depth) or [{"count": 0, "checksum": f"{0:016x}"}]
+        result["count"] = summary[0]["count"]
+        result["checksum"] = summary[0]["checksum"]
+        results.append(result)
+    return results
@@ -0,0 +1,22 @@
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from rest_framework.renderers import BaseRenderer
+
+
+class NDJSONRenderer(BaseRenderer):
+    """
+    Las exportaciones se escriben en streaming sin pasar por el renderer;
+    render() solo se usa para respuestas de error, como una línea JSON.
+    """
+    media_type = "application/x-ndjson"
+    format = "ndjson"
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return json.dumps(data, cls=DjangoJSONEncoder, ensure_ascii=False).encode(self.charset) + b"\n"
+
+
+class CSVRenderer(NDJSONRenderer):
+    media_type = "text/csv"
+    format = "csv"
@@ -0,0 +1,342 @@
+"""
+Rollups de analytics mantenidos de forma incremental.
+
+Cada escritura de sync se envuelve en track_users()/track_reviews(): se
+toma una foto de las filas afectadas antes y después de escribir y la
+diferencia se aplica como delta sobre las tablas de rollup, dentro de la
+misma transacción. Así las vistas de estadísticas leen pocas filas (una por
+día, mes, oficio o score) en lugar de recorrer todas las tablas.
+
+También mantienen ReviewAnalytics.job, la copia del oficio del usuario
+reseñado que usa el detalle por oficio: se completa al escribir reseñas y
+se corrige cuando un usuario cambia de oficio.
+
+Si los rollups se desincronizan (o en la primera instalación) se
+reconstruyen desde cero con `manage.py rebuild_rollups`.
+"""
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import date
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import Count, OuterRef, Subquery, Sum
+from django.db.models.functions import TruncDay, TruncMonth
+from django.utils import timezone
+
+from .cache import JOBS, USERS, REVIEWS, invalidate_stats
+from .models import (
+    UserAnalytics,
+    ReviewAnalytics,
+    ReviewSample,
+    UserMonthRollup,
+    UserDayRollup,
+    JobRollup,
+    UserReviewRollup,
+    ScoreRollup,
+)
+from .sampling import rebuild_review_sample, update_sample
+
+
+def month_of(value):
+    """
+    Primer día del mes de un datetime (en la zona horaria actual, igual que TruncMonth).
+    """
+    if timezone.is_aware(value):
+        value = timezone.localtime(value)
+    return date(value.year, value.month, 1)
+
+
+def day_of(value):
+    """
+    Fecha local de un datetime, igual que TruncDay.
+    """
+    if timezone.is_aware(value):
+        value = timezone.localtime(value)
+    return value.date()
+
+
+class RollupDelta:
+    """
+    Acumula cambios por bucket y los aplica con pocas consultas por tabla.
+    """
+
+    def __init__(self):
+        self.months = defaultdict(lambda: {"workers": 0, "clients": 0})
+        self.days = defaultdict(lambda: {"workers": 0, "clients": 0})
+        self.jobs = defaultdict(lambda: {"workers": 0, "review_count": 0, "score_sum": Decimal(0)})
+        self.users = defaultdict(lambda: {"review_count": 0, "score_sum": Decimal(0)})
+        self.scores = defaultdict(lambda: {"count": 0})
+
+    def add_user(self, state, sign):
+        is_worker, job_id, created_at, review_count, score_sum = state
+
+        kind = "workers" if is_worker else "clients"
+        self.months[month_of(created_at)][kind] += sign
+        self.days[day_of(created_at)][kind] += sign
+
+        if job_id is not None:
+            job = self.jobs[job_id]
+            if is_worker:
+                job["workers"] += sign
+            # Las reseñas recibidas se agrupan por el oficio actual del usuario
+            job["review_count"] += sign * review_count
+            job["score_sum"] += sign * score_sum
+
+    def add_review(self, state, sign):
+        reviewed_id, job_id, score = state
+
+        self.scores[score]["count"] += sign
+
+        user = self.users[reviewed_id]
+        user["review_count"] += sign
+        user["score_sum"] += sign * score
+
+        if job_id is not None:
+            job = self.jobs[job_id]
+            job["review_count"] += sign
+            job["score_sum"] += sign * score
+
+    def apply(self):
+        _apply(UserMonthRollup, self.months)
+        _apply(UserDayRollup, self.days)
+        _apply(JobRollup, self.jobs)
+        _apply(UserReviewRollup, self.users)
+        _apply(ScoreRollup, self.scores)
+
+
+def _apply(model, deltas):
+    """
+    Suma los deltas a las filas del rollup, creándolas si no existen.
+    Tres consultas por tabla sin importar cuántos buckets cambien.
+    """
+    deltas = {
+        key: changes for key, changes in deltas.items()
+        if any(value != 0 for value in changes.values())
+    }
+    if not deltas:
+        return
+
+    pk_name = model._meta.pk.attname
+    model.objects.bulk_create(
+        [model(**{pk_name: key}) for key in deltas],
+        ignore_conflicts=True,
+    )
+
+    rows = model.objects.select_for_update().in_bulk(list(deltas))
+    fields = set()
+    for key, changes in deltas.items():
+        row = rows[key]
+        for field, value in changes.items():
+            setattr(row, field, getattr(row, field) + value)
+            fields.add(field)
+        if hasattr(row, "update_average"):
+            row.update_average()
+            fields.add("avg_score")
+
+    model.objects.bulk_update(list(rows.values()), sorted(fields))
+
+
+# ===========================
+# FOTOS ANTES / DESPUÉS
+# ===========================
+
+def _lock_keys(model, keys):
+    """
+    Serializa a quienes escriben las mismas claves hasta el fin de la
+    transacción, para que dos upserts simultáneos no tomen la misma foto de
+    antes y apliquen el delta dos veces. SELECT ... FOR UPDATE solo
+    bloquea filas que ya existen; en PostgreSQL un advisory lock por clave
+    cubre también las altas. Se toman en una sola consulta y en orden
+    (unnest respeta el del array), así dos lotes no se bloquean en cruz.
+    SQLite ya serializa las transacciones que escriben.
+    """
+    if connection.vendor != "postgresql" or not keys:
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT pg_advisory_xact_lock(hashtext(%s || k)) FROM unnest(%s::text[]) AS k",
+            [model._meta.db_table + ":", sorted({str(key) for key in keys})],
+        )
+
+
+def _user_states(uids, lock=False):
+    rows = UserAnalytics.objects.filter(pk__in=uids)
+    if lock:
+        # Solo las filas de usuarios: el LEFT JOIN al rollup no admite FOR UPDATE
+        rows = rows.select_for_update(of=("self",))
+    rows = rows.values_list(
+        "uid", "is_worker", "job_id", "created_at",
+        "review_rollup__review_count", "review_rollup__score_sum",
+    )
+    return {
+        uid: (is_worker, job_id, created_at, review_count or 0, score_sum or Decimal(0))
+        for uid, is_worker, job_id, created_at, review_count, score_sum in rows
+    }
+
+
+def _review_states(ids, lock=False):
+    rows = ReviewAnalytics.objects.filter(pk__in=ids)
+    if lock:
+        rows = rows.select_for_update(of=("self",))
+    rows = rows.values_list("id", "reviewed_id", "reviewed__job_id", "score")
+    return {pk: (reviewed_id, job_id, score) for pk, reviewed_id, job_id, score in rows}
+
+
+def _sync_review_jobs(queryset):
+    # Una sola UPDATE con el oficio actual de cada usuario reseñado
+    queryset.update(
+        job_id=Subquery(UserAnalytics.objects.filter(pk=OuterRef("reviewed_id")).values("job_id"))
+    )
+
+
+def _record(before, after, add):
+    delta = RollupDelta()
+    for key in before.keys() | after.keys():
+        old, new = before.get(key), after.get(key)
+        if old == new:
+            continue
+        if old is not None:
+            add(delta, old, -1)
+        if new is not None:
+            add(delta, new, 1)
+    delta.apply()
+
+
+@contextmanager
+def track_users(uids):
+    """
+    Envuelve una escritura de usuarios (alta, cambio o baja) y actualiza
+    los rollups con la diferencia. Abre su propia transacción.
+    """
+    uids = list(uids)
+    with transaction.atomic():
+        _lock_keys(UserAnalytics, uids)
+        before = _user_states(uids, lock=True)
+        yield
+        after = _user_states(uids)
+        _record(before, after, RollupDelta.add_user)
+
+        moved = [uid for uid, state in after.items() if uid in before and before[uid][1] != state[1]]
+        if moved:
+            _sync_review_jobs(ReviewAnalytics.objects.filter(reviewed__in=moved))
+            _sync_review_jobs(ReviewSample.objects.filter(reviewed__in=moved))
+
+
+@contextmanager
+def track_reviews(ids, deleting=False):
+    """
+    Igual que track_users, para reseñas. También mantiene la muestra de
+    analytics.sampling. Entrega la foto de antes: {id: estado} de las que
+    existían. Con deleting=True el bloque borra todas esas reseñas y la
+    foto de después (vacía) no se lee.
+    """
+    ids = list(ids)
+    with transaction.atomic():
+        _lock_keys(ReviewAnalytics, ids)
+        before = _review_states(ids, lock=True)
+        yield before
+        if deleting:
+            _record(before, {}, RollupDelta.add_review)
+        else:
+            _sync_review_jobs(ReviewAnalytics.objects.filter(pk__in=ids))
+            _record(before, _review_states(ids), RollupDelta.add_review)
+        update_sample(ids)
+
+
+# ===========================
+# RECONSTRUCCIÓN COMPLETA
+# ===========================
+
+@transaction.atomic
+def rebuild_rollups():
+    """
+    Recalcula todos los rollups (y el oficio copiado en las reseñas)
+    desde las tablas base.
+    """
+    invalidate_stats(USERS, REVIEWS, JOBS)
+
+    JobRollup.objects.all().delete()
+    UserReviewRollup.objects.all().delete()
+    ScoreRollup.objects.all().delete()
+
+    _sync_review_jobs(ReviewAnalytics.objects.all())
+    rebuild_user_series()
+
+    jobs = defaultdict(lambda: {"workers": 0, "review_count": 0, "score_sum": Decimal(0)})
+    workers_by_job = (
+        UserAnalytics.objects
+        .filter(is_worker=True, job__isnull=False)
+        .values("job_id")
+        .annotate(total=Count("uid"))
+    )
+    for row in workers_by_job:
+        jobs[row["job_id"]]["workers"] = row["total"]
+    reviews_by_job = (
+        ReviewAnalytics.objects
+        .filter(job__isnull=False)
+        .values("job_id")
+        .annotate(total=Count("id"), score_sum=Sum("score"))
+        .order_by()
+    )
+    for row in reviews_by_job:
+        jobs[row["job_id"]]["review_count"] = row["total"]
+        jobs[row["job_id"]]["score_sum"] = row["score_sum"]
+    JobRollup.objects.bulk_create(
+        [JobRollup(job_id=job_id, **values) for job_id, values in jobs.items()]
+    )
+
+    reviews_by_user = (
+        ReviewAnalytics.objects
+        .values("reviewed_id")
+        .annotate(total=Count("id"), score_sum=Sum("score"))
+        .order_by()
+    )
+    user_rollups = []
+    for row in reviews_by_user.iterator():
+        rollup = UserReviewRollup(user_id=row["reviewed_id"], review_count=row["total"], score_sum=row["score_sum"])
+        rollup.update_average()
+        user_rollups.append(rollup)
+    UserReviewRollup.objects.bulk_create(user_rollups, batch_size=1000)
+
+    by_score = ReviewAnalytics.objects.values("score").annotate(total=Count("id")).order_by()
+    ScoreRollup.objects.bulk_create(
+        [ScoreRollup(score=row["score"], count=row["total"]) for row in by_score]
+    )
+
+    rebuild_review_sample()
+
+
+def _user_counts(trunc, bucket):
+    counts = defaultdict(lambda: {"workers": 0, "clients": 0})
+    rows = (
+        UserAnalytics.objects
+        .annotate(period=trunc("created_at"))
+        .values("period", "is_worker")
+        .annotate(total=Count("uid"))
+        .order_by()
+    )
+    for row in rows:
+        counts[bucket(row["period"])]["workers" if row["is_worker"] else "clients"] += row["total"]
+    return counts
+
+
+@transaction.atomic
+def rebuild_user_series():
+    """
+    Recalcula solo las series de altas de usuarios (por mes y por día).
+    """
+    invalidate_stats(USERS)
+
+    UserMonthRollup.objects.all().delete()
+    UserDayRollup.objects.all().delete()
+
+    months = _user_counts(TruncMonth, month_of)
+    UserMonthRollup.objects.bulk_create(
+        [UserMonthRollup(month=month, **counts) for month, counts in months.items()]
+    )
+    days = _user_counts(TruncDay, day_of)
+    UserDayRollup.objects.bulk_create(
+        [UserDayRollup(day=day, **counts) for day, counts in days.items()],
+        batch_size=1000,
+    )
@@ -0,0 +1,160 @@
+"""
+Muestra de reseñas para las estadísticas aproximadas (?mode=approx).
+
+Es un muestreo por umbral: cada reseña tiene una prioridad fija en [0, 1)
+que sale del hash de su id, y la muestra son las reseñas con prioridad
+menor que el umbral. El umbral es entonces la probabilidad de inclusión de
+cualquier reseña, y con ella se escalan los conteos y se calculan los
+márgenes de error. Cada fila copia score, created_at, reviewed y job para que
+las estimaciones lean solo la muestra. track_reviews la actualiza en la
+misma transacción de cada escritura (altas, cambios y bajas), así que
+mantenerla no recorre la tabla. Cuando pasa del doble de ANALYTICS_REVIEW_SAMPLE_SIZE se baja el
+umbral hasta dejar ese tamaño; mientras la tabla es chica el umbral es 1 y
+las respuestas son exactas.
+
+Si la muestra se desincroniza se reconstruye con `manage.py rebuild_rollups`.
+"""
+import hashlib
+import heapq
+import math
+
+from django.conf import settings
+
+from .models import ReviewAnalytics, ReviewSample, ReviewSampleState
+
+
+# z de un intervalo de confianza del 95 %
+CONFIDENCE = 0.95
+Z = 1.96
+
+# Con menos reseñas que esto en la muestra la aproximación normal no vale
+# y el margen del promedio sale de la cota de Hoeffding para scores en [1, 5]
+MIN_NORMAL_SAMPLE = 30
+SCORE_RANGE = 4.0
+HOEFFDING = math.sqrt(math.log(2 / (1 - CONFIDENCE)) / 2)
+
+
+def sample_size():
+    return getattr(settings, "ANALYTICS_REVIEW_SAMPLE_SIZE", 10000)
+
+
+def priority(review_id):
+    """
+    Prioridad de una reseña: los primeros 8 bytes del SHA-256 del id, en [0, 1).
+    """
+    digest = hashlib.sha256(str(review_id).encode()).digest()
+    return int.from_bytes(digest[:8], "big") / 2**64
+
+
+def current_threshold():
+    threshold = ReviewSampleState.objects.filter(pk=1).values_list("threshold", flat=True).first()
+    return 1.0 if threshold is None else threshold
+
+
+SAMPLE_FIELDS = ("id", "reviewed_id", "score", "created_at", "job_id")
+
+
+def _sample_row(values, value):
+    return ReviewSample(priority=value, **dict(zip(SAMPLE_FIELDS, values)))
+
+
+def update_sample(ids):
+    """
+    Vuelve a copiar a la muestra las reseñas escritas o borradas que le
+    corresponden. La llama track_reviews dentro de su transacción; las
+    que quedan sobre el umbral (casi todas) no cuestan nada más.
+    """
+    threshold = current_threshold()
+    candidates = {review_id: priority(review_id) for review_id in ids}
+    candidates = {review_id: value for review_id, value in candidates.items() if value < threshold}
+    if not candidates:
+        return
+
+    rows = [
+        _sample_row(values, candidates[values[0]])
+        for values in ReviewAnalytics.objects.filter(pk__in=candidates).values_list(*SAMPLE_FIELDS)
+    ]
+    removed = candidates.keys() - {row.id for row in rows}
+    if removed:
+        ReviewSample.objects.filter(pk__in=removed).delete()
+    if not rows:
+        return
+
+    ReviewSample.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=["id"],
+        update_fields=["reviewed", "score", "created_at", "job"],
+    )
+    size = sample_size()
+    if ReviewSample.objects.count() > 2 * size:
+        shrink_sample(size)
+
+
+def shrink_sample(size):
+    """
+    Baja el umbral a la prioridad de la fila size + 1: quedan size filas.
+    """
+    cutoff = list(ReviewSample.objects.order_by("priority").values_list("priority", flat=True)[size:size + 1])
+    if not cutoff:
+        return
+    ReviewSample.objects.filter(priority__gte=cutoff[0]).delete()
+    ReviewSampleState.objects.update_or_create(pk=1, defaults={"threshold": cutoff[0]})
+
+
+def rebuild_review_sample():
+    """
+    Recalcula la muestra desde la tabla de reseñas: las sample_size() de
+    menor prioridad, o todas si son menos.
+    """
+    size = sample_size()
+    rows = ReviewAnalytics.objects.values_list(*SAMPLE_FIELDS).iterator(chunk_size=2000)
+    smallest = heapq.nsmallest(size + 1, ((priority(values[0]), values) for values in rows), key=lambda item: item[0])
+
+    threshold = 1.0
+    if len(smallest) > size:
+        threshold = smallest.pop()[0]
+
+    ReviewSample.objects.all().delete()
+    ReviewSample.objects.bulk_create(
+        [_sample_row(values, value) for value, values in smallest],
+        batch_size=1000,
+    )
+    ReviewSampleState.objects.update_or_create(pk=1, defaults={"threshold": threshold})
+
+
+# ===========================
+# ESTIMACIONES
+# ===========================
+
+def estimate_count(sampled, rate):
+    """
+    (estimación, margen al 95 %) de cuántas reseñas cumplen algo si
+    sampled de ellas están en la muestra.
+    """
+    if rate >= 1:
+        return sampled, 0.0
+    # Cada reseña entra con probabilidad rate: Var(sampled) = N·rate·(1 - rate)
+    margin = Z * math.sqrt(max(sampled, 1) * (1 - rate)) / rate
+    return sampled / rate, margin
+
+
+def estimate_mean(count, total, squares, rate):
+    """
+    (promedio, margen al 95 %) a partir de la cantidad, suma y suma de
+    cuadrados de los scores en la muestra. Sin reseñas en una muestra
+    parcial el promedio es desconocido: (None, None).
+    """
+    if rate >= 1:
+        return (total / count if count else 0.0), 0.0
+    if not count:
+        return None, None
+
+    mean = total / count
+    if count < MIN_NORMAL_SAMPLE:
+        margin = SCORE_RANGE * HOEFFDING / math.sqrt(count)
+    else:
+        variance = (squares - count * mean * mean) / (count - 1)
+        margin = Z * math.sqrt(max(variance, 0.0) / count)
+    # Corrección por población finita: con rate = 1 el error es 0
+    return mean, min(margin * math.sqrt(1 - rate), SCORE_RANGE)
@@ -1,6 +1,6 @@
 from rest_framework import serializers
 from .models import Job, UserAnalytics, ReviewAnalytics
-from decimal import Decimal
+from .cache import get_job_pk
 
 
 # ===============================
@@ -20,6 +20,15 @@ class JobSyncSerializer(serializers.ModelSerializer):
         return data
 
 
+class JobBatchSyncSerializer(JobSyncSerializer):
+    """
+    Variante para sync en lote: la unicidad de firebase_key se resuelve
+    al escribir el lote, no con una consulta por registro.
+    """
+    class Meta(JobSyncSerializer.Meta):
+        extra_kwargs = {"firebase_key": {"validators": []}}
+
+
 # ===============================
 # SERIALIZER: UserAnalytics
 # ===============================
@@ -37,25 +46,49 @@ class UserSyncSerializer(serializers.ModelSerializer):
         fields = "__all__"
 
     def to_internal_value(self, data):
+        validated = super().to_internal_value(self.prepare_data(data))
+        return self.clean_internal(validated)
+
+    def prepare_data(self, data):
         """
-        Convertir firebase_key → Job instance ANTES de validación.
+        Convertir firebase_key → Job pk ANTES de validación.
+        La traducción sale del caché de analytics.cache.
+        Solo se copia el payload si hay que cambiar job.
         """
-        data = data.copy()
-
         job_key = data.get("job")
 
+        # Solo un texto puede ser clave del caché de jobs
+        if job_key is not None and not isinstance(job_key, str):
+            raise serializers.ValidationError({
+                "job": serializers.CharField.default_error_messages["invalid"]
+            })
+
         if job_key:
-            try:
-                job = Job.objects.get(firebase_key=job_key)
-                data["job"] = job.pk   # convertir a PK real
-            except Job.DoesNotExist:
+            job_pk = get_job_pk(job_key)
+            if job_pk is None:
                 raise serializers.ValidationError({
                     "job": "El job no existe en Django. Debes sincronizar Jobs primero."
                 })
-        else:
+            data = data.copy()
+            data["job"] = job_pk   # convertir a PK real
+        elif job_key is not None or (not self.partial and "job" not in data):
+            data = data.copy()
             data["job"] = None
 
-        return super().to_internal_value(data)
+        return data
+
+    def clean_internal(self, validated):
+        # El campo job se declara como CharField: guardamos la FK como job_id
+        if "job" in validated:
+            job_pk = validated.pop("job")
+            validated["job_id"] = int(job_pk) if job_pk else None
+
+        return validated
+
+
+class UserBatchSyncSerializer(UserSyncSerializer):
+    class Meta(UserSyncSerializer.Meta):
+        extra_kwargs = {"uid": {"validators": []}}
 
 
 # ===============================
@@ -63,6 +96,15 @@ class UserSyncSerializer(serializers.ModelSerializer):
 # ===============================
 
 class ReviewSyncSerializer(serializers.ModelSerializer):
+    """
+    reviewer y reviewed llegan como uid y se validan como texto, sin
+    consultar la base: la existencia de los usuarios se chequea para todo
+    el lote junto (analytics.sync.check_review_users).
+    """
+
+    reviewer = serializers.CharField(max_length=100)
+    reviewed = serializers.CharField(max_length=100)
+
     class Meta:
         model = ReviewAnalytics
         fields = [
@@ -75,14 +117,30 @@ class ReviewSyncSerializer(serializers.ModelSerializer):
         ]
 
     def validate_score(self, value):
+        # DecimalField ya lo convirtió a Decimal
         if value < 1 or value > 5:
             raise serializers.ValidationError("El score debe estar entre 1 y 5")
-        decimal_value = Decimal(str(value))
-        if (decimal_value * 2) % 1 != 0:
+        if (value * 2) % 1 != 0:
             raise serializers.ValidationError("El score debe ser múltiplo de 0.5")
         return value
 
     def validate(self, data):
-        if data["reviewer"] == data["reviewed"]:
+        # Se comparan los uid: no hace falta traer los usuarios
+        if data["reviewer_id"] == data["reviewed_id"]:
             raise serializers.ValidationError("No puedes reseñarte a ti mismo.")
         return data
+
+    def to_internal_value(self, data):
+        return self.clean_internal(super().to_internal_value(data))
+
+    def clean_internal(self, validated):
+        # Las FKs se guardan por id: reviewer_id / reviewed_id
+        for field in ("reviewer", "reviewed"):
+            if field in validated:
+                validated[field + "_id"] = validated.pop(field)
+        return validated
+
+
+class ReviewBatchSyncSerializer(ReviewSyncSerializer):
+    class Meta(ReviewSyncSerializer.Meta):
+        extra_kwargs = {"id": {"validators": []}}
@@ -0,0 +1,171 @@
+"""
+Serie de altas de usuarios por día, semana o mes.
+
+Sale de los rollups (una fila por mes o por día, leídas por rango de la
+pk) salvo que haya filtro de oficio o límites con hora, que solo se
+resuelven sobre la tabla de usuarios. La serie se devuelve completa: los
+períodos sin altas van con total 0 y cada punto lleva el acumulado de
+usuarios hasta ese período, contando los anteriores a ?from=.
+"""
+from datetime import date, datetime, time, timedelta
+
+from django.db.models import Count, Q, Sum, Value
+from django.db.models.functions import Coalesce, Trunc
+from django.utils import timezone
+
+from .models import UserAnalytics, UserMonthRollup, UserDayRollup
+
+
+def _is_local_midnight(value):
+    return value is None or timezone.localtime(value).time() == time.min
+
+
+def uses_rollups(filters):
+    """
+    True si la serie se puede armar con los rollups por día o por mes.
+    """
+    return (
+        filters.job_id is None
+        and _is_local_midnight(filters.date_from)
+        and _is_local_midnight(filters.date_to)
+    )
+
+
+def _day_range_q(filters):
+    q = Q()
+    if filters.date_from is not None:
+        q &= Q(day__gte=timezone.localdate(filters.date_from))
+    if filters.date_to is not None:
+        q &= Q(day__lt=timezone.localdate(filters.date_to))
+    return q
+
+
+def series_query(filters):
+    """
+    (período, trabajadores, clientes) por período, solo los que tienen altas.
+    """
+    if uses_rollups(filters):
+        if filters.granularity == "month" and filters.date_from is None and filters.date_to is None:
+            return (
+                UserMonthRollup.objects
+                .order_by("month")
+                .values_list("month", "workers", "clients")
+            )
+        return (
+            UserDayRollup.objects
+            .filter(_day_range_q(filters))
+            .annotate(period=Trunc("day", filters.granularity))
+            .values("period")
+            .annotate(workers=Sum("workers"), clients=Sum("clients"))
+            .order_by("period")
+            .values_list("period", "workers", "clients")
+        )
+
+    # Una sola pasada: trabajadores y clientes con agregación condicional
+    return (
+        UserAnalytics.objects
+        .filter(filters.users_q())
+        .annotate(period=Trunc("created_at", filters.granularity))
+        .values("period")
+        .annotate(
+            workers=Count("uid", filter=Q(is_worker=True)),
+            clients=Count("uid", filter=Q(is_worker=False)),
+        )
+        .order_by("period")
+        .values_list("period", "workers", "clients")
+    )
+
+
+def before_query(filters):
+    """
+    Una fila (trabajadores, clientes) con las altas anteriores a ?from=,
+    o None si no hay ?from=.
+    """
+    if filters.date_from is None:
+        return None
+
+    # El Value constante deja el SELECT sin GROUP BY: una sola fila
+    if uses_rollups(filters):
+        return (
+            UserDayRollup.objects
+            .filter(day__lt=timezone.localdate(filters.date_from))
+            .annotate(one=Value(1))
+            .values("one")
+            .annotate(workers=Coalesce(Sum("workers"), 0), clients=Coalesce(Sum("clients"), 0))
+            .order_by()
+            .values_list("workers", "clients")
+        )
+
+    q = Q(created_at__lt=filters.date_from)
+    if filters.job_id is not None:
+        q &= Q(job_id=filters.job_id)
+    return (
+        UserAnalytics.objects
+        .filter(q)
+        .annotate(one=Value(1))
+        .values("one")
+        .annotate(
+            workers=Count("uid", filter=Q(is_worker=True)),
+            clients=Count("uid", filter=Q(is_worker=False)),
+        )
+        .order_by()
+        .values_list("workers", "clients")
+    )
+
+
+# ===========================
+# PERÍODOS
+# ===========================
+
+def period_start(value, granularity):
+    """
+    Inicio del período (como date) de un date o datetime, igual que Trunc.
+    """
+    if isinstance(value, datetime):
+        value = timezone.localtime(value).date() if timezone.is_aware(value) else value.date()
+    if granularity == "week":
+        return value - timedelta(days=value.weekday())
+    if granularity == "month":
+        return value.replace(day=1)
+    return value
+
+
+def next_period(value, granularity):
+    if granularity == "week":
+        return value + timedelta(days=7)
+    if granularity == "month":
+        return date(value.year + value.month // 12, value.month % 12 + 1, 1)
+    return value + timedelta(days=1)
+
+
+def fill_series(rows, filters, initial=0):
+    """
+    [(período, total, acumulado)] desde el primer período con altas hasta
+    el último, o hasta ?to= sin pasar del período actual.
+    """
+    granularity = filters.granularity
+    totals = {}
+    for period, workers, clients in rows:
+        if not workers + clients:
+            continue
+        period = period_start(period, granularity)
+        totals[period] = totals.get(period, 0) + workers + clients
+    if not totals:
+        return []
+
+    start, last = min(totals), max(totals)
+    end = last
+    if filters.date_to is not None:
+        # ?to= es exclusivo
+        requested = period_start(filters.date_to - timedelta(microseconds=1), granularity)
+        end = max(last, min(requested, period_start(timezone.now(), granularity)))
+
+    series = []
+    cumulative = initial
+    period = start
+    while period <= end:
+        total = totals.get(period, 0)
+        cumulative += total
+        series.append((period, total, cumulative))
+        period = next_period(period, granularity)
+    return series
@@ -0,0 +1,97 @@
+"""
+Snapshots precalculados de las estadísticas.
+
+`manage.py snapshot_stats` (una vez, desde un cron, o con --loop) calcula
+las tres secciones del dashboard sin filtros y las guarda como una fila
+nueva de StatsSnapshot. La fila aparece completa al confirmar la
+transacción, junto con el borrado de las anteriores: quien lee ve el
+snapshot viejo o el nuevo, nunca una mezcla.
+
+Con ANALYTICS_STATS_SNAPSHOTS las vistas de estadísticas sirven el último
+snapshot (una consulta) cuando la request pide lo mismo que se precalculó:
+sin filtros ni ?mode=approx y con ?limit y ?min_reviews por defecto. La
+respuesta lleva generated_at; ?live=1 fuerza el cálculo en vivo. Un
+snapshot más viejo que ANALYTICS_STATS_SNAPSHOT_MAX_AGE segundos no se
+usa.
+"""
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .cache import SNAPSHOTS, invalidate_stats
+from .models import StatsSnapshot
+from .stats import SECTIONS, stats_source
+
+
+# Parámetros del ranking de trabajadores con los que se precalcula
+SNAPSHOT_LIMIT = 10
+SNAPSHOT_MIN_REVIEWS = 1
+
+
+def snapshots_enabled():
+    return getattr(settings, "ANALYTICS_STATS_SNAPSHOTS", False)
+
+
+def build_snapshot():
+    """
+    Calcula todas las secciones y reemplaza el snapshot vigente.
+    """
+    started = time.perf_counter()
+    source = stats_source(limit=SNAPSHOT_LIMIT, min_reviews=SNAPSHOT_MIN_REVIEWS)
+    payload = source.dashboard(SECTIONS)
+    duration_ms = (time.perf_counter() - started) * 1000
+
+    with transaction.atomic():
+        snapshot = StatsSnapshot.objects.create(
+            payload=payload, generated_at=timezone.now(), duration_ms=duration_ms,
+        )
+        StatsSnapshot.objects.exclude(pk=snapshot.pk).delete()
+        # Las respuestas cacheadas con el snapshot anterior dejan de valer
+        invalidate_stats(SNAPSHOTS)
+    return snapshot
+
+
+def latest_snapshot():
+    queryset = StatsSnapshot.objects.order_by("-generated_at")
+    max_age = getattr(settings, "ANALYTICS_STATS_SNAPSHOT_MAX_AGE", None)
+    if max_age is not None:
+        queryset = queryset.filter(generated_at__gte=timezone.now() - timedelta(seconds=max_age))
+    return queryset.first()
+
+
+def snapshot_sections(filters, sections, limit=SNAPSHOT_LIMIT, min_reviews=SNAPSHOT_MIN_REVIEWS, live=False):
+    """
+    ({sección: datos}, generated_at) del último snapshot si sirve para
+    estos parámetros; si no, None.
+    """
+    precomputed = (
+        snapshots_enabled()
+        and not live
+        and not filters.needs_base_tables
+        and not filters.approximate
+        and limit == SNAPSHOT_LIMIT
+        and min_reviews == SNAPSHOT_MIN_REVIEWS
+    )
+    if not precomputed:
+        return None
+    snapshot = latest_snapshot()
+    if snapshot is None:
+        return None
+    return {section: snapshot.payload[section] for section in sections}, snapshot.generated_at
+
+
+def stats_sections(filters, sections, limit=SNAPSHOT_LIMIT, min_reviews=SNAPSHOT_MIN_REVIEWS, live=False):
+    """
+    ({sección: datos}, generated_at) desde el último snapshot si sirve para
+    estos parámetros, o calculado en vivo en este momento.
+    """
+    found = snapshot_sections(filters, sections, limit, min_reviews, live)
+    if found is not None:
+        return found
+
+    generated_at = timezone.now()
+    source = stats_source(filters, limit=limit, min_reviews=min_reviews)
+    return source.dashboard(sections), generated_at
@@ -0,0 +1,575 @@
+"""
+Cálculo de las estadísticas que sirven las vistas de analytics.
+
+StatsSource lee cada rollup a lo sumo una vez: las vistas individuales
+usan una sola sección y el dashboard arma varias compartiendo las lecturas
+(por ejemplo, la tabla de oficios alimenta tanto a trabajadores como a
+reseñas, y el total de trabajadores sale de la serie por mes).
+
+Con filtros (rango de fechas, oficio o granularidad distinta de mes) los
+rollups no alcanzan: FilteredStatsSource hace las mismas lecturas sobre las
+tablas base, con los filtros como WHERE para que usen los índices de
+created_at y de la FK job. La serie de usuarios es la excepción: sale del
+módulo series, que usa los rollups por día siempre que puede.
+
+Con ?mode=approx y filtros la sección de reseñas sale de la muestra de
+analytics.sampling (SampledStatsSource), con márgenes de error al 95 %.
+Sin filtros los rollups ya son exactos y de costo constante.
+
+JobStatsSource arma el detalle de un solo oficio (/api/analytics/jobs/<id>/).
+"""
+from collections import defaultdict
+from functools import cached_property
+
+from django.db.models import Avg, Count, Q, Sum
+from django.db.models.functions import TruncMonth
+from .models import (
+    Job,
+    UserAnalytics,
+    ReviewAnalytics,
+    JobRollup,
+    UserReviewRollup,
+    ScoreRollup,
+    ReviewSample,
+    ReviewSampleState,
+)
+from .params import choice_param, datetime_param, job_param
+from .sampling import CONFIDENCE, estimate_count, estimate_mean
+from .series import before_query, fill_series, series_query
+
+
+SECTIONS = ("users", "workers", "reviews")
+GRANULARITIES = ("day", "week", "month")
+MODES = ("exact", "approx")
+
+PERIOD_FORMATS = {"day": "%Y-%m-%d", "week": "%Y-%m-%d", "month": "%Y-%m"}
+
+
+class StatsFilters:
+    """
+    ?from= y ?to= (fechas inclusive o ISO 8601), ?job= (id de Django o
+    firebase_key), ?granularity=day|week|month para la serie de usuarios y
+    ?mode=exact|approx para las reseñas.
+    """
+
+    def __init__(self, date_from=None, date_to=None, job_id=None, granularity="month", approximate=False):
+        self.date_from = date_from
+        self.date_to = date_to
+        self.job_id = job_id
+        self.granularity = granularity
+        self.approximate = approximate
+
+    @classmethod
+    def from_request(cls, request):
+        return cls(
+            date_from=datetime_param(request, "from"),
+            date_to=datetime_param(request, "to", end_of_day=True),
+            job_id=job_param(request),
+            granularity=choice_param(request, "granularity", GRANULARITIES, "month"),
+            approximate=choice_param(request, "mode", MODES, "exact") == "approx",
+        )
+
+    @property
+    def needs_base_tables(self):
+        return (
+            self.date_from is not None
+            or self.date_to is not None
+            or self.job_id is not None
+            or self.granularity != "month"
+        )
+
+    def created_q(self):
+        q = Q()
+        if self.date_from is not None:
+            q &= Q(created_at__gte=self.date_from)
+        if self.date_to is not None:
+            q &= Q(created_at__lt=self.date_to)
+        return q
+
+    def users_q(self):
+        q = self.created_q()
+        if self.job_id is not None:
+            q &= Q(job_id=self.job_id)
+        return q
+
+    def reviews_q(self):
+        # También sirve para ReviewSample, que tiene los mismos campos. El
+        # oficio es la copia en la reseña: sin JOIN a usuarios
+        q = self.created_q()
+        if self.job_id is not None:
+            q &= Q(job_id=self.job_id)
+        return q
+
+
+def stats_source(filters=None, **kwargs):
+    """
+    StatsSource sobre rollups, o FilteredStatsSource (SampledStatsSource
+    con ?mode=approx) si hay filtros.
+    """
+    if filters is not None and filters.needs_base_tables:
+        if filters.approximate:
+            return SampledStatsSource(filters, **kwargs)
+        return FilteredStatsSource(filters, **kwargs)
+    return StatsSource(filters=filters, **kwargs)
+
+
+class StatsSource:
+
+    # Lecturas que usa cada sección (las vistas async las lanzan en paralelo)
+    section_reads = {
+        "users": ("months", "users_before"),
+        "workers": ("jobs", "months", "top_workers"),
+        "reviews": ("scores", "jobs"),
+    }
+
+    def __init__(self, limit=10, min_reviews=1, filters=None):
+        self.limit = limit
+        self.min_reviews = min_reviews
+        self.filters = filters or StatsFilters()
+        self.granularity = self.filters.granularity
+
+    def queries(self, sections):
+        """
+        {nombre: queryset} de las lecturas que necesitan esas secciones.
+        Las que no aplican (None) se omiten.
+        """
+        names = dict.fromkeys(
+            name for section in sections for name in self.section_reads[section]
+        )
+        queries = {name: getattr(self, f"{name}_query")() for name in names}
+        return {name: query for name, query in queries.items() if query is not None}
+
+    def prime(self, results):
+        """
+        Carga resultados ya leídos (por ejemplo en paralelo) en los
+        cached_property correspondientes.
+        """
+        self.__dict__.update(results)
+
+    # ===========================
+    # LECTURAS (una consulta cada una)
+    # ===========================
+
+    def months_query(self):
+        # Usuarios por período (rollup: una fila por mes o por día)
+        return series_query(self.filters)
+
+    def users_before_query(self):
+        # Altas anteriores a ?from=, para el acumulado
+        return before_query(self.filters)
+
+    def jobs_query(self):
+        # Oficios con trabajadores o reseñas (rollup: una fila por oficio)
+        return (
+            JobRollup.objects
+            .filter(Q(workers__gt=0) | Q(review_count__gt=0))
+            .order_by("job__name")
+            .values_list("job_id", "job__name", "workers", "review_count", "score_sum")
+        )
+
+    def scores_query(self):
+        # Distribución de scores (rollup: una fila por score)
+        return (
+            ScoreRollup.objects.filter(count__gt=0)
+            .values("score", "count")
+            .order_by("score")
+        )
+
+    def top_workers_query(self):
+        # Top trabajadores por puntuación (rollup indexado por avg_score)
+        return (
+            UserReviewRollup.objects
+            .filter(user__is_worker=True, review_count__gte=self.min_reviews)
+            .order_by("-avg_score", "-review_count", "user_id")
+            .values_list("user_id", "user__name", "user__job__name", "avg_score", "review_count")[:self.limit]
+        )
+
+    @cached_property
+    def months(self):
+        return list(self.months_query())
+
+    @cached_property
+    def users_before(self):
+        query = self.users_before_query()
+        return list(query) if query is not None else []
+
+    @cached_property
+    def jobs(self):
+        return list(self.jobs_query())
+
+    @cached_property
+    def scores(self):
+        return list(self.scores_query())
+
+    @cached_property
+    def top_workers(self):
+        return list(self.top_workers_query())
+
+    # ===========================
+    # SECCIONES
+    # ===========================
+
+    def users(self):
+        workers = sum(row[1] for row in self.months)
+        clients = sum(row[2] for row in self.months)
+
+        # Serie completa (períodos sin altas en 0) con el acumulado.
+        # La mensual conserva su formato; day/week van en users_by_period
+        label = "month" if self.granularity == "month" else "period"
+        period_format = PERIOD_FORMATS[self.granularity]
+        initial = sum(before_workers + before_clients for before_workers, before_clients in self.users_before)
+        series = [
+            {
+                label: period.strftime(period_format),
+                "total": total,
+                "cumulative": cumulative,
+            }
+            for period, total, cumulative in fill_series(self.months, self.filters, initial)
+        ]
+
+        data = {
+            "total_users": workers + clients,
+            "workers": workers,
+            "clients": clients,
+        }
+        if self.granularity == "month":
+            data["users_by_month"] = series
+        else:
+            data["granularity"] = self.granularity
+            data["users_by_period"] = series
+        return data
+
+    def workers(self):
+        workers_by_job = [
+            {"job__id": job_id, "job__name": name, "total": workers}
+            for job_id, name, workers, _, _ in self.jobs
+            if workers
+        ]
+
+        # Los trabajadores sin oficio son el resto del total
+        total_workers = sum(row[1] for row in self.months)
+        without_job = total_workers - sum(item["total"] for item in workers_by_job)
+        if without_job > 0:
+            workers_by_job.append({"job__id": None, "job__name": None, "total": without_job})
+        workers_by_job.sort(key=lambda item: -item["total"])
+
+        return {
+            "workers_by_job": workers_by_job,
+            "top_workers": [
+                {
+                    "uid": uid,
+                    "name": name,
+                    "job": job_name,
+                    "avg_score": round(float(avg_score), 2),
+                    "review_count": review_count,
+                }
+                for uid, name, job_name, avg_score, review_count in self.top_workers
+            ],
+        }
+
+    def reviews(self):
+        # Total y promedio global salen del histograma
+        total_reviews = sum(item["count"] for item in self.scores)
+        score_sum = sum(item["score"] * item["count"] for item in self.scores)
+        global_avg = score_sum / total_reviews if total_reviews else 0
+
+        # Promedio por oficio
+        by_job = [(name, count, job_sum) for _, name, _, count, job_sum in self.jobs if count]
+        avg_by_job = [
+            {"reviewed__job__name": name, "avg_score": float(job_sum / count)}
+            for name, count, job_sum in by_job
+        ]
+
+        # Las reseñas a usuarios sin oficio son el resto del total y van al
+        # final, después de los oficios por nombre, en todos los motores. El
+        # ORDER BY por nombre de antes de los rollups las ponía primero en
+        # SQLite y al final en PostgreSQL.
+        count_without_job = total_reviews - sum(count for _, count, _ in by_job)
+        if count_without_job > 0:
+            sum_without_job = score_sum - sum(job_sum for _, _, job_sum in by_job)
+            avg_by_job.append({
+                "reviewed__job__name": None,
+                "avg_score": float(sum_without_job / count_without_job),
+            })
+
+        data = {
+            "global_average": round(float(global_avg), 2),
+            "total_reviews": total_reviews,
+            "average_by_job": avg_by_job,
+            "score_distribution": self.scores,
+        }
+        if self.filters.approximate:
+            # Exacto: mismo formato que SampledStatsSource, con error 0
+            data["average_by_job"] = [{**item, "error": 0.0} for item in avg_by_job]
+            data["score_distribution"] = [{**item, "error": 0} for item in self.scores]
+            data["approximation"] = approximation(1.0, total_reviews, 0, 0.0)
+        return data
+
+    def dashboard(self, sections=SECTIONS):
+        return {section: getattr(self, section)() for section in sections}
+
+
+class FilteredStatsSource(StatsSource):
+    """
+    Mismas secciones que StatsSource, leyendo solo las filas que pasan los
+    filtros en lugar de los rollups globales.
+    """
+
+    def __init__(self, filters, limit=10, min_reviews=1):
+        super().__init__(limit=limit, min_reviews=min_reviews, filters=filters)
+
+    section_reads = {
+        "users": ("months", "users_before"),
+        "workers": ("job_workers", "job_reviews", "months", "top_workers"),
+        "reviews": ("scores", "job_workers", "job_reviews"),
+    }
+
+    def job_workers_query(self):
+        return (
+            UserAnalytics.objects
+            .filter(self.filters.users_q(), is_worker=True, job__isnull=False)
+            .values_list("job_id", "job__name")
+            .annotate(total=Count("uid"))
+            .order_by()
+        )
+
+    def job_reviews_query(self):
+        return (
+            ReviewAnalytics.objects
+            .filter(self.filters.reviews_q(), job__isnull=False)
+            .values_list("job_id", "job__name")
+            .annotate(total=Count("id"), score_sum=Sum("score"))
+            .order_by()
+        )
+
+    def scores_query(self):
+        return (
+            ReviewAnalytics.objects
+            .filter(self.filters.reviews_q())
+            .values("score")
+            .annotate(count=Count("id"))
+            .order_by("score")
+        )
+
+    def top_workers_query(self):
+        # Promedio de las reseñas dentro del rango, no del histórico
+        return (
+            ReviewAnalytics.objects
+            .filter(self.filters.reviews_q(), reviewed__is_worker=True)
+            .values_list("reviewed_id", "reviewed__name", "reviewed__job__name")
+            .annotate(avg_score=Avg("score"), review_count=Count("id"))
+            .filter(review_count__gte=self.min_reviews)
+            .order_by("-avg_score", "-review_count", "reviewed_id")[:self.limit]
+        )
+
+    @cached_property
+    def job_workers(self):
+        return list(self.job_workers_query())
+
+    @cached_property
+    def job_reviews(self):
+        return list(self.job_reviews_query())
+
+    @cached_property
+    def jobs(self):
+        # Misma forma que JobRollup, armada con las dos lecturas filtradas
+        names = {}
+        workers = {}
+        for job_id, name, total in self.job_workers:
+            names[job_id] = name
+            workers[job_id] = total
+
+        reviews = {}
+        for job_id, name, total, score_sum in self.job_reviews:
+            names[job_id] = name
+            reviews[job_id] = (total, score_sum)
+
+        return sorted(
+            (
+                (job_id, name, workers.get(job_id, 0), *reviews.get(job_id, (0, 0)))
+                for job_id, name in names.items()
+            ),
+            key=lambda row: row[1],
+        )
+
+
+def approximation(rate, sample_size, total_error, average_error):
+    return {
+        "sampling_rate": rate,
+        "sample_size": sample_size,
+        "confidence": CONFIDENCE,
+        "total_reviews_error": total_error,
+        "global_average_error": average_error,
+    }
+
+
+class SampledStatsSource(FilteredStatsSource):
+    """
+    FilteredStatsSource con la sección de reseñas estimada sobre la
+    muestra: una lectura de tamaño acotado en lugar de recorrer todas las
+    reseñas filtradas. Cada cifra lleva su margen de error al 95 %.
+    """
+
+    section_reads = {
+        **FilteredStatsSource.section_reads,
+        "reviews": ("review_sample", "sample_rate"),
+    }
+
+    def review_sample_query(self):
+        # (oficio, score, cantidad) de las reseñas de la muestra que pasan los filtros
+        return (
+            ReviewSample.objects
+            .filter(self.filters.reviews_q())
+            .values_list("job__name", "score")
+            .annotate(count=Count("pk"))
+            .order_by()
+        )
+
+    def sample_rate_query(self):
+        return ReviewSampleState.objects.filter(pk=1).values_list("threshold", flat=True)
+
+    @cached_property
+    def review_sample(self):
+        return list(self.review_sample_query())
+
+    @cached_property
+    def sample_rate(self):
+        return list(self.sample_rate_query())
+
+    def reviews(self):
+        rate = self.sample_rate[0] if self.sample_rate else 1.0
+
+        # [cantidad, suma, suma de cuadrados] global y por oficio
+        overall = [0, 0.0, 0.0]
+        by_job = defaultdict(lambda: [0, 0.0, 0.0])
+        by_score = defaultdict(int)
+        for job_name, score, count in self.review_sample:
+            value = float(score)
+            for totals in (overall, by_job[job_name]):
+                totals[0] += count
+                totals[1] += value * count
+                totals[2] += value * value * count
+            by_score[score] += count
+
+        total_reviews, total_error = estimate_count(overall[0], rate)
+        global_avg, avg_error = estimate_mean(*overall, rate)
+
+        # Por nombre, con las reseñas a usuarios sin oficio al final
+        avg_by_job = []
+        for name in sorted(by_job, key=lambda name: (name is None, name or "")):
+            average, error = estimate_mean(*by_job[name], rate)
+            avg_by_job.append({"reviewed__job__name": name, "avg_score": average, "error": round(error, 2)})
+
+        score_distribution = []
+        for score in sorted(by_score):
+            count, error = estimate_count(by_score[score], rate)
+            score_distribution.append({"score": score, "count": round(count), "error": round(error)})
+
+        return {
+            "global_average": round(global_avg, 2) if global_avg is not None else None,
+            "total_reviews": round(total_reviews),
+            "average_by_job": avg_by_job,
+            "score_distribution": score_distribution,
+            "approximation": approximation(
+                rate, overall[0], round(total_error),
+                round(avg_error, 2) if avg_error is not None else None,
+            ),
+        }
+
+
+class JobStatsSource:
+    """
+    Detalle de un oficio: trabajadores, histograma de scores, reseñas por
+    mes y ranking de sus trabajadores. Cada lectura recorre solo la porción
+    del oficio: las reseñas por el índice (job, created_at, score) y los
+    trabajadores por (is_worker, job, ...).
+    """
+
+    def __init__(self, job_id, limit=10, min_reviews=1):
+        self.job_id = job_id
+        self.limit = limit
+        self.min_reviews = min_reviews
+
+    # ===========================
+    # LECTURAS (una consulta cada una)
+    # ===========================
+
+    def job_query(self):
+        # El oficio con su cantidad de trabajadores (rollup, si ya tiene fila)
+        return Job.objects.filter(pk=self.job_id).values_list("id", "name", "firebase_key", "rollup__workers")
+
+    def scores_query(self):
+        return (
+            ReviewAnalytics.objects
+            .filter(job_id=self.job_id)
+            .values("score")
+            .annotate(count=Count("*"))
+            .order_by("score")
+        )
+
+    def review_months_query(self):
+        return (
+            ReviewAnalytics.objects
+            .filter(job_id=self.job_id)
+            .annotate(month=TruncMonth("created_at"))
+            .values_list("month")
+            .annotate(total=Count("*"))
+            .order_by("month")
+        )
+
+    def top_workers_query(self):
+        return (
+            UserReviewRollup.objects
+            .filter(user__is_worker=True, user__job_id=self.job_id, review_count__gte=self.min_reviews)
+            .order_by("-avg_score", "-review_count", "user_id")
+            .values_list("user_id", "user__name", "avg_score", "review_count")[:self.limit]
+        )
+
+    @cached_property
+    def job(self):
+        rows = list(self.job_query())
+        return rows[0] if rows else None
+
+    @cached_property
+    def scores(self):
+        return list(self.scores_query())
+
+    @cached_property
+    def review_months(self):
+        return list(self.review_months_query())
+
+    @cached_property
+    def top_workers(self):
+        return list(self.top_workers_query())
+
+    def exists(self):
+        return self.job is not None
+
+    def detail(self):
+        job_id, name, firebase_key, workers = self.job
+
+        # Total y promedio salen del histograma, como en las reseñas globales
+        total_reviews = sum(item["count"] for item in self.scores)
+        score_sum = sum(item["score"] * item["count"] for item in self.scores)
+        average = score_sum / total_reviews if total_reviews else 0
+
+        return {
+            "job": {"id": job_id, "name": name, "firebase_key": firebase_key},
+            "total_workers": workers or 0,
+            "total_reviews": total_reviews,
+            "average_score": round(float(average), 2),
+            "score_distribution": self.scores,
+            "reviews_by_month": [
+                {"month": month.strftime(PERIOD_FORMATS["month"]), "total": total}
+                for month, total in self.review_months
+            ],
+            "top_workers": [
+                {
+                    "uid": uid,
+                    "name": worker_name,
+                    "avg_score": round(float(avg_score), 2),
+                    "review_count": count,
+                }
+                for uid, worker_name, avg_score, count in self.top_workers
+            ],
+        }
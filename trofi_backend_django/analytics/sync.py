@@ -0,0 +1,275 @@
+"""
+Sync en lote (Express a Django).
+
+Cada registro se valida por separado para poder devolver un resultado por
+ítem; los válidos se escriben con un upsert (bulk_create con
+update_conflicts) en una transacción por chunk, así un chunk que falla no
+arrastra al resto del lote y reenviar un lote ya aplicado es inocuo.
+
+La validación usa FastValidator (mismos errores que el serializer, sin
+instanciarlo por registro); ANALYTICS_SYNC_FAST_VALIDATION = False vuelve
+al serializer de DRF. Las referencias que la validación no consulta (los
+usuarios de una reseña) se chequean después para todo el lote con una
+sola consulta.
+
+Las bajas de reseñas (delete_reviews) son un solo DELETE por chunk, con
+los deltas de los rollups en la misma transacción.
+"""
+from django.conf import settings
+from django.db import DatabaseError, transaction
+from rest_framework.exceptions import ErrorDetail
+from rest_framework.relations import PrimaryKeyRelatedField
+
+from .cache import (
+    JOBS,
+    USERS,
+    REVIEWS,
+    invalidate_job_keys,
+    invalidate_stats,
+    resolve_job_pks,
+)
+from .models import Job, UserAnalytics, ReviewAnalytics
+from .rollups import track_users, track_reviews
+from .serializers import (
+    JobBatchSyncSerializer,
+    UserBatchSyncSerializer,
+    ReviewBatchSyncSerializer,
+)
+from .validation import FastValidator
+
+
+BATCH_CHUNK_SIZE = getattr(settings, "ANALYTICS_SYNC_CHUNK_SIZE", 500)
+
+
+class BatchSpec:
+    """
+    Qué serializer valida, qué campo identifica al registro en Firebase
+    y qué columnas se actualizan si el registro ya existe.
+    """
+
+    def __init__(self, name, model, serializer_class, key_field, update_fields,
+                 invalidates=(), prefetch=None, check=None, track=None):
+        self.name = name
+        self.model = model
+        self.serializer_class = serializer_class
+        self.validator = FastValidator(serializer_class)
+        self.key_field = key_field
+        self.update_fields = update_fields
+        # Scopes del caché de estadísticas que invalida una escritura
+        self.invalidates = invalidates
+        # Resuelve de una vez lo que la validación buscaría registro por registro
+        self.prefetch = prefetch
+        # Chequea de una vez los registros ya validados (ver check_review_users)
+        self.check = check
+        # Context manager que mantiene los rollups al escribir
+        self.track = track
+
+
+def prefetch_user_jobs(records):
+    """
+    Carga en el caché todos los jobs del lote con un solo IN.
+    """
+    resolve_job_pks(
+        record.get("job") for record in records
+        if isinstance(record, dict) and isinstance(record.get("job"), str)
+    )
+
+
+def check_review_users(rows):
+    """
+    Existencia de reviewer y reviewed de todas las reseñas con un solo IN.
+    Devuelve, alineado con rows, los errores de cada una (el mismo error
+    que daba PrimaryKeyRelatedField) o None.
+    """
+    uids = {data[field] for data in rows for field in ("reviewer_id", "reviewed_id")}
+    existing = set(UserAnalytics.objects.filter(uid__in=uids).values_list("uid", flat=True)) if uids else set()
+
+    message = PrimaryKeyRelatedField.default_error_messages["does_not_exist"]
+    checked = []
+    for data in rows:
+        errors = {
+            field: [ErrorDetail(message.format(pk_value=data[field + "_id"]), code="does_not_exist")]
+            for field in ("reviewer", "reviewed")
+            if data[field + "_id"] not in existing
+        }
+        checked.append(errors or None)
+    return checked
+
+
+JOB_BATCH = BatchSpec(
+    "job", Job, JobBatchSyncSerializer, "firebase_key", ["name"],
+    invalidates=(JOBS,),
+)
+USER_BATCH = BatchSpec(
+    "user", UserAnalytics, UserBatchSyncSerializer, "uid",
+    ["name", "email", "is_worker", "created_at", "job"],
+    invalidates=(USERS,),
+    prefetch=prefetch_user_jobs,
+    track=track_users,
+)
+REVIEW_BATCH = BatchSpec(
+    "review", ReviewAnalytics, ReviewBatchSyncSerializer, "id",
+    ["reviewer", "reviewed", "score", "description", "created_at"],
+    invalidates=(REVIEWS,),
+    check=check_review_users,
+    track=track_reviews,
+)
+
+
+def validate_record(spec, record):
+    """
+    (validated_data, None) si el registro es válido, (None, errores) si no.
+    """
+    if getattr(settings, "ANALYTICS_SYNC_FAST_VALIDATION", True):
+        return spec.validator.validate(record)
+
+    serializer = spec.serializer_class(data=record)
+    if serializer.is_valid():
+        return serializer.validated_data, None
+    return None, serializer.errors
+
+
+def _untracked(keys):
+    return transaction.atomic()
+
+
+def chunked(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _error(index, errors):
+    return {"index": index, "ok": False, "errors": errors}
+
+
+def validate_batch(spec, records):
+    """
+    Valida cada registro. Devuelve (results, pending) donde pending agrupa
+    por clave los registros válidos; si una clave se repite gana el último.
+    """
+    results = [None] * len(records)
+    pending = {}
+
+    if spec.prefetch is not None:
+        spec.prefetch(records)
+
+    valid = []
+    for index, record in enumerate(records):
+        if not isinstance(record, dict):
+            results[index] = _error(index, {"non_field_errors": ["El registro debe ser un objeto JSON"]})
+            continue
+
+        data, errors = validate_record(spec, record)
+        if errors:
+            results[index] = _error(index, errors)
+            continue
+        valid.append((index, data))
+
+    checked = spec.check([data for _, data in valid]) if spec.check and valid else [None] * len(valid)
+
+    for (index, data), errors in zip(valid, checked):
+        if errors:
+            results[index] = _error(index, errors)
+            continue
+
+        key = data[spec.key_field]
+        indexes = pending[key][0] if key in pending else []
+        indexes.append(index)
+        pending[key] = (indexes, data)
+        results[index] = {"index": index, "ok": True, "key": key}
+
+    return results, pending
+
+
+def upsert(spec, rows):
+    """
+    INSERT ... ON CONFLICT (clave) DO UPDATE: el conflicto lo resuelve la
+    base, sin consultar antes si el registro existe. Los rollups se
+    actualizan en la misma transacción.
+    """
+    instances = [spec.model(**data) for data in rows]
+    track = spec.track or _untracked
+
+    with track([data[spec.key_field] for data in rows]):
+        spec.model.objects.bulk_create(
+            instances,
+            update_conflicts=True,
+            unique_fields=[spec.key_field],
+            update_fields=spec.update_fields,
+        )
+        invalidate_stats(*spec.invalidates)
+    return instances
+
+
+def sync_one(spec, record):
+    """
+    Valida y hace upsert de un solo registro.
+    Devuelve (errores de validación, None) o (None, created): created dice
+    si el registro no existía, para responder 201 o 200. Cuesta un SELECT
+    por clave; el lote no lo hace.
+    """
+    data, errors = validate_record(spec, record)
+    if errors is None and spec.check is not None:
+        errors = spec.check([data])[0]
+    if errors:
+        return errors, None
+
+    key = data[spec.key_field]
+    created = not spec.model.objects.filter(**{spec.key_field: key}).exists()
+    upsert(spec, [data])
+    if spec is JOB_BATCH:
+        invalidate_job_keys([key])
+    return None, created
+
+
+def run_batch(spec, records, chunk_size=None):
+    """
+    Valida y escribe un lote. Devuelve la lista de resultados por ítem,
+    en el mismo orden en que llegaron los registros.
+    """
+    results, pending = validate_batch(spec, records)
+    items = list(pending.items())
+
+    for chunk in chunked(items, chunk_size or BATCH_CHUNK_SIZE):
+        try:
+            with transaction.atomic():
+                upsert(spec, [data for _, (_, data) in chunk])
+        except DatabaseError as exc:
+            for _, (indexes, _) in chunk:
+                for index in indexes:
+                    results[index] = _error(index, {"non_field_errors": [str(exc)]})
+
+    if spec is JOB_BATCH:
+        invalidate_job_keys(pending)
+
+    return results
+
+
+# ===========================
+# BAJAS DE RESEÑAS
+# ===========================
+
+def delete_reviews(ids):
+    """
+    Borra reseñas por id con un solo DELETE (sin get() ni el collector de
+    Django: nada referencia a las reseñas) y aplica los deltas de los
+    rollups en la misma transacción. Devuelve los ids que existían.
+    """
+    with track_reviews(ids, deleting=True) as before:
+        if before:
+            ReviewAnalytics.objects.filter(pk__in=list(before)).delete()
+            invalidate_stats(REVIEWS)
+    return list(before)
+
+
+def run_delete_batch(ids, chunk_size=None):
+    """
+    Borra un lote de reseñas en chunks, una transacción por chunk para no
+    retener locks durante todo el lote. Devuelve (borrados, inexistentes).
+    """
+    ids = list(dict.fromkeys(str(pk) for pk in ids))
+    deleted = []
+    for chunk in chunked(ids, chunk_size or BATCH_CHUNK_SIZE):
+        deleted.extend(delete_reviews(chunk))
+    found = set(deleted)
+    return deleted, [pk for pk in ids if pk not in found]
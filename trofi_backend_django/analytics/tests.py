@@ -1,3 +1,1063 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import tempfile
+import time
+from datetime import datetime, timezone
+from decimal import Decimal
+from io import StringIO
+from pathlib import Path
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import DatabaseError, connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from .bench import TestClientTransport, compare, generate, run_benchmarks
+from . import cache as cache_module
+from . import sync as sync_module
+from .cache import clear_job_cache, get_job_pk, invalidate_job_keys, resolve_job_pks
+from .ingest import drain_once
+from .models import Job, UserAnalytics, ReviewAnalytics, UserDayRollup, ScoreRollup, ReviewSample, StatsSnapshot
+from .rollups import rebuild_rollups
+from .sampling import current_threshold, priority
+from .snapshots import build_snapshot, latest_snapshot
+from .sync import JOB_BATCH, USER_BATCH, REVIEW_BATCH, validate_batch
+
+
+def seed_analytics(jobs=3, workers_per_job=4, clients=5):
+    """
+    Datos mínimos para que un N+1 se note: varios oficios, trabajadores
+    con reseñas y clientes que reseñan.
+    """
+    job_list = Job.objects.bulk_create(
+        [Job(name=f"Oficio {i}", firebase_key=f"job-{i}") for i in range(jobs)]
+    )
+
+    users = []
+    for j, job in enumerate(job_list):
+        for w in range(workers_per_job):
+            users.append(UserAnalytics(
+                uid=f"worker-{j}-{w}", name=f"Worker {j}-{w}", email=f"w{j}{w}@trofi.test",
+                is_worker=True, job=job, created_at=datetime(2024, w + 1, 1, tzinfo=timezone.utc),
+            ))
+    for c in range(clients):
+        users.append(UserAnalytics(
+            uid=f"client-{c}", name=f"Client {c}", email=f"c{c}@trofi.test",
+            is_worker=False, created_at=datetime(2024, c + 1, 15, tzinfo=timezone.utc),
+        ))
+    UserAnalytics.objects.bulk_create(users)
+
+    reviews = []
+    workers = [user for user in users if user.is_worker]
+    for c in range(clients):
+        for w, worker in enumerate(workers):
+            reviews.append(ReviewAnalytics(
+                id=f"review-{c}-{w}", reviewer_id=f"client-{c}", reviewed_id=worker.uid,
+                score=Decimal(1 + (c + w) % 9) / 2 + Decimal("0.5"), description="",
+                created_at=datetime(2024, 6, 1, tzinfo=timezone.utc),
+            ))
+    ReviewAnalytics.objects.bulk_create(reviews)
+
+    rebuild_rollups()
+
+
+@override_settings(ANALYTICS_STATS_CACHE_ALIAS=None)
+class AnalyticsQueryBudgetTests(TestCase):
+    """
+    Cada endpoint de analytics tiene un presupuesto fijo de consultas que
+    no depende de la cantidad de filas. Si un cambio agrega un N+1 o una
+    consulta extra, estos tests fallan.
+    """
+
+    QUERY_BUDGETS = {
+        "/api/analytics/users/": 1,
+        "/api/analytics/workers/": 3,
+        "/api/analytics/reviews/": 2,
+        "/api/analytics/dashboard/": 4,
+        "/api/analytics/dashboard/?fields=users,reviews": 3,
+        "/api/analytics/users/?from=2024-02-01&granularity=week": 2,
+        "/api/analytics/workers/?job=job-1": 4,
+        "/api/analytics/reviews/?from=2024-01-01&to=2024-12-31": 3,
+        "/api/analytics/jobs/job-1/": 4,
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_analytics()
+
+    def setUp(self):
+        # Caché de jobs caliente, como en un proceso que ya atendió requests
+        clear_job_cache()
+        resolve_job_pks(Job.objects.values_list("firebase_key", flat=True))
+
+    def test_endpoints_stay_within_query_budget(self):
+        for url, budget in self.QUERY_BUDGETS.items():
+            with self.subTest(url=url), self.assertNumQueries(budget):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+
+    def test_budget_does_not_grow_with_data(self):
+        more_workers = [
+            UserAnalytics(
+                uid=f"extra-{i}", name=f"Extra {i}", email=f"e{i}@trofi.test", is_worker=True,
+                job=Job.objects.first(), created_at=datetime(2024, 9, 1, tzinfo=timezone.utc),
+            )
+            for i in range(20)
+        ]
+        UserAnalytics.objects.bulk_create(more_workers)
+        ReviewAnalytics.objects.bulk_create([
+            ReviewAnalytics(
+                id=f"extra-review-{i}", reviewer_id="client-0", reviewed_id=f"extra-{i}",
+                score=Decimal("4.5"), description="", created_at=datetime(2024, 9, 2, tzinfo=timezone.utc),
+            )
+            for i in range(20)
+        ])
+        rebuild_rollups()
+
+        self.test_endpoints_stay_within_query_budget()
+
+
+@override_settings(ANALYTICS_STATS_CACHE_ALIAS="analytics")
+class AnalyticsResponseCacheTests(TestCase):
+    URL = "/api/analytics/users/"
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_analytics()
+
+    def setUp(self):
+        caches["analytics"].clear()
+
+    def test_second_request_is_served_from_cache(self):
+        first = self.client.get(self.URL)
+        with self.assertNumQueries(0):
+            second = self.client.get(self.URL)
+        self.assertEqual(second.json(), first.json())
+
+    def test_matching_etag_returns_304_without_queries(self):
+        etag = self.client.get(self.URL)["ETag"]
+        with self.assertNumQueries(0):
+            response = self.client.get(self.URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_sync_write_invalidates_cached_payload(self):
+        before = self.client.get(self.URL)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post("/api/sync/users/", {
+                "uid": "new-user", "name": "Nuevo", "email": "nuevo@trofi.test",
+                "is_worker": False, "created_at": "2024-03-01T00:00:00Z",
+            }, content_type="application/json")
+
+        after = self.client.get(self.URL, HTTP_IF_NONE_MATCH=before["ETag"])
+        self.assertEqual(after.status_code, 200)
+        self.assertNotEqual(after["ETag"], before["ETag"])
+        self.assertEqual(after.json()["data"]["total_users"], before.json()["data"]["total_users"] + 1)
+
+
+class JobKeyCacheTests(TestCase):
+
+    def setUp(self):
+        clear_job_cache()
+        caches["analytics"].clear()
+        self.job = Job.objects.create(name="Gasista", firebase_key="job-a")
+
+    def rename(self):
+        # Lo que hace otro worker: renombra e invalida sin pasar por este dict
+        Job.objects.filter(pk=self.job.pk).update(firebase_key="job-b")
+        cached = dict(cache_module._job_pks)
+        invalidate_job_keys(["job-a", "job-b"])
+        cache_module._job_pks.update(cached)
+
+    @override_settings(ANALYTICS_JOB_CACHE_ALIAS="analytics")
+    def test_rename_in_another_process_bumps_shared_version(self):
+        self.assertEqual(get_job_pk("job-a"), self.job.pk)
+        self.rename()
+        self.assertIsNone(get_job_pk("job-a"))
+        self.assertEqual(get_job_pk("job-b"), self.job.pk)
+
+    @override_settings(ANALYTICS_JOB_CACHE_ALIAS=None, ANALYTICS_JOB_CACHE_TTL=0)
+    def test_local_cache_expires_without_shared_cache(self):
+        self.assertEqual(get_job_pk("job-a"), self.job.pk)
+        self.rename()
+        time.sleep(0.01)
+        self.assertIsNone(get_job_pk("job-a"))
+
+
+@override_settings(ANALYTICS_STATS_CACHE_ALIAS=None)
+class UserSeriesTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_analytics()
+        # Sin altas entre junio y agosto
+        UserAnalytics.objects.create(
+            uid="late", name="Tarde", email="late@trofi.test", is_worker=False,
+            created_at=datetime(2024, 9, 10, tzinfo=timezone.utc),
+        )
+        rebuild_rollups()
+
+    def series(self, query=""):
+        data = self.client.get(f"/api/analytics/users/?{query}").json()["data"]
+        return data.get("users_by_month") or data["users_by_period"]
+
+    def test_gaps_are_filled_with_zeros(self):
+        series = self.series()
+        self.assertEqual(
+            [item["month"] for item in series],
+            ["2024-01", "2024-02", "2024-03", "2024-04", "2024-05", "2024-06", "2024-07", "2024-08", "2024-09"],
+        )
+        self.assertEqual([item["total"] for item in series[5:8]], [0, 0, 0])
+        self.assertEqual(series[-1]["cumulative"], UserAnalytics.objects.count())
+
+    def test_cumulative_counts_users_before_the_range(self):
+        series = self.series("from=2024-03-01&granularity=week")
+        before = UserAnalytics.objects.filter(created_at__lt=datetime(2024, 3, 1, tzinfo=timezone.utc)).count()
+        self.assertEqual(series[0]["cumulative"], before + series[0]["total"])
+        self.assertEqual(series[-1]["cumulative"], UserAnalytics.objects.count())
+
+    def test_sync_keeps_daily_rollup_current(self):
+        self.client.post("/api/sync/users/", {
+            "uid": "nuevo", "name": "Nuevo", "email": "nuevo@trofi.test",
+            "is_worker": True, "created_at": "2024-09-10T12:00:00Z",
+        }, content_type="application/json")
+        day = UserDayRollup.objects.get(day="2024-09-10")
+        self.assertEqual((day.workers, day.clients), (1, 1))
+
+
+@override_settings(ANALYTICS_STATS_CACHE_ALIAS=None)
+class BenchmarkTests(TestCase):
+
+    def test_generated_data_and_measurements(self):
+        dataset = generate(jobs=3, users=60, reviews=300, seed=1)
+        self.assertEqual(dataset["users"], UserAnalytics.objects.count())
+        self.assertEqual(dataset["reviews"], ReviewAnalytics.objects.count())
+
+        result = run_benchmarks(
+            TestClientTransport(), dataset["users"], iterations=3, warmup=1,
+            only=["stats.users", "sync.review"], dataset=dataset,
+        )
+        self.assertEqual(list(result["endpoints"]), ["stats.users", "stats.users.week", "sync.review", "sync.review.batch"])
+        for row in result["endpoints"].values():
+            self.assertEqual(row["errors"], 0)
+            self.assertLessEqual(row["p50_ms"], row["p99_ms"])
+        self.assertEqual(result["endpoints"]["stats.users"]["queries"], 1)
+
+        worse = {"endpoints": {"stats.users": {**result["endpoints"]["stats.users"], "queries": 5}}}
+        self.assertEqual(compare(result, worse), ["stats.users: consultas 1 → 5"])
+
+
+class FastValidationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_analytics(jobs=1, workers_per_job=1, clients=1)
+
+    def assertSameAsSerializer(self, spec, record):
+        data, errors = spec.validator.validate(record)
+        serializer = spec.serializer_class(data=record)
+        if serializer.is_valid():
+            self.assertIsNone(errors)
+            self.assertEqual(data, serializer.validated_data)
+        else:
+            self.assertIsNone(data)
+            self.assertEqual(repr(errors), repr(serializer.errors))
+
+    def test_same_result_as_serializer(self):
+        user = {"uid": "u-1", "name": "U", "email": "u1@trofi.test", "is_worker": True, "job": "job-0"}
+        review = {"id": "r-1", "reviewer": "client-0", "reviewed": "worker-0-0", "score": 4.5}
+        cases = [
+            (JOB_BATCH, {"firebase_key": "job-9", "name": "Oficio 9"}),
+            (JOB_BATCH, {"name": ""}),
+            (USER_BATCH, user),
+            (USER_BATCH, {**user, "job": "no-existe", "email": "no-es-email"}),
+            (USER_BATCH, {**user, "is_worker": False}),
+            (USER_BATCH, {**user, "job": ["job-0"]}),
+            (REVIEW_BATCH, review),
+            (REVIEW_BATCH, {**review, "reviewed": "client-0", "score": 7}),
+            (REVIEW_BATCH, ["no", "es", "un", "objeto"]),
+        ]
+        for spec, record in cases:
+            with self.subTest(spec=spec.name, record=record):
+                self.assertSameAsSerializer(spec, record)
+
+
+class ReviewReferenceTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_analytics(jobs=1, workers_per_job=3, clients=2)
+
+    def review(self, n, **fields):
+        return {
+            "id": f"new-{n}", "reviewer": "client-0", "reviewed": "worker-0-0", "score": 4,
+            "description": "Buen trabajo", "created_at": "2024-07-01T00:00:00Z", **fields,
+        }
+
+    def test_batch_checks_users_in_one_query(self):
+        records = [self.review(n, reviewed=f"worker-0-{n % 3}") for n in range(20)]
+        records += [self.review(20, reviewer="nadie"), self.review(21, reviewed="client-0", reviewer="client-0")]
+
+        with self.assertNumQueries(1):
+            results, pending = validate_batch(REVIEW_BATCH, records)
+
+        self.assertEqual(len(pending), 20)
+        self.assertEqual(results[20]["errors"], {"reviewer": ['Invalid pk "nadie" - object does not exist.']})
+        self.assertEqual(results[21]["errors"], {"non_field_errors": ["No puedes reseñarte a ti mismo."]})
+
+    def test_single_sync_reports_unknown_user(self):
+        response = self.client.post(
+            "/api/sync/reviews/", self.review(0, reviewed="nadie"), content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {"reviewed": ['Invalid pk "nadie" - object does not exist.']})
+        self.assertFalse(ReviewAnalytics.objects.filter(pk="new-0").exists())
+
+
+@override_settings(ANALYTICS_STATS_CACHE_ALIAS=None)
+class ExportTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_analytics(jobs=2, workers_per_job=2, clients=2)
+        ReviewAnalytics.objects.update(description="ok, \"con\" comas")
+
+    def export(self, url, **headers):
+        response = self.client.get(url, **headers)
+        self.assertEqual(response.status_code, 200)
+        return response, response.getvalue().decode()
+
+    def ndjson(self, url):
+        return [json.loads(line) for line in self.export(url)[1].splitlines()]
+
+    def csv(self, url):
+        return list(csv.DictReader(io.StringIO(self.export(url)[1])))
+
+    def test_csv_and_ndjson_encode_values_the_same(self):
+        for name in ("users", "reviews"):
+            with self.subTest(name=name):
+                rows = self.ndjson(f"/api/export/{name}/?format=ndjson")
+                as_text = [{key: "" if value is None else str(value).lower() if isinstance(value, bool) else str(value)
+                            for key, value in row.items()} for row in rows]
+                self.assertEqual(self.csv(f"/api/export/{name}/?format=csv"), as_text)
+
+        review = self.ndjson("/api/export/reviews/?format=ndjson&limit=1")[0]
+        self.assertEqual((review["score"], review["created_at"]), ("1.0", "2024-06-01T00:00:00Z"))
+        self.assertEqual(self.csv("/api/export/users/?format=csv&limit=1")[0]["is_worker"], "false")
+
+    def test_after_resumes_in_pk_order(self):
+        expected = list(ReviewAnalytics.objects.order_by("pk").values_list("pk", flat=True))
+        first = [row["id"] for row in self.ndjson("/api/export/reviews/?format=ndjson&limit=3")]
+        rest = [row["id"] for row in self.ndjson(f"/api/export/reviews/?format=ndjson&after={first[-1]}")]
+        self.assertEqual(first + rest, expected)
+
+        # Al retomar en CSV no se repite el encabezado
+        _, resumed = self.export(f"/api/export/reviews/?format=csv&after={first[-1]}")
+        self.assertEqual(len(resumed.splitlines()), len(rest))
+        self.assertTrue(resumed.startswith(rest[0] + ","))
+
+    def test_format_param_and_accept_header(self):
+        response, _ = self.export("/api/export/users/")
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        response, body = self.export("/api/export/users/", HTTP_ACCEPT="text/csv")
+        self.assertEqual(response["Content-Type"], "text/csv; charset=utf-8")
+        self.assertTrue(body.startswith("uid,name,email,is_worker,created_at,job\r\n"))
+        response, _ = self.export("/api/export/users/?format=csv")
+        self.assertEqual(response["Content-Disposition"], 'attachment; filename="users.csv"')
+
+        self.assertEqual(self.client.get("/api/export/users/?format=xml").status_code, 404)
+        self.assertEqual(self.client.get("/api/export/users/?limit=0").status_code, 400)
+
+
+class ReconcileTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_analytics(jobs=2, workers_per_job=3, clients=3)
+        ReviewAnalytics.objects.update(description="ok")
+
+    def ranges(self, query):
+        response = self.client.get(f"/api/reconcile/reviews/?{query}")
+        self.assertEqual(response.status_code, 200)
+        return {item["range"]: item["checksum"] for item in response.json()["ranges"]}
+
+    def test_only_differing_ranges_are_sent_and_applied(self):
+        source = self.ranges("by=prefix&depth=8")
+        source_rows = {
+            row["id"]: row for row in
+            (json.loads(line) for line in self.client.get("/api/export/reviews/?format=ndjson").getvalue().decode().splitlines())
+        }
+
+        # Django se desvía: un score cambiado y una reseña que Firebase no tiene
+        ReviewAnalytics.objects.filter(pk="review-0-0").update(score=Decimal("5.0"))
+        ReviewAnalytics.objects.create(
+            id="review-x", reviewer_id="client-0", reviewed_id="worker-0-0", score=5,
+            description="ok", created_at=datetime(2024, 6, 1, tzinfo=timezone.utc),
+        )
+        rebuild_rollups()
+
+        local = self.ranges("by=prefix&depth=8")
+        differing = sorted(label for label in source.keys() | local.keys() if source.get(label) != local.get(label))
+        self.assertEqual(differing, ["review-0", "review-x"])
+
+        response = self.client.post("/api/reconcile/reviews/", {
+            "by": "prefix",
+            "depth": 8,
+            "ranges": {
+                label: [row for key, row in source_rows.items() if key[:8] == label]
+                for label in differing
+            },
+        }, content_type="application/json")
+        self.assertTrue(response.json()["ok"])
+        self.assertEqual([item["deleted"] for item in response.json()["ranges"]], [0, 1])
+
+        self.assertEqual(self.ranges("by=prefix&depth=8"), source)
+        scores = dict(ScoreRollup.objects.exclude(count=0).values_list("score", "count"))
+        rebuild_rollups()
+        self.assertEqual(dict(ScoreRollup.objects.values_list("score", "count")), scores)
+
+    def test_rejects_records_outside_the_range(self):
+        response = self.client.post("/api/reconcile/reviews/", {
+            "by": "month",
+            "ranges": {"2024-05": [{
+                "id": "review-y", "reviewer": "client-0", "reviewed": "worker-0-0", "score": 3,
+                "description": "ok", "created_at": "2024-06-01T00:00:00Z",
+            }]},
+        }, content_type="application/json")
+        result = response.json()["ranges"][0]
+        self.assertEqual((result["failed"], result["deleted"]), (1, 0))
+        self.assertFalse(ReviewAnalytics.objects.filter(pk="review-y").exists())
+
+
+@override_settings(ANALYTICS_STATS_CACHE_ALIAS=None, ANALYTICS_REVIEW_SAMPLE_SIZE=8)
+class ApproximateStatsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_analytics(jobs=2, workers_per_job=4, clients=5)
+
+    def test_sample_follows_writes(self):
+        records = [
+            {
+                "id": f"new-{n}", "reviewer": f"client-{n % 5}", "reviewed": f"worker-{n % 2}-{n % 4}",
+                "score": 1 + n % 9 / 2, "description": "ok", "created_at": "2024-07-01T00:00:00Z",
+            }
+            for n in range(40)
+        ]
+        self.client.post("/api/sync/reviews/batch/", records, content_type="application/json")
+        self.client.delete("/api/sync/reviews/review-0-0/")
+
+        threshold = current_threshold()
+        self.assertLess(threshold, 1)
+        expected = {pk for pk in ReviewAnalytics.objects.values_list("id", flat=True) if priority(pk) < threshold}
+        self.assertEqual(set(ReviewSample.objects.values_list("id", flat=True)), expected)
+
+    def test_approx_mode_reports_error_bounds(self):
+        exact = self.client.get("/api/analytics/reviews/?from=2024-01-01").json()["data"]
+        approx = self.client.get("/api/analytics/reviews/?from=2024-01-01&mode=approx").json()["data"]
+
+        bounds = approx["approximation"]
+        self.assertEqual(bounds["sample_size"], ReviewSample.objects.count())
+        self.assertLessEqual(abs(approx["total_reviews"] - exact["total_reviews"]), bounds["total_reviews_error"])
+        self.assertLessEqual(abs(approx["global_average"] - exact["global_average"]), bounds["global_average_error"])
+
+        # Sin filtros los rollups ya son exactos
+        unfiltered = self.client.get("/api/analytics/reviews/?mode=approx").json()["data"]
+        self.assertEqual(unfiltered["total_reviews"], 40)
+        self.assertEqual(unfiltered["approximation"]["total_reviews_error"], 0)
+
+
+@override_settings(ANALYTICS_STATS_CACHE_ALIAS=None)
+class LeaderboardTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_analytics(jobs=2, workers_per_job=3, clients=3)
+        # Un trabajador sin oficio con una sola reseña
+        UserAnalytics.objects.create(
+            uid="sin-oficio", name="Sin oficio", email="so@trofi.test", is_worker=True,
+            created_at=datetime(2024, 2, 1, tzinfo=timezone.utc),
+        )
+        ReviewAnalytics.objects.create(
+            id="review-so", reviewer_id="client-0", reviewed_id="sin-oficio", score=Decimal("5.0"),
+            description="ok", created_at=datetime(2024, 6, 1, tzinfo=timezone.utc),
+        )
+        rebuild_rollups()
+
+    def top_workers(self, query):
+        response = self.client.get(f"/api/analytics/workers/?{query}")
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()["data"]["top_workers"]
+
+    def test_limit_and_min_reviews(self):
+        for base in ("", "from=2024-01-01&"):
+            with self.subTest(base=base):
+                self.assertEqual(len(self.top_workers(base + "limit=1")), 1)
+                self.assertEqual(len(self.top_workers(base + "limit=100")), 7)
+                ranked = self.top_workers(base)
+                self.assertEqual(ranked[0]["uid"], "sin-oficio")
+                self.assertEqual([w["avg_score"] for w in ranked], sorted((w["avg_score"] for w in ranked), reverse=True))
+
+                uids = [worker["uid"] for worker in self.top_workers(base + "min_reviews=2&limit=100")]
+                self.assertEqual(len(uids), 6)
+                self.assertNotIn("sin-oficio", uids)
+                self.assertEqual(self.top_workers(base + "min_reviews=4"), [])
+
+    def test_out_of_range_params_are_rejected(self):
+        for url in ("workers/", "dashboard/"):
+            for query, field in (
+                ("limit=0", "limit"), ("limit=101", "limit"), ("limit=diez", "limit"),
+                ("min_reviews=0", "min_reviews"), ("min_reviews=1.5", "min_reviews"),
+            ):
+                with self.subTest(url=url, query=query):
+                    response = self.client.get(f"/api/analytics/{url}?{query}")
+                    self.assertEqual(response.status_code, 400)
+                    self.assertIn(field, response.json())
+
+    def test_reviews_without_job_are_listed_last(self):
+        for query in ("", "from=2024-01-01", "from=2024-01-01&mode=approx"):
+            with self.subTest(query=query):
+                names = [
+                    item["reviewed__job__name"]
+                    for item in self.client.get(f"/api/analytics/reviews/?{query}").json()["data"]["average_by_job"]
+                ]
+                self.assertEqual(names, ["Oficio 0", "Oficio 1", None])
+
+
+def user_record(uid, name="Nuevo", **fields):
+    record = {
+        "uid": uid, "name": name, "email": f"{uid}@trofi.test",
+        "is_worker": False, "created_at": "2024-03-01T00:00:00Z",
+    }
+    record.update(fields)
+    return record
+
+
+@override_settings(ANALYTICS_STATS_CACHE_ALIAS=None)
+class SyncBatchTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_analytics(jobs=2, workers_per_job=2, clients=2)
+
+    def post(self, url, records):
+        response = self.client.post(url, records, content_type="application/json")
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def test_mixed_batch_reports_each_item(self):
+        body = self.post("/api/sync/users/batch/", [
+            user_record("u1", "Primero"),
+            user_record("u2", email="no-es-email"),
+            "no es un objeto",
+            user_record("worker-0-0", "Renombrado", is_worker=True, job="job-1"),
+            user_record("u3", is_worker=True, job="no-existe"),
+            user_record("u1", "Último"),
+        ])
+
+        self.assertEqual((body["ok"], body["total"], body["synced"], body["failed"]), (False, 6, 3, 3))
+        self.assertEqual([item["index"] for item in body["results"]], list(range(6)))
+        self.assertEqual([item["ok"] for item in body["results"]], [True, False, False, True, False, True])
+        self.assertIn("email", body["results"][1]["errors"])
+        self.assertIn("non_field_errors", body["results"][2]["errors"])
+        self.assertIn("job", body["results"][4]["errors"])
+        self.assertEqual(body["results"][5]["key"], "u1")
+
+        # Una clave repetida se escribe una vez, con el último registro
+        self.assertEqual(UserAnalytics.objects.get(uid="u1").name, "Último")
+        self.assertFalse(UserAnalytics.objects.filter(uid__in=["u2", "u3"]).exists())
+        worker = UserAnalytics.objects.select_related("job").get(uid="worker-0-0")
+        self.assertEqual((worker.name, worker.job.firebase_key), ("Renombrado", "job-1"))
+
+    def test_job_that_is_not_a_string_is_a_validation_error(self):
+        for job in (["job-0"], {"key": "job-0"}, 7):
+            with self.subTest(job=job):
+                response = self.client.post("/api/sync/users/", user_record("u1", job=job), content_type="application/json")
+                self.assertEqual(response.status_code, 400)
+                self.assertIn("job", response.json())
+                response = self.client.put("/api/sync/users/worker-0-0/", {"job": job}, content_type="application/json")
+                self.assertEqual(response.status_code, 400)
+
+        body = self.post("/api/sync/users/batch/", [
+            user_record("u1", job=["job-0"]),
+            user_record("u2", is_worker=True, job="job-0"),
+            user_record("u3", job={"key": "job-1"}),
+        ])
+        self.assertEqual([item["ok"] for item in body["results"]], [False, True, False])
+        self.assertIn("job", body["results"][0]["errors"])
+        self.assertEqual(list(UserAnalytics.objects.filter(uid__in=["u1", "u2", "u3"]).values_list("uid", flat=True)), ["u2"])
+
+    def test_review_references_are_checked_per_item(self):
+        review = {"reviewer": "client-0", "reviewed": "worker-0-0", "score": 4, "description": "ok", "created_at": "2024-07-01T00:00:00Z"}
+        body = self.post("/api/sync/reviews/batch/", [
+            dict(review, id="r1"),
+            dict(review, id="r2", reviewer="no-existe"),
+            dict(review, id="r3", score="mucho"),
+        ])
+        self.assertEqual([item["ok"] for item in body["results"]], [True, False, False])
+        self.assertEqual(list(body["results"][1]["errors"]), ["reviewer"])
+        self.assertIn("score", body["results"][2]["errors"])
+        self.assertEqual(list(ReviewAnalytics.objects.filter(id__in=["r1", "r2", "r3"]).values_list("id", flat=True)), ["r1"])
+
+    def test_replayed_record_is_an_update(self):
+        review = {"id": "r1", "reviewer": "client-0", "reviewed": "u1", "score": 4, "description": "ok", "created_at": "2024-07-01T00:00:00Z"}
+        posts = [
+            ("sync/jobs/", {"firebase_key": "job-nuevo", "name": "Gasista"}),
+            ("sync/users/", user_record("u1", is_worker=True, job="job-nuevo")),
+            ("sync/reviews/", review),
+        ]
+        for url, record in posts:
+            with self.subTest(url=url):
+                first = self.client.post(f"/api/{url}", record, content_type="application/json")
+                stats = self.client.get("/api/analytics/dashboard/").json()["data"]
+                replays = [
+                    self.client.post(f"/api/{url}", record, content_type="application/json"),
+                    self.client.post(f"/api/async/{url}", record, content_type="application/json"),
+                    self.client.post(f"/api/{url}batch/", [record], content_type="application/json"),
+                ]
+                self.assertEqual([first.status_code] + [replay.status_code for replay in replays], [201, 200, 200, 200])
+                self.assertEqual(self.client.get("/api/analytics/dashboard/").json()["data"], stats)
+
+        self.assertEqual(Job.objects.filter(firebase_key="job-nuevo").count(), 1)
+        self.assertEqual(ReviewAnalytics.objects.filter(reviewed_id="u1").count(), 1)
+        stats = self.client.get("/api/analytics/dashboard/").json()["data"]
+        rebuild_rollups()
+        self.assertEqual(self.client.get("/api/analytics/dashboard/").json()["data"], stats)
+
+    def test_failing_chunk_rolls_back_only_its_rows(self):
+        real_upsert = sync_module.upsert
+
+        def failing_upsert(spec, rows):
+            # Escribe primero, así se ve que el rollback alcanza al chunk entero
+            instances = real_upsert(spec, rows)
+            if any(data["uid"] == "boom" for data in rows):
+                raise DatabaseError("falla simulada")
+            return instances
+
+        users_before = self.client.get("/api/analytics/users/").json()["data"]
+        with mock.patch.object(sync_module, "BATCH_CHUNK_SIZE", 2), \
+                mock.patch.object(sync_module, "upsert", failing_upsert):
+            body = self.post("/api/sync/users/batch/", [
+                user_record("u1"), user_record("u2"),
+                user_record("boom"), user_record("u3"),
+                user_record("u4"),
+            ])
+
+        self.assertEqual([item["ok"] for item in body["results"]], [True, True, False, False, True])
+        self.assertEqual(body["results"][2]["errors"], {"non_field_errors": ["falla simulada"]})
+        self.assertEqual(
+            set(UserAnalytics.objects.filter(uid__in=["u1", "u2", "u3", "u4", "boom"]).values_list("uid", flat=True)),
+            {"u1", "u2", "u4"},
+        )
+        # Los deltas de los rollups del chunk fallido también se deshicieron
+        live = self.client.get("/api/analytics/users/").json()["data"]
+        self.assertEqual(live["total_users"], users_before["total_users"] + 3)
+        rebuild_rollups()
+        self.assertEqual(self.client.get("/api/analytics/users/").json()["data"], live)
+
+
+@override_settings(ANALYTICS_STATS_CACHE_ALIAS=None)
+class ReviewDeleteTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_analytics(jobs=2, workers_per_job=3, clients=4)
+
+    def test_single_delete_is_one_statement(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.delete("/api/sync/reviews/review-0-0/")
+        self.assertEqual(response.status_code, 200)
+        statements = [query["sql"] for query in queries.captured_queries if "analytics_review\"" in query["sql"]]
+        self.assertEqual(len([sql for sql in statements if sql.startswith("DELETE")]), 1)
+        self.assertFalse(any(sql.startswith("SELECT") and "LIMIT" in sql for sql in statements))
+
+        self.assertEqual(self.client.delete("/api/sync/reviews/review-0-0/").status_code, 404)
+
+    def test_batch_delete_keeps_rollups(self):
+        ids = [f"review-{c}-{w}" for c in range(3) for w in range(6)]
+        response = self.client.post(
+            "/api/sync/reviews/batch/delete/", {"ids": ids + ["no-existe"]}, content_type="application/json"
+        )
+        self.assertEqual((response.json()["deleted"], response.json()["missing"]), (18, ["no-existe"]))
+        self.assertEqual(ReviewAnalytics.objects.count(), 6)
+
+        live = self.client.get("/api/analytics/reviews/").json()["data"]
+        rebuild_rollups()
+        self.assertEqual(self.client.get("/api/analytics/reviews/").json()["data"], live)
+
+
+@override_settings(ANALYTICS_STATS_CACHE_ALIAS=None)
+class JobDrillDownTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_analytics()
+
+    def test_detail_follows_job_changes(self):
+        self.client.put("/api/sync/users/worker-0-1/", {"job": "job-2"}, content_type="application/json")
+        self.assertFalse(ReviewAnalytics.objects.filter(reviewed="worker-0-1").exclude(job__firebase_key="job-2").exists())
+
+        job = Job.objects.get(firebase_key="job-2")
+        data = self.client.get(f"/api/analytics/jobs/{job.pk}/").json()["data"]
+        reviews = ReviewAnalytics.objects.filter(reviewed__job=job)
+        self.assertEqual(data["total_workers"], 5)
+        self.assertEqual(data["total_reviews"], reviews.count())
+        self.assertEqual(sum(item["count"] for item in data["score_distribution"]), reviews.count())
+        self.assertEqual(data["reviews_by_month"], [{"month": "2024-06", "total": reviews.count()}])
+        self.assertIn("worker-0-1", [worker["uid"] for worker in data["top_workers"]])
+
+        self.assertEqual(self.client.get("/api/analytics/jobs/no-existe/").status_code, 404)
+
+    def test_job_filters_read_the_copy_in_reviews(self):
+        self.client.put("/api/sync/users/worker-0-1/", {"job": "job-2"}, content_type="application/json")
+        expected = ReviewAnalytics.objects.filter(reviewed__job__firebase_key="job-2").count()
+
+        for url in (
+            "/api/analytics/reviews/?job=job-2",
+            "/api/analytics/reviews/?job=job-2&mode=approx",
+            "/api/list/reviews/?job=job-2&limit=100",
+        ):
+            with self.subTest(url=url):
+                with CaptureQueriesContext(connection) as queries:
+                    body = self.client.get(url).json()
+                total = body["data"]["total_reviews"] if "data" in body else len(body["results"])
+                self.assertEqual(total, expected)
+                review_reads = [query["sql"] for query in queries.captured_queries if '"analytics_review' in query["sql"]]
+                self.assertTrue(review_reads)
+                self.assertFalse([sql for sql in review_reads if '"analytics_user"' in sql])
+
+    def test_numeric_firebase_keys_win_over_ids(self):
+        target = Job.objects.get(firebase_key="job-0")
+        numeric = Job.objects.create(name="Numérico", firebase_key=str(target.pk))
+        UserAnalytics.objects.create(
+            uid="numeric-worker", name="N", email="n@trofi.test", is_worker=True, job=numeric,
+            created_at=datetime(2024, 1, 1, tzinfo=timezone.utc),
+        )
+        rebuild_rollups()
+
+        by_key = self.client.get(f"/api/analytics/jobs/{target.pk}/").json()["data"]
+        self.assertEqual(by_key["total_workers"], 1)
+        by_id = self.client.get(f"/api/analytics/jobs/id:{target.pk}/").json()["data"]
+        self.assertEqual(by_id["total_workers"], 4)
+        workers = self.client.get(f"/api/list/users/?job={target.pk}").json()["results"]
+        self.assertEqual([user["uid"] for user in workers], ["numeric-worker"])
+
+        # Un id sin job es un 400 en los filtros y un 404 en el detalle
+        for query in ("job=999999", "job=id:999999", "job=id:abc"):
+            with self.subTest(query=query):
+                self.assertEqual(self.client.get(f"/api/analytics/workers/?{query}").status_code, 400)
+                self.assertEqual(self.client.get(f"/api/list/users/?{query}").status_code, 400)
+        self.assertEqual(self.client.get("/api/analytics/jobs/999999/").status_code, 404)
+        self.assertEqual(self.client.get(f"/api/analytics/workers/?job={numeric.pk}").status_code, 200)
+
+
+@override_settings(ANALYTICS_STATS_CACHE_ALIAS=None, ANALYTICS_STATS_SNAPSHOTS=True)
+class StatsSnapshotTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_analytics()
+
+    def test_views_serve_snapshot_until_live_is_requested(self):
+        live = self.client.get("/api/analytics/dashboard/").json()
+        build_snapshot()
+        snapshot = StatsSnapshot.objects.get()
+
+        with self.assertNumQueries(1):
+            served = self.client.get("/api/analytics/dashboard/").json()
+        self.assertEqual(served["data"], live["data"])
+        self.assertEqual(served["generated_at"], snapshot.generated_at.isoformat().replace("+00:00", "Z"))
+
+        UserAnalytics.objects.create(
+            uid="new-user", name="Nuevo", email="nuevo@trofi.test", created_at=datetime(2024, 3, 1, tzinfo=timezone.utc),
+        )
+        rebuild_rollups()
+        total = self.client.get("/api/analytics/users/").json()["data"]["total_users"]
+        self.assertEqual(total, live["data"]["users"]["total_users"])
+        total = self.client.get("/api/analytics/users/?live=1").json()["data"]["total_users"]
+        self.assertEqual(total, live["data"]["users"]["total_users"] + 1)
+        # Con filtros o un ranking distinto siempre se calcula en vivo
+        workers = self.client.get("/api/analytics/workers/?limit=3").json()
+        self.assertEqual(len(workers["data"]["top_workers"]), 3)
+        self.assertNotEqual(workers["generated_at"], served["generated_at"])
+
+    def test_command_swaps_snapshot(self):
+        build_snapshot()
+        first = StatsSnapshot.objects.get()
+        call_command("snapshot_stats", stdout=StringIO())
+        self.assertEqual(StatsSnapshot.objects.count(), 1)
+        self.assertGreater(StatsSnapshot.objects.get().generated_at, first.generated_at)
+
+        with override_settings(ANALYTICS_STATS_SNAPSHOT_MAX_AGE=0):
+            self.assertIsNone(latest_snapshot())
+
+
+ASYNC_STATS_URLS = [
+    "analytics/users/",
+    "analytics/users/?from=2024-02-01&granularity=week",
+    "analytics/workers/?limit=3&job=job-1",
+    "analytics/reviews/?from=2024-01-01&to=2024-12-31",
+    "analytics/dashboard/?fields=users,reviews",
+    "analytics/dashboard/?mode=approx",
+    "analytics/workers/?limit=0",
+    "analytics/users/?live=talvez",
+]
+
+
+class AsyncStatsMixin:
+    """
+    Las vistas async/ tienen que devolver lo mismo que las de DRF.
+    """
+
+    async def assert_async_matches_sync(self):
+        for url in ASYNC_STATS_URLS:
+            with self.subTest(url=url):
+                expected = await self.async_client.get(f"/api/{url}")
+                response = await self.async_client.get(f"/api/async/{url}")
+                self.assertEqual(response.status_code, expected.status_code)
+                body, expected_body = response.json(), expected.json()
+                if expected.status_code == 200:
+                    self.assertIn("generated_at", body)
+                    body.pop("generated_at")
+                    expected_body.pop("generated_at")
+                self.assertEqual(body, expected_body)
+
+
+@override_settings(ANALYTICS_STATS_CACHE_ALIAS=None, ANALYTICS_ASYNC_PARALLEL_QUERIES=False)
+class AsyncStatsViewTests(AsyncStatsMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_analytics()
+
+    async def test_async_views_match_sync_views(self):
+        await self.assert_async_matches_sync()
+
+    @override_settings(ANALYTICS_STATS_SNAPSHOTS=True)
+    async def test_async_views_serve_the_same_snapshot(self):
+        await sync_to_async(build_snapshot)()
+        for url in ["analytics/users/", "analytics/workers/", "analytics/dashboard/"]:
+            with self.subTest(url=url):
+                expected = (await self.async_client.get(f"/api/{url}")).json()
+                self.assertEqual((await self.async_client.get(f"/api/async/{url}")).json(), expected)
+
+    @override_settings(ANALYTICS_STATS_CACHE_ALIAS="analytics")
+    async def test_async_views_use_response_cache(self):
+        await sync_to_async(caches["analytics"].clear)()
+        first = await self.async_client.get("/api/async/analytics/dashboard/")
+        second = await self.async_client.get(
+            "/api/async/analytics/dashboard/", headers={"if-none-match": first["ETag"]},
+        )
+        self.assertEqual(second.status_code, 304)
+        self.assertEqual(second["ETag"], first["ETag"])
+
+
+@override_settings(ANALYTICS_STATS_CACHE_ALIAS=None, ANALYTICS_ASYNC_PARALLEL_QUERIES=True)
+class AsyncParallelStatsViewTests(AsyncStatsMixin, TransactionTestCase):
+    """
+    Las lecturas en paralelo usan otras conexiones: necesitan los datos
+    confirmados, no dentro de la transacción de un TestCase.
+    """
+
+    def setUp(self):
+        seed_analytics()
+        clear_job_cache()
+
+    async def test_parallel_reads_match_sync_views(self):
+        await self.assert_async_matches_sync()
+
+
+@override_settings(ANALYTICS_STATS_CACHE_ALIAS=None)
+class InstrumentationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_analytics()
+
+    def test_server_timing_and_log_report_queries(self):
+        with self.assertLogs("analytics.requests", "INFO") as logs:
+            response = self.client.get("/api/analytics/reviews/")
+
+        self.assertIn('db;dur=', response["Server-Timing"])
+        self.assertIn('desc="2 queries"', response["Server-Timing"])
+        line = json.loads(logs.records[-1].getMessage())
+        self.assertEqual((line["endpoint"], line["queries"]), ("api/analytics/reviews/", 2))
+        self.assertTrue(line["slowest_sql"].startswith("SELECT"))
+
+    def test_metrics_endpoint_exposes_histograms(self):
+        self.client.get("/api/analytics/users/")
+        body = self.client.get("/api/metrics/").content.decode()
+        self.assertIn("# TYPE trofi_request_queries histogram", body)
+        self.assertIn('trofi_request_queries_bucket{endpoint="api/analytics/users/",method="GET",le="1"}', body)
+
+
+class IngestQueueTests(TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        settings = override_settings(
+            ANALYTICS_INGEST_MODE=True,
+            ANALYTICS_INGEST_QUEUE_PATH=Path(tmp.name) / "queue.sqlite3",
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def post(self, url, data):
+        return self.client.post(url, data, content_type="application/json")
+
+    def test_writes_are_queued_and_coalesced_when_drained(self):
+        user = {
+            "uid": "u1", "name": "Primero", "email": "u1@trofi.test",
+            "is_worker": True, "created_at": "2024-03-01T00:00:00Z", "job": "job-x",
+        }
+        self.assertEqual(self.post("/api/sync/jobs/", {"firebase_key": "job-x", "name": "Gasista"}).status_code, 202)
+        # El job todavía está en la cola: la referencia se acepta igual
+        self.assertEqual(self.post("/api/sync/users/", user).status_code, 202)
+        self.assertEqual(self.post("/api/sync/users/", {**user, "name": "Segundo"}).status_code, 202)
+        response = self.client.put("/api/sync/users/u1/", {"email": "nuevo@trofi.test"}, content_type="application/json")
+        self.assertEqual(response.status_code, 202)
+        self.assertFalse(UserAnalytics.objects.exists())
+
+        self.assertEqual(drain_once(), (4, 2, 0))
+
+        # El uid en el cuerpo del PUT no choca con el usuario existente
+        response = self.client.put("/api/sync/users/u1/", {"uid": "u1", "email": "nuevo@trofi.test"}, content_type="application/json")
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(drain_once(), (1, 1, 0))
+
+        user = UserAnalytics.objects.select_related("job").get()
+        self.assertEqual((user.name, user.email, user.job.firebase_key), ("Segundo", "nuevo@trofi.test", "job-x"))
+        self.assertEqual(drain_once(), (0, 0, 0))
+
+    def test_deletes_and_job_updates_keep_queue_order(self):
+        job = Job.objects.create(name="Plomero", firebase_key="job-p")
+        for uid in ("a", "b"):
+            UserAnalytics.objects.create(uid=uid, name=uid, email=f"{uid}@trofi.test", created_at=datetime(2024, 1, 1, tzinfo=timezone.utc))
+
+        review = {"id": "rq", "reviewer": "a", "reviewed": "b", "score": 4, "description": "ok", "created_at": "2024-02-01T00:00:00Z"}
+        self.assertEqual(self.post("/api/sync/reviews/", review).status_code, 202)
+        self.assertEqual(self.client.delete("/api/sync/reviews/rq/").status_code, 202)
+        self.assertEqual(self.client.delete("/api/sync/reviews/no-existe/").status_code, 404)
+
+        self.assertEqual(self.post("/api/sync/jobs/", {"firebase_key": "job-p", "name": "Viejo"}).status_code, 202)
+        response = self.client.put(f"/api/sync/jobs/{job.pk}/", {"firebase_key": "job-q", "name": "Gasista"}, content_type="application/json")
+        self.assertEqual(response.status_code, 202)
+
+        drain_once()
+        self.assertFalse(ReviewAnalytics.objects.filter(pk="rq").exists())
+        job.refresh_from_db()
+        self.assertEqual((job.firebase_key, job.name), ("job-q", "Gasista"))
+
+    def test_patch_of_unknown_user_is_not_found(self):
+        patch = {"name": "Otro"}
+        self.assertEqual(self.client.put("/api/sync/users/nadie/", patch, content_type="application/json").status_code, 404)
+
+        self.assertEqual(self.post("/api/sync/users/", user_record("u1")).status_code, 202)
+        UserAnalytics.objects.create(uid="u2", name="U2", email="u2@trofi.test", created_at=datetime(2024, 1, 1, tzinfo=timezone.utc))
+        for uid in ("u1", "u2"):
+            with self.subTest(uid=uid):
+                self.assertEqual(self.client.put(f"/api/sync/users/{uid}/", patch, content_type="application/json").status_code, 202)
+
+        drain_once()
+        self.assertEqual(set(UserAnalytics.objects.values_list("name", flat=True)), {"Otro"})
+
+    def test_partly_queued_references_report_the_other_errors(self):
+        self.assertEqual(self.post("/api/sync/jobs/", {"firebase_key": "job-x", "name": "Gasista"}).status_code, 202)
+        self.assertEqual(self.post("/api/sync/users/", user_record("a")).status_code, 202)
+
+        # El job está en la cola pero el email es inválido
+        invalid = user_record("u1", is_worker=True, job="job-x", email="no-es-email")
+        response = self.post("/api/sync/users/", invalid)
+        self.assertEqual((response.status_code, list(response.json())), (400, ["email"]))
+        body = self.post("/api/sync/users/batch/", [invalid]).json()
+        self.assertEqual(list(body["results"][0]["errors"]), ["email"])
+        response = self.client.put("/api/sync/users/a/", {"job": "job-x", "email": "no-es-email"}, content_type="application/json")
+        self.assertEqual((response.status_code, list(response.json())), (400, ["email"]))
+
+        # El reviewer está en la cola; el reviewed no existe en ningún lado
+        review = {"id": "r1", "reviewer": "a", "reviewed": "nadie", "score": 4, "description": "ok", "created_at": "2024-02-01T00:00:00Z"}
+        response = self.post("/api/sync/reviews/", review)
+        self.assertEqual((response.status_code, list(response.json())), (400, ["reviewed"]))
+
+    def test_queued_job_rename_resolves_the_new_key(self):
+        job = Job.objects.create(name="Plomero", firebase_key="j1")
+        response = self.client.put(f"/api/sync/jobs/{job.pk}/", {"firebase_key": "j9", "name": "Plomero"}, content_type="application/json")
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(self.post("/api/sync/users/", user_record("u1", is_worker=True, job="j9")).status_code, 202)
+        self.assertEqual(self.post("/api/sync/users/", user_record("u2", is_worker=True, job="j8")).status_code, 400)
+
+        self.assertEqual(drain_once(), (2, 2, 0))
+        self.assertEqual(UserAnalytics.objects.get(uid="u1").job_id, job.pk)
+
+    def test_invalid_records_are_rejected_before_queueing(self):
+        response = self.post("/api/sync/users/batch/", [
+            {"uid": "u1", "name": "Ok", "email": "ok@trofi.test", "is_worker": False, "created_at": "2024-03-01T00:00:00Z"},
+            {"uid": "u2", "name": "Mal", "email": "no-es-email", "is_worker": False, "created_at": "2024-03-01T00:00:00Z"},
+            {"uid": "u3", "name": "Sin job", "email": "u3@trofi.test", "is_worker": True, "created_at": "2024-03-01T00:00:00Z", "job": "falta"},
+        ])
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual([item["ok"] for item in response.json()["results"]], [True, False, False])
+        self.assertEqual(drain_once(), (1, 1, 0))
+
+
+class ListPaginationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_analytics()
+
+    def setUp(self):
+        clear_job_cache()
+        resolve_job_pks(["job-1"])
+
+    def walk(self, url):
+        seen, cursor = [], None
+        while True:
+            with self.assertNumQueries(1):
+                response = self.client.get(url + (f"&cursor={cursor}" if cursor else ""))
+            self.assertEqual(response.status_code, 200, response.content)
+            seen += response.json()["results"]
+            cursor = response.json()["next_cursor"]
+            if cursor is None:
+                return seen
+
+    def test_pages_cover_every_row_once_in_order(self):
+        # Muchas reseñas comparten created_at: el desempate es por id
+        reviews = self.walk("/api/list/reviews/?limit=7")
+        expected = list(ReviewAnalytics.objects.order_by("-created_at", "-id").values_list("id", flat=True))
+        self.assertEqual([review["id"] for review in reviews], expected)
+
+    def test_filters(self):
+        reviews = self.walk("/api/list/reviews/?limit=2&reviewed=worker-1-0&min_score=3")
+        expected = ReviewAnalytics.objects.filter(reviewed_id="worker-1-0", score__gte=3)
+        self.assertEqual(len(reviews), expected.count())
+
+        workers = self.walk("/api/list/users/?limit=3&is_worker=true&job=job-1")
+        self.assertEqual({user["job"] for user in workers}, {"job-1"})
+        self.assertEqual(len(workers), UserAnalytics.objects.filter(is_worker=True, job__firebase_key="job-1").count())
+
+    @skipUnless(connection.vendor == "sqlite", "EXPLAIN QUERY PLAN de SQLite")
+    def test_worker_pages_walk_an_index(self):
+        indexes = {tuple(index.fields): index.name for index in UserAnalytics._meta.indexes}
+        cursor = self.client.get("/api/list/users/?limit=2&is_worker=true").json()["next_cursor"]
+        for query, index in (
+            ("is_worker=true", indexes[("is_worker", "created_at", "uid")]),
+            ("is_worker=false", indexes[("is_worker", "created_at", "uid")]),
+            ("is_worker=true&job=job-1", indexes[("is_worker", "job", "created_at", "uid")]),
+        ):
+            with self.subTest(query=query):
+                with CaptureQueriesContext(connection) as queries:
+                    self.client.get(f"/api/list/users/?limit=2&{query}&cursor={cursor}")
+                with connection.cursor() as db:
+                    db.execute("EXPLAIN QUERY PLAN " + queries.captured_queries[-1]["sql"])
+                    plan = " | ".join(row[-1] for row in db.fetchall())
+                self.assertIn(f"USING INDEX {index} (is_worker=?", plan)
+                self.assertNotIn("TEMP B-TREE", plan)
+
+    def test_invalid_cursor_is_rejected(self):
+        response = self.client.get("/api/list/users/?cursor=no-es-un-cursor")
+        self.assertEqual(response.status_code, 400)
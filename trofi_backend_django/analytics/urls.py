@@ -1,16 +1,51 @@
 from django.urls import path
+from .async_views import (
+    AsyncUsersStatsView,
+    AsyncWorkersStatsView,
+    AsyncReviewsStatsView,
+    AsyncDashboardView,
+
+    AsyncSyncJobView,
+    AsyncSyncUserView,
+    AsyncSyncReviewView,
+    AsyncSyncJobBatchView,
+    AsyncSyncUserBatchView,
+    AsyncSyncReviewBatchView,
+)
 from .views import (
     UsersStatsView,
     WorkersStatsView,
     ReviewsStatsView,
+    DashboardView,
+    JobStatsView,
+
+    ExportUsersView,
+    ExportReviewsView,
+
+    ListUsersView,
+    ListReviewsView,
+
+    ReconcileJobsView,
+    ReconcileUsersView,
+    ReconcileReviewsView,
+
+    MetricsView,
 
     SyncJobView,
     SyncUserView,
     SyncReviewView,
+    SyncJobBatchView,
+    SyncUserBatchView,
+    SyncReviewBatchView,
+    SyncReviewBatchDeleteView,
 )
 
 urlpatterns = [
     # === SYNC ===
+    path("sync/jobs/batch/", SyncJobBatchView.as_view()),
+    path("sync/users/batch/", SyncUserBatchView.as_view()),
+    path("sync/reviews/batch/", SyncReviewBatchView.as_view()),
+    path("sync/reviews/batch/delete/", SyncReviewBatchDeleteView.as_view()),
     path("sync/jobs/", SyncJobView.as_view()),
     path("sync/jobs/<int:pk>/", SyncJobView.as_view()),
     path("sync/users/", SyncUserView.as_view()),
@@ -22,4 +57,34 @@ urlpatterns = [
     path("analytics/users/", UsersStatsView.as_view()),
     path("analytics/workers/", WorkersStatsView.as_view()),
     path("analytics/reviews/", ReviewsStatsView.as_view()),
+    path("analytics/dashboard/", DashboardView.as_view()),
+    path("analytics/jobs/<str:pk>/", JobStatsView.as_view()),
+
+    # === EXPORT ===
+    path("export/users/", ExportUsersView.as_view()),
+    path("export/reviews/", ExportReviewsView.as_view()),
+
+    # === LISTADOS ===
+    path("list/users/", ListUsersView.as_view()),
+    path("list/reviews/", ListReviewsView.as_view()),
+
+    # === RECONCILIACIÓN ===
+    path("reconcile/jobs/", ReconcileJobsView.as_view()),
+    path("reconcile/users/", ReconcileUsersView.as_view()),
+    path("reconcile/reviews/", ReconcileReviewsView.as_view()),
+
+    # === MÉTRICAS ===
+    path("metrics/", MetricsView.as_view()),
+
+    # === ASYNC (ASGI) ===
+    path("async/sync/jobs/batch/", AsyncSyncJobBatchView.as_view()),
+    path("async/sync/users/batch/", AsyncSyncUserBatchView.as_view()),
+    path("async/sync/reviews/batch/", AsyncSyncReviewBatchView.as_view()),
+    path("async/sync/jobs/", AsyncSyncJobView.as_view()),
+    path("async/sync/users/", AsyncSyncUserView.as_view()),
+    path("async/sync/reviews/", AsyncSyncReviewView.as_view()),
+    path("async/analytics/users/", AsyncUsersStatsView.as_view()),
+    path("async/analytics/workers/", AsyncWorkersStatsView.as_view()),
+    path("async/analytics/reviews/", AsyncReviewsStatsView.as_view()),
+    path("async/analytics/dashboard/", AsyncDashboardView.as_view()),
 ]
@@ -0,0 +1,89 @@
+"""
+Validación rápida para los endpoints de sync.
+
+Instanciar un ModelSerializer por registro es lo caro: cada instancia
+vuelve a construir sus campos a partir del modelo (build_field, deepcopy
+de los declarados). FastValidator arma los campos una sola vez por clase y
+para cada registro repite el mismo recorrido que
+Serializer.run_validation (campos, validate_<campo>, validators y
+validate()), con los mismos objetos Field. Por eso los errores son
+idénticos a los de serializer_class(data=record).is_valid().
+
+Los serializers pueden definir prepare_data(data) y clean_internal(value)
+para lo que antes hacían en to_internal_value; ambos caminos los usan.
+"""
+from collections.abc import Mapping
+from functools import cached_property
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from rest_framework.exceptions import ValidationError
+from rest_framework.fields import SkipField, get_error_detail
+from rest_framework.serializers import as_serializer_error
+from rest_framework.settings import api_settings
+
+
+class FastValidator:
+
+    def __init__(self, serializer_class):
+        self.serializer_class = serializer_class
+
+    @cached_property
+    def compiled(self):
+        # Una instancia sin datos solo para tomar sus campos ya construidos
+        serializer = self.serializer_class()
+        fields = [
+            (field, field.field_name, field.source_attrs, getattr(serializer, "validate_" + field.field_name, None))
+            for field in serializer._writable_fields
+        ]
+        return serializer, fields, list(serializer.validators)
+
+    def validate(self, record):
+        """
+        (validated_data, None) si el registro es válido, (None, errores) si no.
+        """
+        serializer, fields, validators = self.compiled
+
+        if not isinstance(record, Mapping):
+            message = serializer.error_messages["invalid"].format(datatype=type(record).__name__)
+            return None, ValidationError({api_settings.NON_FIELD_ERRORS_KEY: [message]}, code="invalid").detail
+
+        try:
+            value = self.to_internal_value(serializer, fields, record)
+        except ValidationError as exc:
+            return None, exc.detail
+
+        try:
+            if validators:
+                serializer.run_validators(value)
+            value = serializer.validate(value)
+        except (ValidationError, DjangoValidationError) as exc:
+            return None, ValidationError(detail=as_serializer_error(exc)).detail
+
+        return value, None
+
+    def to_internal_value(self, serializer, fields, data):
+        prepare = getattr(serializer, "prepare_data", None)
+        if prepare is not None:
+            data = prepare(data)
+
+        ret = {}
+        errors = {}
+        for field, name, source_attrs, validate_method in fields:
+            try:
+                value = field.run_validation(field.get_value(data))
+                if validate_method is not None:
+                    value = validate_method(value)
+            except ValidationError as exc:
+                errors[name] = exc.detail
+            except DjangoValidationError as exc:
+                errors[name] = get_error_detail(exc)
+            except SkipField:
+                pass
+            else:
+                serializer.set_value(ret, source_attrs, value)
+
+        if errors:
+            raise ValidationError(errors)
+
+        clean = getattr(serializer, "clean_internal", None)
+        return clean(ret) if clean is not None else ret
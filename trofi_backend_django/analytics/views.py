@@ -1,24 +1,81 @@
-from django.db.models.functions import TruncMonth
-from django.db.models import Count, Avg, Q
-from django.db import IntegrityError
-
-from .models import UserAnalytics, Job, ReviewAnalytics
+from .models import UserAnalytics, Job
 from rest_framework.views import APIView
 from rest_framework.response import Response
+from django.http import HttpResponse, StreamingHttpResponse
 from rest_framework import status
+from rest_framework.parsers import JSONParser
+
+from .cache import (
+    JOBS,
+    USERS,
+    REVIEWS,
+    SNAPSHOTS,
+    cached_stats,
+    invalidate_job_keys,
+    invalidate_stats,
+)
+from .export import (
+    CONTENT_TYPES,
+    USERS_EXPORT,
+    REVIEWS_EXPORT,
+    export_rows,
+    stream_csv,
+    stream_ndjson,
+)
+from .ingest import (
+    enqueue_job_patch,
+    enqueue_records,
+    enqueue_review_deletes,
+    enqueue_user_patch,
+    ingest_enabled,
+    known_keys,
+)
+from .instrumentation import render_metrics
+from .listing import LIST_DEFAULT_LIMIT, LIST_MAX_LIMIT, USERS_LIST, REVIEWS_LIST, list_page
+from .params import bool_param, choice_param, find_job_pk, int_param, list_param
+from .parsers import NDJSONParser
+from .reconcile import (
+    MAX_DEPTH,
+    PREFIX,
+    RECONCILE_JOBS,
+    RECONCILE_USERS,
+    RECONCILE_REVIEWS,
+    apply_ranges,
+    checksums,
+)
+from .renderers import CSVRenderer, NDJSONRenderer
+from .rollups import track_users
+from .snapshots import stats_sections
+from .stats import SECTIONS, JobStatsSource, StatsFilters
+from .sync import JOB_BATCH, USER_BATCH, REVIEW_BATCH, delete_reviews, run_batch, run_delete_batch, sync_one
 
 # ===========================
 # SYNC VIEWS (EXPRESS a DJANGO)
 # ===========================
 
+def enqueue_response(spec, record):
+    """
+    Modo ingesta: valida, encola y responde 202 sin escribir en la base.
+    """
+    result = enqueue_records(spec, [record])[0]
+    if result["ok"]:
+        return Response({"ok": True, "queued": True}, status=202)
+    return Response(result["errors"], status=400)
+
+
 class SyncJobView(APIView):
     def post(self, request):
-        from .serializers import JobSyncSerializer
-        serializer = JobSyncSerializer(data=request.data)
-        if serializer.is_valid():
-            serializer.save()
-            return Response({"ok": True, "message": "Job creado"}, status=201)
-        return Response(serializer.errors, status=400)
+        """
+        Upsert por firebase_key: crea el job (201) o actualiza el existente
+        (200). Reenviar el mismo registro es inocuo.
+        """
+        if ingest_enabled():
+            return enqueue_response(JOB_BATCH, request.data)
+
+        errors, created = sync_one(JOB_BATCH, request.data)
+        if errors is None:
+            return Response({"ok": True, "message": "Job sincronizado"}, status=201 if created else 200)
+        return Response(errors, status=400)
 
     def put(self, request, pk):
         from .serializers import JobSyncSerializer
@@ -27,9 +84,19 @@ class SyncJobView(APIView):
         except Job.DoesNotExist:
             return Response({"error": "Job no encontrado"}, status=404)
 
+        if ingest_enabled():
+            # Detrás de los upserts encolados del mismo job, no antes
+            errors = enqueue_job_patch(job, request.data)
+            if errors is None:
+                return Response({"ok": True, "queued": True}, status=202)
+            return Response(errors, status=400)
+
         serializer = JobSyncSerializer(job, data=request.data, partial=True)
         if serializer.is_valid():
+            old_key = job.firebase_key
             serializer.save()
+            invalidate_job_keys([old_key, job.firebase_key])
+            invalidate_stats(JOBS)
             return Response({"ok": True, "message": "Job actualizado"})
         return Response(serializer.errors, status=400)
 
@@ -37,15 +104,27 @@ class SyncJobView(APIView):
 
 class SyncUserView(APIView):
     def post(self, request):
-        from .serializers import UserSyncSerializer
-        serializer = UserSyncSerializer(data=request.data)
-        if serializer.is_valid():
-            serializer.save()
-            return Response({"ok": True, "message": "Usuario creado"}, status=201)
-        return Response(serializer.errors, status=400)
+        """
+        Upsert por uid: crea el usuario (201) o actualiza el existente (200).
+        """
+        if ingest_enabled():
+            return enqueue_response(USER_BATCH, request.data)
+
+        errors, created = sync_one(USER_BATCH, request.data)
+        if errors is None:
+            return Response({"ok": True, "message": "Usuario sincronizado"}, status=201 if created else 200)
+        return Response(errors, status=400)
 
     def put(self, request, pk):
         from .serializers import UserSyncSerializer
+        if ingest_enabled():
+            if not known_keys(USER_BATCH, [pk]):
+                return Response({"error": "Usuario no encontrado"}, status=404)
+            errors = enqueue_user_patch(pk, request.data)
+            if errors is None:
+                return Response({"ok": True, "queued": True}, status=202)
+            return Response(errors, status=400)
+
         try:
             user = UserAnalytics.objects.get(pk=pk)
         except UserAnalytics.DoesNotExist:
@@ -53,7 +132,9 @@ class SyncUserView(APIView):
 
         serializer = UserSyncSerializer(user, data=request.data, partial=True)
         if serializer.is_valid():
-            serializer.save()
+            with track_users([user.pk]):
+                serializer.save()
+                invalidate_stats(USERS)
             return Response({"ok": True})
         return Response(serializer.errors, status=400)
 
@@ -61,22 +142,97 @@ class SyncUserView(APIView):
 
 class SyncReviewView(APIView):
     def post(self, request):
-        from .serializers import ReviewSyncSerializer
-        serializer = ReviewSyncSerializer(data=request.data)
+        """
+        Upsert por id de la review: 201 si es nueva, 200 si ya existía.
+        """
+        if ingest_enabled():
+            return enqueue_response(REVIEW_BATCH, request.data)
 
-        if serializer.is_valid():
-            serializer.save()
-            return Response({"ok": True, "message": "Review creada"}, status=201)
+        errors, created = sync_one(REVIEW_BATCH, request.data)
 
-        return Response(serializer.errors, status=400)
+        if errors is None:
+            return Response({"ok": True, "message": "Review sincronizada"}, status=201 if created else 200)
+
+        return Response(errors, status=400)
 
     def delete(self, request, pk):
-        try:
-            review = ReviewAnalytics.objects.get(pk=pk)
-            review.delete()
-            return Response({"ok": True, "message": "Review eliminada"})
-        except ReviewAnalytics.DoesNotExist:
+        if ingest_enabled():
+            queued, _ = enqueue_review_deletes([pk])
+            if not queued:
+                return Response({"error": "Review no encontrada"}, status=404)
+            return Response({"ok": True, "queued": True}, status=202)
+
+        if not delete_reviews([pk]):
             return Response({"error": "Review no encontrada"}, status=404)
+        return Response({"ok": True, "message": "Review eliminada"})
+
+
+
+class SyncBatchView(APIView):
+    """
+    Sync en lote: recibe un array JSON (o NDJSON) de registros y devuelve
+    un resultado por ítem para que Express reintente solo los fallidos.
+    """
+    parser_classes = [JSONParser, NDJSONParser]
+    spec = None
+
+    def post(self, request):
+        records = request.data
+        if not isinstance(records, list):
+            return Response({"error": "Se esperaba una lista de registros"}, status=400)
+
+        queued = ingest_enabled()
+        if queued:
+            results = enqueue_records(self.spec, records)
+        else:
+            results = run_batch(self.spec, records)
+        failed = sum(1 for item in results if not item["ok"])
+
+        return Response({
+            "ok": failed == 0,
+            "queued": queued,
+            "total": len(results),
+            "synced": len(results) - failed,
+            "failed": failed,
+            "results": results,
+        }, status=202 if queued else 200)
+
+
+class SyncJobBatchView(SyncBatchView):
+    spec = JOB_BATCH
+
+
+class SyncUserBatchView(SyncBatchView):
+    spec = USER_BATCH
+
+
+class SyncReviewBatchView(SyncBatchView):
+    spec = REVIEW_BATCH
+
+
+class SyncReviewBatchDeleteView(APIView):
+    """
+    Baja en lote: {"ids": [...]} (o la lista sola). Responde qué ids se
+    borraron y cuáles no existían; en modo ingesta se encolan (202).
+    """
+
+    def post(self, request):
+        ids = request.data.get("ids") if isinstance(request.data, dict) else request.data
+        if not isinstance(ids, list) or not all(isinstance(pk, str) and pk for pk in ids):
+            return Response({"error": "Se esperaba una lista de ids"}, status=400)
+
+        queued = ingest_enabled()
+        if queued:
+            deleted, missing = enqueue_review_deletes(ids)
+        else:
+            deleted, missing = run_delete_batch(ids)
+        return Response({
+            "ok": True,
+            "queued": queued,
+            "total": len(deleted) + len(missing),
+            "deleted": len(deleted),
+            "missing": missing,
+        }, status=202 if queued else 200)
 
 
 
@@ -86,40 +242,21 @@ class SyncReviewView(APIView):
 
 class UsersStatsView(APIView):
     """
-    Estadísticas de usuarios
+    Estadísticas de usuarios.
+    Acepta los filtros de StatsFilters (?from, ?to, ?job, ?granularity)
+    y ?live=1 para no usar el snapshot precalculado.
     """
+    @cached_stats(USERS, SNAPSHOTS)
     def get(self, request):
-        try:
-            total = UserAnalytics.objects.count()
-            workers = UserAnalytics.objects.filter(is_worker=True).count()
-            clients = total - workers
-
-            # Usuarios por mes
-            users_by_month = (
-                UserAnalytics.objects
-                .annotate(month=TruncMonth("created_at"))
-                .values("month")
-                .annotate(total=Count("uid"))
-                .order_by("month")
-            )
-
-            formatted = [
-                {
-                    "month": item["month"].strftime("%Y-%m") if item["month"] else None,
-                    "total": item["total"]
-                }
-                for item in users_by_month
-                if item["month"]
-            ]
+        filters = StatsFilters.from_request(request)
+        live = bool_param(request, "live")
 
+        try:
+            data, generated_at = stats_sections(filters, ["users"], live=live)
             return Response({
                 "success": True,
-                "data": {
-                    "total_users": total,
-                    "workers": workers,
-                    "clients": clients,
-                    "users_by_month": formatted
-                }
+                "data": data["users"],
+                "generated_at": generated_at,
             })
         except Exception as e:
             return Response(
@@ -130,42 +267,48 @@ class UsersStatsView(APIView):
 
 class WorkersStatsView(APIView):
     """
-    Estadísticas de trabajadores
+    Estadísticas de trabajadores.
+    ?limit= tamaño del ranking (default 10) y ?min_reviews= reseñas mínimas
+    para entrar en él (default 1), más los filtros de StatsFilters y
+    ?live=1.
     """
+    @cached_stats(USERS, REVIEWS, JOBS, SNAPSHOTS)
     def get(self, request):
+        limit = int_param(request, "limit", 10, minimum=1, maximum=100)
+        min_reviews = int_param(request, "min_reviews", 1, minimum=1)
+        filters = StatsFilters.from_request(request)
+        live = bool_param(request, "live")
+
         try:
-            # Trabajadores por oficio
-            workers_by_job = (
-                UserAnalytics.objects.filter(is_worker=True)
-                .values("job__id", "job__name")
-                .annotate(total=Count("uid"))
-                .order_by("-total")
+            data, generated_at = stats_sections(filters, ["workers"], limit, min_reviews, live)
+            return Response({
+                "success": True,
+                "data": data["workers"],
+                "generated_at": generated_at,
+            })
+        except Exception as e:
+            return Response(
+                {"error": str(e)},
+                status=500
             )
 
-            # Top trabajadores por puntuación
-            top_workers = (
-                UserAnalytics.objects.filter(is_worker=True)
-                .annotate(avg_score=Avg("reviews_received__score"))
-                .filter(avg_score__isnull=False)  # Solo con reseñas
-                .order_by("-avg_score")[:10]
-            )
 
-            top_list = [
-                {
-                    "uid": w.uid,
-                    "name": w.name,
-                    "job": w.job.name if w.job else None,
-                    "avg_score": round(float(w.avg_score or 0), 2)
-                }
-                for w in top_workers
-            ]
+class ReviewsStatsView(APIView):
+    """
+    Estadísticas de reseñas.
+    Acepta los filtros de StatsFilters (?from, ?to, ?job) y ?live=1.
+    """
+    @cached_stats(USERS, REVIEWS, JOBS, SNAPSHOTS)
+    def get(self, request):
+        filters = StatsFilters.from_request(request)
+        live = bool_param(request, "live")
 
+        try:
+            data, generated_at = stats_sections(filters, ["reviews"], live=live)
             return Response({
                 "success": True,
-                "data": {
-                    "workers_by_job": list(workers_by_job),
-                    "top_workers": top_list
-                }
+                "data": data["reviews"],
+                "generated_at": generated_at,
             })
         except Exception as e:
             return Response(
@@ -174,45 +317,200 @@ class WorkersStatsView(APIView):
             )
 
 
-class ReviewsStatsView(APIView):
+class DashboardView(APIView):
     """
-    Estadísticas de reseñas
+    Las tres estadísticas en una sola respuesta, compartiendo lecturas.
+    ?fields=users,workers,reviews elige las secciones (default: todas);
+    ?limit= y ?min_reviews= aplican al ranking de trabajadores y los
+    filtros de StatsFilters a todas las secciones. Sin filtros la
+    respuesta sale del último snapshot (analytics.snapshots), con su
+    generated_at, salvo con ?live=1.
     """
+    @cached_stats(USERS, REVIEWS, JOBS, SNAPSHOTS)
     def get(self, request):
+        sections = list_param(request, "fields", SECTIONS)
+        limit = int_param(request, "limit", 10, minimum=1, maximum=100)
+        min_reviews = int_param(request, "min_reviews", 1, minimum=1)
+        filters = StatsFilters.from_request(request)
+        live = bool_param(request, "live")
+
         try:
-            # Promedio global
-            global_avg = ReviewAnalytics.objects.aggregate(avg=Avg("score"))["avg"] or 0
-
-            # Promedio por oficio
-            avg_by_job = (
-                ReviewAnalytics.objects
-                .values("reviewed__job__name")
-                .annotate(avg_score=Avg("score"))
-                .order_by("reviewed__job__name")
+            data, generated_at = stats_sections(filters, sections, limit, min_reviews, live)
+            return Response({
+                "success": True,
+                "data": data,
+                "generated_at": generated_at,
+            })
+        except Exception as e:
+            return Response(
+                {"error": str(e)},
+                status=500
             )
 
-            # Total de reseñas
-            total_reviews = ReviewAnalytics.objects.count()
 
-            # Distribución de scores
-            score_distribution = (
-                ReviewAnalytics.objects
-                .values("score")
-                .annotate(count=Count("id"))
-                .order_by("score")
-            )
+class JobStatsView(APIView):
+    """
+    Detalle de un oficio (firebase_key, o id de Django como en ?job=):
+    trabajadores, histograma de scores, reseñas por mes y ranking de sus
+    trabajadores (?limit= y ?min_reviews= como en WorkersStatsView).
+    """
+    @cached_stats(USERS, REVIEWS, JOBS)
+    def get(self, request, pk):
+        limit = int_param(request, "limit", 10, minimum=1, maximum=100)
+        min_reviews = int_param(request, "min_reviews", 1, minimum=1)
+        job_id = find_job_pk(pk)
 
+        try:
+            source = JobStatsSource(job_id, limit=limit, min_reviews=min_reviews)
+            if job_id is None or not source.exists():
+                return Response({"error": "Job no encontrado"}, status=404)
             return Response({
                 "success": True,
-                "data": {
-                    "global_average": round(float(global_avg), 2),
-                    "total_reviews": total_reviews,
-                    "average_by_job": list(avg_by_job),
-                    "score_distribution": list(score_distribution)
-                }
+                "data": source.detail()
             })
         except Exception as e:
             return Response(
                 {"error": str(e)},
                 status=500
-            )
\ No newline at end of file
+            )
+
+
+
+# ===========================
+# EXPORT (DJANGO a EXPRESS)
+# ===========================
+
+class ExportView(APIView):
+    """
+    Exporta la tabla en streaming.
+    ?format=csv|ndjson o el header Accept (default ndjson), ?after=<pk>
+    para retomar, ?limit= para cortar y los filtros ?from, ?to, ?job de
+    StatsFilters.
+    """
+    renderer_classes = [NDJSONRenderer, CSVRenderer]
+    spec = None
+
+    def get(self, request):
+        export_format = request.accepted_renderer.format
+        limit = int_param(request, "limit", None, minimum=1)
+        after = request.query_params.get("after") or None
+        filters = StatsFilters.from_request(request)
+
+        rows = export_rows(self.spec, filters, after=after, limit=limit)
+        if export_format == "csv":
+            # Al retomar no se repite el encabezado
+            content = stream_csv(self.spec, rows, header=after is None)
+        else:
+            content = stream_ndjson(self.spec, rows)
+
+        response = StreamingHttpResponse(content, content_type=CONTENT_TYPES[export_format])
+        response["Content-Disposition"] = f'attachment; filename="{self.spec.name}.{export_format}"'
+        return response
+
+
+class ExportUsersView(ExportView):
+    spec = USERS_EXPORT
+
+
+class ExportReviewsView(ExportView):
+    spec = REVIEWS_EXPORT
+
+
+# ===========================
+# LISTADOS (DJANGO a EXPRESS)
+# ===========================
+
+class ListView(APIView):
+    """
+    Listado paginado por cursor, del más nuevo al más viejo.
+    ?limit= (default 50, máximo 500) y ?cursor= con el next_cursor de la
+    respuesta anterior.
+    """
+    spec = None
+
+    def get(self, request):
+        limit = int_param(request, "limit", LIST_DEFAULT_LIMIT, minimum=1, maximum=LIST_MAX_LIMIT)
+        cursor = request.query_params.get("cursor") or None
+
+        results, next_cursor = list_page(self.spec, request, limit, cursor)
+        return Response({
+            "success": True,
+            "results": results,
+            "next_cursor": next_cursor,
+        })
+
+
+class ListUsersView(ListView):
+    """
+    Filtros: ?is_worker=true|false, ?job= (id o firebase_key).
+    """
+    spec = USERS_LIST
+
+
+class ListReviewsView(ListView):
+    """
+    Filtros: ?reviewed=, ?reviewer= (uid), ?job=, ?min_score=, ?max_score=.
+    """
+    spec = REVIEWS_LIST
+
+
+# ===========================
+# RECONCILIACIÓN (EXPRESS a DJANGO)
+# ===========================
+
+class ReconcileView(APIView):
+    """
+    GET: checksums por rango (?by=prefix|day|month, ?depth= para prefix,
+    default 2, y ?within= para bajar de nivel dentro de un rango).
+    POST: {"by", "depth", "ranges": {rango: [registros]}} con el contenido
+    completo de los rangos distintos; se escriben y se borra lo que sobra.
+    """
+    spec = None
+
+    def get(self, request):
+        by = choice_param(request, "by", self.spec.methods(), PREFIX)
+        depth = int_param(request, "depth", 2, minimum=1, maximum=MAX_DEPTH)
+        within = request.query_params.get("within") or None
+
+        return Response({
+            "success": True,
+            "by": by,
+            "depth": depth if by == PREFIX else None,
+            "ranges": checksums(self.spec, by, depth, within),
+        })
+
+    def post(self, request):
+        body = request.data if isinstance(request.data, dict) else {}
+        by = body.get("by", PREFIX)
+        depth = body.get("depth", 2)
+
+        results = apply_ranges(self.spec, by, body.get("ranges"), depth)
+        return Response({
+            "ok": all(result["failed"] == 0 for result in results),
+            "ranges": results,
+        })
+
+
+class ReconcileJobsView(ReconcileView):
+    spec = RECONCILE_JOBS
+
+
+class ReconcileUsersView(ReconcileView):
+    spec = RECONCILE_USERS
+
+
+class ReconcileReviewsView(ReconcileView):
+    spec = RECONCILE_REVIEWS
+
+
+# ===========================
+# MÉTRICAS
+# ===========================
+
+class MetricsView(APIView):
+    """
+    Histogramas por endpoint en formato de texto de Prometheus.
+    """
+
+    def get(self, request):
+        return HttpResponse(render_metrics(), content_type="text/plain; version=0.0.4; charset=utf-8")
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -73,12 +74,111 @@ WSGI_APPLICATION = 'trofi_backend_django.wsgi.application'
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
+# DB_ENGINE=postgresql usa PostgreSQL (requiere psycopg) con los datos de
+# conexión de DB_NAME, DB_USER, DB_PASSWORD, DB_HOST y DB_PORT. Sin
+# DB_ENGINE se usa el SQLite local.
+#
+# Las conexiones se reutilizan entre requests durante DB_CONN_MAX_AGE
+# segundos (0 = una por request) y se verifican antes de reutilizarlas.
+# Con DB_POOL=1 PostgreSQL usa el pool de psycopg (pip install
+# "psycopg[pool]") en lugar de conexiones persistentes.
+
+DB_ENGINE = os.environ.get('DB_ENGINE', 'sqlite')
+DB_CONN_MAX_AGE = int(os.environ.get('DB_CONN_MAX_AGE', 60))
+DB_CONN_HEALTH_CHECKS = os.environ.get('DB_CONN_HEALTH_CHECKS', '1') == '1'
+
+if DB_ENGINE == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('DB_NAME', 'trofi'),
+            'USER': os.environ.get('DB_USER', 'postgres'),
+            'PASSWORD': os.environ.get('DB_PASSWORD', ''),
+            'HOST': os.environ.get('DB_HOST', 'localhost'),
+            'PORT': os.environ.get('DB_PORT', '5432'),
+            'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': DB_CONN_HEALTH_CHECKS,
+        }
+    }
+    if os.environ.get('DB_POOL') == '1':
+        # El pool no admite conexiones persistentes
+        DATABASES['default']['CONN_MAX_AGE'] = 0
+        DATABASES['default']['OPTIONS'] = {
+            'pool': {
+                'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', 2)),
+                'max_size': int(os.environ.get('DB_POOL_MAX_SIZE', 10)),
+                'timeout': int(os.environ.get('DB_POOL_TIMEOUT', 10)),
+            },
+        }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('DB_NAME', BASE_DIR / 'db.sqlite3'),
+            'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': DB_CONN_HEALTH_CHECKS,
+        }
+    }
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# DB_SQLITE_TUNED=1: perfil de SQLite para escrituras y lecturas
+# concurrentes. Los PRAGMA se aplican a cada conexión nueva (analytics.db)
+# y las transacciones toman el lock de escritura al empezar, así dos
+# escritores no se traban a mitad de camino.
+DB_SQLITE_TUNED = DB_ENGINE != 'postgresql' and os.environ.get('DB_SQLITE_TUNED') == '1'
+
+SQLITE_PRAGMAS = {}
+if DB_SQLITE_TUNED:
+    SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': int(os.environ.get('DB_SQLITE_BUSY_TIMEOUT', 5000)),  # ms
+        'mmap_size': 256 * 1024 * 1024,
+        'cache_size': -64000,  # KiB (negativo = tamaño, no páginas)
     }
+    DATABASES['default']['OPTIONS'] = {'transaction_mode': 'IMMEDIATE'}
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# El caché de respuestas de estadísticas se invalida con contadores de
+# versión que tienen que ver todos los procesos (workers web y comandos de
+# management), así que solo se activa con un backend compartido:
+# ANALYTICS_CACHE_BACKEND=redis o memcached (ANALYTICS_CACHE_LOCATION),
+# database (tabla de `manage.py createcachetable analytics_cache`) o file
+# (procesos del mismo host, en ANALYTICS_CACHE_DIR). Sin la variable no
+# hay caché de respuestas.
+
+ANALYTICS_CACHE_BACKEND = os.environ.get('ANALYTICS_CACHE_BACKEND', '')
+
+shared_analytics_caches = {
+    'redis': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ.get('ANALYTICS_CACHE_LOCATION', 'redis://127.0.0.1:6379/1'),
+    },
+    'memcached': {
+        'BACKEND': 'django.core.cache.backends.memcached.PyMemcacheCache',
+        'LOCATION': os.environ.get('ANALYTICS_CACHE_LOCATION', '127.0.0.1:11211'),
+    },
+    'database': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'analytics_cache',
+    },
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('ANALYTICS_CACHE_DIR', BASE_DIR / 'cache' / 'analytics'),
+    },
+}
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Sin backend compartido queda un locmem que solo usan los tests y el
+    # benchmark (un solo proceso) con ANALYTICS_STATS_CACHE_ALIAS='analytics'
+    'analytics': shared_analytics_caches.get(ANALYTICS_CACHE_BACKEND, {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'analytics',
+    }),
 }
 
 
@@ -122,3 +222,53 @@ STATIC_URL = 'static/'
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+
+# Analytics
+# Registros por transacción en los endpoints sync/*/batch/
+ANALYTICS_SYNC_CHUNK_SIZE = 500
+# Validación de sync sin instanciar un serializer por registro
+# (analytics.validation). False = serializers de DRF.
+ANALYTICS_SYNC_FAST_VALIDATION = True
+
+# Filas por lectura (y por escritura a la respuesta) en export/*
+ANALYTICS_EXPORT_CHUNK_SIZE = 2000
+
+# Alias de CACHES para compartir el caché firebase_key → Job.pk entre
+# procesos (y avisarles de renombres y bajas). None = solo el dict de cada
+# proceso, que se descarta cada ANALYTICS_JOB_CACHE_TTL segundos.
+ANALYTICS_JOB_CACHE_ALIAS = 'analytics' if ANALYTICS_CACHE_BACKEND in shared_analytics_caches else None
+ANALYTICS_JOB_CACHE_TTL = 30
+
+# Caché de respuestas de /api/analytics/*. None = sin caché; solo se
+# activa con un backend compartido (ver CACHES).
+ANALYTICS_STATS_CACHE_ALIAS = 'analytics' if ANALYTICS_CACHE_BACKEND in shared_analytics_caches else None
+# Segundos que vive una respuesta aunque nadie la invalide
+ANALYTICS_STATS_CACHE_TTL = 300
+# Reseñas en la muestra de ?mode=approx (analytics.sampling). Crece hasta
+# el doble antes de recortarse.
+ANALYTICS_REVIEW_SAMPLE_SIZE = 10000
+
+# Las vistas de /api/analytics/* sirven el snapshot que genera
+# `manage.py snapshot_stats` cuando no hay filtros (?live=1 lo saltea).
+ANALYTICS_STATS_SNAPSHOTS = os.environ.get('ANALYTICS_STATS_SNAPSHOTS') == '1'
+# Segundos tras los cuales un snapshot ya no se sirve. None = sin límite.
+ANALYTICS_STATS_SNAPSHOT_MAX_AGE = 900
+
+# Ingesta diferida: las vistas de sync encolan y responden 202; los datos
+# se escriben con `manage.py drain_ingest_queue`.
+ANALYTICS_INGEST_MODE = os.environ.get('ANALYTICS_INGEST_MODE') == '1'
+ANALYTICS_INGEST_QUEUE_PATH = os.environ.get('ANALYTICS_INGEST_QUEUE_PATH', BASE_DIR / 'ingest_queue.sqlite3')
+
+# Vistas async/: cada lectura de una estadística en su propio hilo y
+# conexión. ANALYTICS_ASYNC_PARALLEL_QUERIES=0 usa el ORM async, que Django
+# serializa.
+ANALYTICS_ASYNC_PARALLEL_QUERIES = os.environ.get('ANALYTICS_ASYNC_PARALLEL_QUERIES', '1') == '1'
+
+# Instrumentación por request (analytics.instrumentation): header
+# Server-Timing, log JSON en "analytics.requests" y /api/metrics/.
+# ANALYTICS_INSTRUMENTATION=0 la desactiva.
+if os.environ.get('ANALYTICS_INSTRUMENTATION', '1') == '1':
+    MIDDLEWARE.insert(0, 'analytics.instrumentation.InstrumentationMiddleware')
+# Requests más lentos que esto se loguean como WARNING
+ANALYTICS_SLOW_REQUEST_MS = int(os.environ.get('ANALYTICS_SLOW_REQUEST_MS', 500))